@@ -0,0 +1,312 @@
+"""
+Benchmarks for the ingest, summary and report hot paths.
+
+Times each stage (CSV parsing, chunked ingest, summary computation, legacy
+raw_data type stats, PDF generation) and the end-to-end API calls through the
+Django test client, on synthetic datasets of the requested sizes and type
+cardinalities (see datasets.py). Reports the best wall time of --repeat runs,
+rows per second (for stages that scan the rows) and the peak traced Python/NumPy allocation of one extra run.
+
+Everything runs against a throwaway database and storage directory.
+
+    cd backend
+    python benchmarks/bench.py --sizes 1k,100k,1m --types 4,50
+    python benchmarks/bench.py --save benchmarks/baseline.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json --fail-on-regression
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from datasets import cached_csv  # noqa: E402
+
+# Stages driven by the stored summary (plus the few flagged outlier rows a report lists),
+# not by scanning every row: rows/s would be misleading for them
+ROWLESS_STAGES = {'api_summary', 'generate_pdf', 'api_pdf'}
+# Stages whose cost grows with per-row Python objects are skipped above these sizes unless --no-caps
+DEFAULT_CAPS = {
+    'type_stats_from_raw_data': 1_000_000,
+    'api_upload': 2_000_000,
+}
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '10m' -> 10_000_000, '2500' -> 2500."""
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+def setup_django(workdir: str) -> None:
+    """Point settings at `workdir`, then set up Django and an empty migrated database."""
+    for name, sub in [('SQLITE_PATH', 'bench.sqlite3'), ('DATASET_STORAGE_DIR', 'store'),
+                      ('REPORT_FILE_DIR', 'report_files'), ('REPORT_CACHE_DIR', 'report_cache'),
+                      ('UPLOAD_SPOOL_DIR', 'spool')]:
+        os.environ[name] = os.path.join(workdir, sub)
+    os.environ.pop('DATABASE_URL', None)
+    # Every upload must be parsed, not deduplicated against the previous repeat
+    os.environ['UPLOAD_DEDUP_SCOPE'] = 'off'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    import django
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+    django.setup()
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+
+
+def measure(fn, repeat: int, memory: bool):
+    """(best seconds of `repeat` runs, peak traced bytes of one more run or None)."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return min(times), peak
+
+
+class Workload:
+    """Stage callables for one synthetic dataset."""
+
+    def __init__(self, csv_path, workdir, client):
+        from equipment.utils import parse_csv
+
+        self.csv_path = csv_path
+        self.workdir = workdir
+        self.client = client
+        with open(csv_path, 'rb') as fh:
+            self.df = parse_csv(fh)
+        self.dataset_id = None
+
+    def stages(self):
+        return [
+            ('parse_csv', self.parse_csv),
+            ('ingest_csv', self.ingest_csv),
+            ('compute_summary', self.compute_summary),
+            ('type_stats_from_raw_data', self.type_stats_from_raw_data),
+            ('api_upload', self.api_upload),
+            ('api_summary', self.api_summary),
+            ('api_page', self.api_page),
+            ('api_page_sorted', self.api_page_sorted),
+            ('api_export', self.api_export),
+            ('generate_pdf', self.generate_pdf),
+            ('api_pdf', self.api_pdf),
+        ]
+
+    # Library stages
+
+    def parse_csv(self):
+        from equipment.utils import parse_csv
+        with open(self.csv_path, 'rb') as fh:
+            parse_csv(fh)
+
+    def ingest_csv(self):
+        from equipment.utils import ingest_csv
+        target = os.path.join(self.workdir, 'ingest.cols')
+        with open(self.csv_path, 'rb') as fh:
+            ingest_csv(fh, target)
+        os.remove(target)
+
+    def compute_summary(self):
+        from equipment.utils import compute_summary
+        compute_summary(self.df)
+
+    def type_stats_from_raw_data(self):
+        from equipment.utils import compute_type_stats_from_raw_data
+        if not hasattr(self, '_records'):
+            self._records = self.df.to_dict(orient='records')
+        compute_type_stats_from_raw_data(self._records)
+
+    def generate_pdf(self):
+        from equipment.models import UploadedDataset
+        from equipment.utils import generate_pdf
+        dataset = UploadedDataset.objects.select_related('summary').get(pk=self._uploaded())
+        generate_pdf(dataset, dataset.summary, output=io.BytesIO())
+
+    # API stages (caches are cleared so each call does the full work)
+
+    def _uploaded(self):
+        if self.dataset_id is None:
+            self.api_upload()
+        return self.dataset_id
+
+    def _clear_caches(self):
+        from equipment.cache import delete_report_files, report_cache
+        report_cache().clear()
+        if self.dataset_id is not None:
+            delete_report_files(self.dataset_id)
+
+    def _get(self, url):
+        response = self.client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def api_upload(self):
+        with open(self.csv_path, 'rb') as fh:
+            response = self.client.post('/api/upload/', {'file': fh})
+        assert response.status_code == 201, response.content[:200]
+        self.dataset_id = response.json()['dataset_id']
+
+    def api_summary(self):
+        pk = self._uploaded()
+        self._clear_caches()
+        self._get(f'/api/summary/{pk}/')
+
+    def api_page(self):
+        pk = self._uploaded()
+        self._clear_caches()
+        self._get(f'/api/datasets/{pk}/?offset=0&limit=500')
+
+    def api_page_sorted(self):
+        pk = self._uploaded()
+        self._clear_caches()
+        self._get(f'/api/datasets/{pk}/?limit=500&sort=-Flowrate&type=Pump')
+
+    def api_export(self):
+        pk = self._uploaded()
+        self._get(f'/api/datasets/{pk}/export/')
+
+    def api_pdf(self):
+        pk = self._uploaded()
+        self._clear_caches()
+        self._get(f'/api/pdf/{pk}/')
+
+
+def run(args):
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    client = Client()
+    client.force_login(User.objects.create_user('bench', password='bench'))
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), 'equipment-bench-data')
+    selected = set(args.stages.split(',')) if args.stages else None
+
+    results = []
+    for types in [int(t) for t in args.types.split(',')]:
+        for rows in [parse_size(s) for s in args.sizes.split(',')]:
+            workload = Workload(cached_csv(data_dir, rows, types), args.workdir, client)
+            for name, fn in workload.stages():
+                if selected and name not in selected:
+                    continue
+                cap = DEFAULT_CAPS.get(name)
+                if cap and rows > cap and not args.no_caps:
+                    continue
+                seconds, peak = measure(fn, args.repeat, not args.no_memory)
+                result = {
+                    'stage': name,
+                    'rows': rows,
+                    'types': types,
+                    'seconds': round(seconds, 5),
+                    'rows_per_s': round(rows / seconds) if seconds and name not in ROWLESS_STAGES else None,
+                    'peak_mb': round(peak / 2**20, 2) if peak is not None else None,
+                }
+                results.append(result)
+                print_result(result)
+    return results
+
+
+def print_result(result):
+    line = (f"{result['stage']:<26} {result['rows']:>10} {result['types']:>6} {result['seconds']:>10.4f} "
+            f"{result['rows_per_s'] or '-':>12} {result['peak_mb'] if result['peak_mb'] is not None else '-':>9}")
+    print(line, flush=True)
+
+
+def result_key(result):
+    return result['stage'], result['rows'], result['types']
+
+
+def compare(results, baseline_path, threshold, min_seconds):
+    """
+    Print time ratios against a saved baseline. Returns the regressed results;
+    stages faster than `min_seconds` in both runs are too noisy to flag.
+    """
+    with open(baseline_path) as fh:
+        baseline = {result_key(r): r for r in json.load(fh)['results']}
+    regressions = []
+    print(f"\n{'stage':<26} {'rows':>10} {'types':>6} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is None or not base['seconds']:
+            continue
+        ratio = result['seconds'] / base['seconds']
+        flag = ''
+        if ratio > 1 + threshold and max(result['seconds'], base['seconds']) >= min_seconds:
+            flag = '  REGRESSION'
+            regressions.append(result)
+        print(f"{result['stage']:<26} {result['rows']:>10} {result['types']:>6} "
+              f"{base['seconds']:>10.4f} {result['seconds']:>10.4f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def environment():
+    import numpy
+    import pandas
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1k,100k', help='Comma separated row counts (k/m suffixes), e.g. 1k,100k,1m,10m')
+    parser.add_argument('--types', default='4', help='Comma separated equipment type cardinalities')
+    parser.add_argument('--stages', default='', help='Comma separated stage names (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage; the best is reported')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc run')
+    parser.add_argument('--no-caps', action='store_true', help='Run per-row stages at every size')
+    parser.add_argument('--data-dir', default='', help='Where generated CSVs are cached')
+    parser.add_argument('--save', default='', help='Write results as JSON (e.g. a new baseline)')
+    parser.add_argument('--compare', default='', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Slowdown ratio above which a stage regressed')
+    parser.add_argument('--min-seconds', type=float, default=0.01, help='Ignore regressions of stages faster than this')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        setup_django(workdir)
+        print(f"{'stage':<26} {'rows':>10} {'types':>6} {'seconds':>10} {'rows/s':>12} {'peak MB':>9}")
+        results = run(args)
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump({'environment': environment(), 'results': results}, fh, indent=2)
+            fh.write('\n')
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold, args.min_seconds)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Synthetic equipment CSVs for benchmarks.
+
+Files have the columns of sample_data.csv with realistic value ranges and a
+configurable number of distinct equipment types. They are written in blocks,
+so even 10M-row files are generated with bounded memory, and cached by
+(rows, types, seed) so repeated runs reuse them.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_TYPES = ['Pump', 'Valve', 'Heater', 'Compressor', 'Reactor', 'Exchanger', 'Condenser', 'Mixer']
+BLOCK_ROWS = 200_000
+
+
+def type_names(count: int) -> list:
+    """`count` equipment type labels: the real ones first, then Type<n>."""
+    return BASE_TYPES[:count] + [f'Type{i}' for i in range(len(BASE_TYPES), count)]
+
+
+def make_frame(rows: int, types: int = 4, seed: int = 0, start: int = 0) -> pd.DataFrame:
+    """One block of synthetic rows; `start` offsets the equipment names."""
+    rng = np.random.default_rng(seed)
+    names = np.asarray(type_names(types), dtype=object)
+    kind = names[rng.integers(0, types, rows)]
+    return pd.DataFrame({
+        'Equipment Name': [f'EQ-{i}' for i in range(start, start + rows)],
+        'Type': kind,
+        'Flowrate': rng.normal(45.0, 10.0, rows).round(2),
+        'Pressure': rng.normal(12.0, 2.5, rows).round(2),
+        'Temperature': rng.normal(75.0, 12.0, rows).round(2),
+    })
+
+
+def write_csv(path, rows: int, types: int = 4, seed: int = 0) -> Path:
+    """Write a synthetic CSV of `rows` rows to `path` block by block."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', newline='') as fh:
+        make_frame(0, types).to_csv(fh, index=False)
+        for start in range(0, rows, BLOCK_ROWS):
+            block = min(BLOCK_ROWS, rows - start)
+            make_frame(block, types, seed + start, start=start).to_csv(fh, index=False, header=False)
+    tmp.replace(path)
+    return path
+
+
+def cached_csv(data_dir, rows: int, types: int = 4, seed: int = 0) -> Path:
+    """Path of the synthetic CSV for these parameters, generating it on first use."""
+    path = Path(data_dir) / f'equipment_{rows}rows_{types}types_{seed}.csv'
+    if not path.exists():
+        write_csv(path, rows, types, seed)
+    return path
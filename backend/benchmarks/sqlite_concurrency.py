@@ -0,0 +1,182 @@
+"""
+Concurrent read/write throughput of the SQLite profiles in settings.SQLITE_PROFILES.
+
+Each profile runs against its own temporary database. Every reader and
+writer is a separate process with its own connection, as with several
+gunicorn/uwsgi workers, so the GIL does not serialize the clients: readers
+repeat the history queries made by the web and desktop clients (dataset list
++ summary) while writers insert datasets and apply retention, as uploads do.
+All clients start together after Django is set up and run for --seconds.
+Reports operations per second and how many operations failed with
+"database is locked".
+
+    cd backend
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 2 --seconds 10 --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _setup_django():
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+# Time given to every client process to start and set up Django before the clock starts
+STARTUP_SECONDS = 5.0
+
+
+def _seed(seed_datasets: int) -> str:
+    """Migrate and seed the database; returns the journal mode in effect."""
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection, connections
+
+    from equipment.models import DataSummary, UploadedDataset
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('bench', password='bench')
+    for i in range(seed_datasets):
+        dataset = UploadedDataset.objects.create(user=user, file_name=f'seed{i}.csv', row_count=100)
+        DataSummary.objects.create(dataset=dataset, total_count=100, avg_flowrate=1.0,
+                                   avg_pressure=1.0, avg_temperature=1.0, type_distribution={'Pump': 100})
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+    connections.close_all()
+    return journal_mode
+
+
+def _client(kind: str, index: int, start_at: float, seconds: float) -> dict:
+    """One client process: repeat `kind` ('reads' or 'writes') from start_at for `seconds`."""
+    _setup_django()
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connections, transaction
+
+    from equipment.models import DataSummary, UploadedDataset
+    from equipment.retention import prune_user
+
+    user = User.objects.get(username='bench')
+
+    def read_once():
+        datasets = list(UploadedDataset.objects.filter(user=user).only('id', 'file_name', 'uploaded_at')[:5])
+        if datasets:
+            # A writer may prune it in between, as with a client opening a just-deleted dataset
+            dataset = UploadedDataset.objects.select_related('summary').defer('raw_data').filter(pk=datasets[0].pk)
+            dataset = dataset.first()
+            if dataset is not None:
+                dataset.summary
+
+    def write_once(n):
+        with transaction.atomic():
+            dataset = UploadedDataset.objects.create(user=user, file_name=f'w{index}-{n}.csv', row_count=100)
+            DataSummary.objects.create(dataset=dataset, total_count=100, avg_flowrate=1.0,
+                                       avg_pressure=1.0, avg_temperature=1.0, type_distribution={'Pump': 100})
+        prune_user(user)
+
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    time.sleep(max(0.0, start_at - time.time()))
+    stop = start_at + seconds
+    n = 0
+    try:
+        while time.time() < stop:
+            try:
+                if kind == 'reads':
+                    read_once()
+                else:
+                    write_once(n)
+                key = kind
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                key = 'locked'
+            n += 1
+            counts[key] += 1
+    finally:
+        connections.close_all()
+    return counts
+
+
+def run_profile(readers: int, writers: int, seconds: float, seed_datasets: int) -> dict:
+    """Run the workload from this process (SQLITE_PROFILE / SQLITE_PATH already set)."""
+    _setup_django()
+    journal_mode = _seed(seed_datasets)
+
+    clients = [('reads', i) for i in range(readers)] + [('writes', i) for i in range(writers)]
+    start_at = time.time() + STARTUP_SECONDS
+    with ProcessPoolExecutor(max_workers=len(clients), mp_context=get_context('spawn')) as pool:
+        futures = [pool.submit(_client, kind, i, start_at, seconds) for kind, i in clients]
+        results = [f.result() for f in futures]
+    if time.time() > start_at + seconds * 1.5:
+        print('warning: clients started late; raise STARTUP_SECONDS', file=sys.stderr)
+
+    totals = {key: sum(r[key] for r in results) for key in ('reads', 'writes', 'locked')}
+    return {
+        'journal_mode': journal_mode,
+        'reads_per_s': round(totals['reads'] / seconds, 1),
+        'writes_per_s': round(totals['writes'] / seconds, 1),
+        'locked_errors': totals['locked'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', default='default,tuned', help='Comma separated SQLITE_PROFILE names')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--seed-datasets', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per profile (median reported)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_profile(args.readers, args.writers, args.seconds, args.seed_datasets)
+        print(json.dumps(result))
+        return
+
+    profiles = args.profiles.split(',')
+    runs = {profile: [] for profile in profiles}
+    # Profiles take turns so drift in machine load hits them alike; the median run is reported
+    for _ in range(args.repeat):
+        for profile in profiles:
+            runs[profile].append(_run_worker(profile, args))
+
+    print(f"{'profile':<10} {'journal':<8} {'reads/s':>10} {'writes/s':>10} {'locked':>8}")
+    for profile in profiles:
+        results = runs[profile]
+        median = {key: statistics.median(r[key] for r in results)
+                  for key in ('reads_per_s', 'writes_per_s', 'locked_errors')}
+        print(f"{profile:<10} {results[0]['journal_mode']:<8} {median['reads_per_s']:>10} "
+              f"{median['writes_per_s']:>10} {median['locked_errors']:>8}")
+
+
+def _run_worker(profile: str, args) -> dict:
+    """Run one timed workload for `profile` in a fresh process and database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SQLITE_PROFILE=profile, SQLITE_PATH=os.path.join(tmp, 'bench.sqlite3'),
+                   DATASET_STORAGE_DIR=os.path.join(tmp, 'store'))
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker',
+             '--readers', str(args.readers), '--writers', str(args.writers),
+             '--seconds', str(args.seconds), '--seed-datasets', str(args.seed_datasets)],
+            env=env, cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+    if proc.returncode:
+        sys.exit(f'{profile} failed:\n{proc.stderr}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    main()
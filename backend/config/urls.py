@@ -4,7 +4,10 @@ URL configuration for Chemical Equipment Parameter Visualizer.
 from django.contrib import admin
 from django.urls import path, include
 
+from equipment.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('equipment.urls')),
+    path('metrics', metrics_view),
 ]
@@ -0,0 +1,90 @@
+"""
+Prebuilt zip of the desktop app served by /api/download-app/.
+
+The archive is built once into settings.APP_ARCHIVE_DIR and rebuilt only
+when a file under desktop/ is added, removed or modified (detected from
+paths, sizes and mtimes), so serving it costs a stat walk instead of
+re-deflating every file per request.
+"""
+import hashlib
+import os
+import threading
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+
+ARCHIVE_NAME = 'chemical-equipment-visualizer-desktop.zip'
+
+_lock = threading.Lock()
+_state = {'fingerprint': None, 'checked_at': 0.0}
+
+
+def desktop_dir() -> Path:
+    return Path(settings.BASE_DIR).parent / 'desktop'
+
+
+def _source_files(root: Path) -> List[Path]:
+    return sorted(p for p in root.rglob('*') if p.is_file() and '__pycache__' not in p.parts)
+
+
+def _fingerprint(root: Path, files: List[Path]) -> str:
+    digest = hashlib.sha1()
+    for path in files:
+        st = path.stat()
+        digest.update(f"{path.relative_to(root)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _temp_path(target: Path) -> Path:
+    # Unique per writer, so worker processes rebuilding at once never share a temp file
+    return target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+
+
+def _build(root: Path, files: List[Path], target: Path) -> None:
+    tmp = _temp_path(target)
+    try:
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for path in files:
+                zf.write(path, path.relative_to(root.parent))
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _write_marker(marker: Path, fingerprint: str) -> None:
+    tmp = _temp_path(marker)
+    tmp.write_text(fingerprint)
+    os.replace(tmp, marker)
+
+
+def get_archive() -> Optional[Tuple[Path, str]]:
+    """
+    Return (archive path, fingerprint), rebuilding the archive if the desktop
+    sources changed. Sources are re-checked at most every
+    settings.APP_ARCHIVE_CHECK_INTERVAL seconds. Returns None if desktop/ is missing.
+    """
+    root = desktop_dir()
+    if not root.exists():
+        return None
+    archive_dir = Path(settings.APP_ARCHIVE_DIR)
+    target = archive_dir / ARCHIVE_NAME
+    with _lock:
+        now = time.monotonic()
+        fresh = now - _state['checked_at'] < settings.APP_ARCHIVE_CHECK_INTERVAL
+        if fresh and _state['fingerprint'] and target.exists():
+            return target, _state['fingerprint']
+
+        files = _source_files(root)
+        fingerprint = _fingerprint(root, files)
+        marker = archive_dir / (ARCHIVE_NAME + '.fingerprint')
+        built = marker.read_text() if marker.exists() else None
+        if built != fingerprint or not target.exists():
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            _build(root, files, target)
+            _write_marker(marker, fingerprint)
+        _state.update(fingerprint=fingerprint, checked_at=now)
+        return target, fingerprint
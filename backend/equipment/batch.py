@@ -0,0 +1,306 @@
+"""
+Batch uploads: many CSVs (or a zip/tar of CSVs) in one request.
+
+The number of CSVs and their total unpacked size are checked against
+settings.BATCH_UPLOAD_MAX_FILES / BATCH_UPLOAD_MAX_BYTES from archive headers
+before anything is extracted. Files are then spooled and hashed, duplicates
+are resolved against stored data in one query (their source rows locked
+while the new datasets are saved, see services.lock_datasets),
+the rest are parsed concurrently on a process pool (pure pandas work, no
+database access in the workers), and the resulting datasets and summaries
+are inserted with bulk_create.
+"""
+import hashlib
+import multiprocessing
+import os
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.db import transaction
+
+from . import metrics, storage
+from .models import UploadedDataset, DataSummary, TypeAggregate
+from .profiling import stage
+from .retention import after_upload
+from .services import SUMMARY_FIELDS, find_duplicates, lock_datasets
+from .trends import build_aggregates
+from .utils import ingest_csv_file
+
+COPY_BLOCK_SIZE = 1 << 20
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Lazily created process pool for batch parsing; None when BATCH_UPLOAD_WORKERS is 0."""
+    global _pool
+    if settings.BATCH_UPLOAD_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.BATCH_UPLOAD_WORKERS,
+                mp_context=multiprocessing.get_context(settings.BATCH_UPLOAD_START_METHOD),
+            )
+        return _pool
+
+
+def _spool(fileobj, file_name: str) -> Dict[str, Any]:
+    """Copy an upload or archive member to the spool directory, hashing it on the way."""
+    directory = Path(settings.UPLOAD_SPOOL_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"batch-{uuid.uuid4().hex}.csv"
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as out:
+        for block in iter(lambda: fileobj.read(COPY_BLOCK_SIZE), b''):
+            digest.update(block)
+            out.write(block)
+            size += len(block)
+    return {'file_name': file_name, 'spool_path': path, 'content_hash': digest.hexdigest(), 'size': size}
+
+
+def _is_csv(name: str) -> bool:
+    return name.lower().endswith('.csv')
+
+
+class BatchLimits:
+    """Running CSV count and unpacked size of a batch, checked as members are listed."""
+
+    def __init__(self):
+        self.files = 0
+        self.size = 0
+
+    def add(self, size: int) -> None:
+        self.files += 1
+        self.size += size
+        if self.files > settings.BATCH_UPLOAD_MAX_FILES:
+            raise ValueError(f'At most {settings.BATCH_UPLOAD_MAX_FILES} files per batch')
+        if self.size > settings.BATCH_UPLOAD_MAX_BYTES:
+            raise ValueError(f'At most {settings.BATCH_UPLOAD_MAX_BYTES} bytes of CSV data per batch')
+
+
+def _scan_archive(archive, limits: BatchLimits) -> List[Any]:
+    """
+    The .csv members (ZipInfo or TarInfo) of a zip or tar archive, adding each
+    to `limits` from its header, so oversized batches fail before extraction.
+    """
+    archive.seek(0)
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zf:
+            members = []
+            for info in zf.infolist():
+                if not info.is_dir() and _is_csv(info.filename):
+                    limits.add(info.file_size)
+                    members.append(info)
+            return members
+    archive.seek(0)
+    try:
+        with tarfile.open(fileobj=archive, mode='r:*') as tf:
+            members = []
+            for member in tf:
+                if member.isfile() and _is_csv(member.name):
+                    limits.add(member.size)
+                    members.append(member)
+            return members
+    except tarfile.TarError:
+        raise ValueError(f'{archive.name} is not a zip or tar archive')
+
+
+def _expand_archive(archive, members: List[Any], items: List[Dict[str, Any]]) -> None:
+    """
+    Spool the scanned `members` of an archive into `items`. Member paths are
+    never used on disk, and zipfile / tarfile stop reading a member at the
+    size its header declared, so the scanned limits hold.
+    """
+    archive.seek(0)
+    if members and isinstance(members[0], zipfile.ZipInfo):
+        with zipfile.ZipFile(archive) as zf:
+            for info in members:
+                with zf.open(info) as member:
+                    items.append(_spool(member, os.path.basename(info.filename)))
+        return
+    with tarfile.open(fileobj=archive, mode='r:*') as tf:
+        for member in members:
+            items.append(_spool(tf.extractfile(member), os.path.basename(member.name)))
+
+
+def collect_sources(files, archives) -> List[Dict[str, Any]]:
+    """
+    Spool uploaded CSVs and the CSVs inside uploaded archives; non-CSV files
+    become error items. Raises ValueError for unreadable archives and for
+    batches over the file count or size limits, before spooling anything.
+    """
+    limits = BatchLimits()
+    for uploaded in files:
+        limits.add(uploaded.size or 0)
+    scanned = [(archive, _scan_archive(archive, limits)) for archive in archives]
+
+    items = []
+    try:
+        for uploaded in files:
+            if _is_csv(uploaded.name):
+                items.append(_spool(uploaded, uploaded.name))
+            else:
+                items.append({'file_name': uploaded.name, 'error': 'File must be a CSV'})
+        for archive, members in scanned:
+            _expand_archive(archive, members, items)
+    except Exception:
+        discard(items)
+        raise
+    return items
+
+
+def discard(items: List[Dict[str, Any]]) -> None:
+    """Remove the spooled files of batch items."""
+    for item in items:
+        if 'spool_path' in item:
+            try:
+                os.remove(item['spool_path'])
+            except OSError:
+                pass
+
+
+def _parse_all(items: List[Dict[str, Any]]) -> None:
+    """Parse items into new storage files, concurrently when a pool is configured."""
+    pool = get_process_pool()
+    chunk_rows = settings.CSV_CHUNK_ROWS
+    futures = []
+    for item in items:
+        target = storage.storage_dir() / item['storage_name']
+        if pool is None:
+            futures.append(None)
+            try:
+                item['summary'], item['row_count'] = ingest_csv_file(item['spool_path'], target, chunk_rows)
+            except Exception as e:
+                item['error'] = e
+        else:
+            futures.append(pool.submit(ingest_csv_file, item['spool_path'], target, chunk_rows))
+    for item, future in zip(items, futures):
+        if future is None:
+            continue
+        try:
+            item['summary'], item['row_count'] = future.result()
+        except Exception as e:
+            item['error'] = e
+
+
+def store_batch(user, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Parse and save spooled batch items for `user`, then apply retention once.
+    Returns one result dict per item: file_name, status ('created',
+    'deduplicated' or 'error'), dataset_id, retained (False if retention
+    already pruned it), summary, error.
+    """
+    first_by_hash = {}
+    to_parse = []
+    duplicates = find_duplicates(user, [item['content_hash'] for item in items if 'error' not in item])
+    for item in items:
+        if 'error' in item:
+            continue
+        content_hash = item['content_hash']
+        if content_hash in first_by_hash:
+            item['same_as'] = first_by_hash[content_hash]
+            continue
+        first_by_hash[content_hash] = item
+        duplicate = duplicates.get(content_hash)
+        if duplicate is not None:
+            item['duplicate'] = duplicate
+            item['storage_name'] = duplicate.storage_path
+            item['row_count'] = duplicate.row_count
+            item['summary'] = {f: getattr(duplicate.summary, f) for f in SUMMARY_FIELDS}
+        else:
+            item['storage_name'] = storage.new_storage_name()
+            to_parse.append(item)
+
+    try:
+        started = time.perf_counter()
+        with stage('parse'):
+            _parse_all(to_parse)
+        parsed = [item for item in to_parse if 'error' not in item]
+        metrics.record_ingest(sum(item['row_count'] for item in parsed), time.perf_counter() - started,
+                              sum(item['size'] for item in parsed))
+
+        with transaction.atomic():
+            # Source rows of reused files stay locked until the new datasets are saved (see lock_datasets)
+            reusing = [item for item in items if 'duplicate' in item]
+            kept = lock_datasets(item['duplicate'].pk for item in reusing)
+            pruned = [item for item in reusing if item['duplicate'].pk not in kept]
+            if pruned:
+                # Pruned since they were found: parse these as new content
+                for item in pruned:
+                    del item['duplicate']
+                    item['storage_name'] = storage.new_storage_name()
+                to_parse.extend(pruned)
+                with stage('parse'):
+                    _parse_all(pruned)
+
+            for item in items:
+                source = item.get('same_as')
+                if source is not None:
+                    for key in ('storage_name', 'row_count', 'summary', 'error'):
+                        if key in source:
+                            item[key] = source[key]
+
+            saved = [item for item in items if 'error' not in item]
+            with stage('db_write'):
+                datasets = UploadedDataset.objects.bulk_create([
+                    UploadedDataset(
+                        user=user,
+                        file_name=item['file_name'],
+                        storage_path=item['storage_name'],
+                        row_count=item['row_count'],
+                        content_hash=item['content_hash'],
+                    )
+                    for item in saved
+                ])
+                DataSummary.objects.bulk_create([
+                    DataSummary(dataset=dataset, **{f: item['summary'].get(f) for f in SUMMARY_FIELDS})
+                    for dataset, item in zip(datasets, saved)
+                ])
+                TypeAggregate.objects.bulk_create([
+                    aggregate for dataset, item in zip(datasets, saved)
+                    for aggregate in build_aggregates(dataset, item['summary'])
+                ])
+    except Exception:
+        for item in to_parse:
+            storage.delete_file(item['storage_name'])
+        raise
+    finally:
+        discard(items)
+
+    for dataset, item in zip(datasets, saved):
+        item['dataset'] = dataset
+
+    with stage('prune'):
+        after_upload(user)
+    retained = set(UploadedDataset.objects.filter(pk__in=[d.pk for d in datasets]).values_list('pk', flat=True))
+
+    results = []
+    for item in items:
+        error = item.get('error')
+        if error is not None:
+            message = str(error) if isinstance(error, (str, ValueError)) else f'Failed to parse CSV: {error}'
+            results.append({'file_name': item['file_name'], 'status': 'error', 'error': message})
+        else:
+            reused = 'duplicate' in item or 'same_as' in item
+            results.append({
+                'file_name': item['file_name'],
+                'status': 'deduplicated' if reused else 'created',
+                'dataset_id': item['dataset'].id,
+                'retained': item['dataset'].id in retained,
+                'summary': {k: v for k, v in item['summary'].items() if k not in ('validation', 'outliers')},
+                'validation': item['summary'].get('validation') or {},
+            })
+    for result in results:
+        metrics.UPLOADS.inc(result=result['status'])
+    return results
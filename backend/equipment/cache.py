@@ -0,0 +1,129 @@
+"""
+Result cache and ETag helpers for dataset-derived responses.
+
+Datasets never change after upload, so anything computed from one (summary
+JSON, pages of rows, PDF reports) is keyed by dataset id + content hash and
+kept in the cache alias named by settings.REPORT_CACHE_ALIAS (LRU in-memory
+or file-system, see settings.CACHES). The same key doubles as a strong ETag,
+letting clients revalidate with If-None-Match and receive 304s.
+Large binary results (PDFs) are kept as files in settings.REPORT_FILE_DIR
+instead, so they can be streamed from disk.
+"""
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .metrics import CACHE_REQUESTS
+
+# Bump when the shape of a cached response changes so old entries and ETags are ignored
+CACHE_FORMAT = 4
+
+
+def report_cache():
+    return caches[settings.REPORT_CACHE_ALIAS]
+
+
+def _variant_digest(variant: str) -> str:
+    return hashlib.sha1(variant.encode()).hexdigest()[:12] if variant else '0'
+
+
+def cache_key(dataset, kind: str, variant: str = '') -> str:
+    """Cache key for `kind` (e.g. 'summary', 'page', 'pdf') of a dataset."""
+    return f"equipment:{CACHE_FORMAT}:{kind}:{dataset.pk}:{dataset.content_hash}:{_variant_digest(variant)}"
+
+
+def etag_for(dataset, kind: str, variant: str = '') -> str:
+    """Strong, quoted ETag for `kind` of a dataset."""
+    return f'"{dataset.pk}-{dataset.content_hash[:16]}-{kind}-{CACHE_FORMAT}-{_variant_digest(variant)}"'
+
+
+def query_variant(params) -> str:
+    """Normalize query params so equivalent URLs share a cache entry and ETag."""
+    return '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+
+
+def etag_matches(request, etag: str) -> bool:
+    """True if the request's If-None-Match already names `etag`."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def with_etag(response, etag: str):
+    """Attach validators: clients may keep the response but must revalidate."""
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    # etag_for() puts the kind third: "pk-hash-kind-format-variant"
+    CACHE_REQUESTS.inc(kind=etag.strip('"').split('-')[2], result='not_modified')
+    return with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def get_or_compute(key: str, compute):
+    """Return the cached value for `key`, computing and storing it on a miss."""
+    cache = report_cache()
+    value = cache.get(key)
+    kind = key.split(':')[2]
+    if value is None:
+        CACHE_REQUESTS.inc(kind=kind, result='miss')
+        value = compute()
+        cache.set(key, value)
+    else:
+        CACHE_REQUESTS.inc(kind=kind, result='hit')
+    return value
+
+
+def report_file(dataset, kind: str, suffix: str) -> Path:
+    """Content-addressed file path for a large result of a dataset."""
+    name = f"{dataset.pk}-{dataset.content_hash[:16]}-{kind}-{CACHE_FORMAT}{suffix}"
+    return Path(settings.REPORT_FILE_DIR) / name
+
+
+def get_or_build_file(path: Path, build) -> Path:
+    """Return `path`, first calling build(tmp_path) to create it if missing."""
+    return get_or_build_files([path], lambda targets: build(targets[path]))[0]
+
+
+def get_or_build_files(paths: List[Path], build) -> List[Path]:
+    """
+    Return `paths`, first calling build({path: tmp_path}) once for the missing
+    ones, so several results can be produced together (e.g. in parallel).
+    """
+    missing = []
+    for path in paths:
+        # report_file() puts the kind third: "pk-hash-kind-format.suffix"
+        kind = path.name.split('-')[2]
+        if path.exists():
+            CACHE_REQUESTS.inc(kind=kind, result='hit')
+        else:
+            CACHE_REQUESTS.inc(kind=kind, result='miss')
+            missing.append(path)
+    if missing:
+        missing[0].parent.mkdir(parents=True, exist_ok=True)
+        targets = {path: path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp") for path in missing}
+        build(targets)
+        for path, tmp in targets.items():
+            os.replace(tmp, path)
+    return list(paths)
+
+
+def delete_report_files(dataset_pk) -> None:
+    """Remove every result file of a dataset."""
+    for path in Path(settings.REPORT_FILE_DIR).glob(f"{dataset_pk}-*"):
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,117 @@
+"""
+Server-rendered summary charts (headless matplotlib, Agg/SVG backends).
+
+The four standard per-type charts the clients draw (count, share, average
+temperature, average pressure) are rendered from the summary alone, as PNG
+or SVG. Rendering uses matplotlib's object API (no pyplot global state) and
+runs on a process pool, so concurrent chart and report requests render in
+parallel instead of queueing on the GIL. Rendered files are cached per
+dataset content next to the PDF reports (see views and cache.report_file).
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+CHART_KINDS = ['count', 'share', 'temperature', 'pressure']
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+CHART_TITLES = {
+    'count': 'Count by type',
+    'share': 'Share by type',
+    'temperature': 'Avg temperature by type',
+    'pressure': 'Avg pressure by type',
+}
+# Same palette as the desktop ChartTab
+PALETTE = ["#00d9ff", "#e94560", "#16a085", "#f39c12", "#9b59b6", "#1abc9c", "#533483", "#0f3460"]
+CHART_SIZE = (6.4, 4.0)
+CHART_DPI = 100
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """Lazily created process pool for chart rendering; None when CHART_RENDER_WORKERS is 0."""
+    global _pool
+    if settings.CHART_RENDER_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.CHART_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context(settings.CHART_RENDER_START_METHOD),
+            )
+        return _pool
+
+
+def chart_data(summary) -> Dict[str, Any]:
+    """
+    Plain, picklable chart input from a DataSummary: labels, counts and, when
+    type_stats is available, per-type average temperature and pressure.
+    """
+    type_stats = getattr(summary, 'type_stats', None) or {}
+    if type_stats:
+        labels = list(type_stats)
+        return {
+            'labels': labels,
+            'counts': [type_stats[t].get('count') or 0 for t in labels],
+            'temperature': [type_stats[t].get('avg_temperature') for t in labels],
+            'pressure': [type_stats[t].get('avg_pressure') for t in labels],
+        }
+    type_dist = summary.type_distribution or {}
+    return {'labels': list(type_dist), 'counts': list(type_dist.values()), 'temperature': None, 'pressure': None}
+
+
+def _bar(ax, labels: List[str], values: List[Optional[float]], colors: List[str], ylabel: str) -> None:
+    ax.bar(labels, [0 if v is None else v for v in values], color=colors)
+    ax.set_xlabel('Type')
+    ax.set_ylabel(ylabel)
+    ax.tick_params(axis='x', rotation=45)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.grid(axis='y', alpha=0.3)
+    ax.set_axisbelow(True)
+
+
+def render_chart(kind: str, data: Dict[str, Any], fmt: str, output) -> None:
+    """Render chart `kind` of chart_data() output as `fmt` ('png' or 'svg') into `output` (path or binary file)."""
+    labels = data['labels']
+    colors = [PALETTE[i % len(PALETTE)] for i in range(len(labels))]
+    fig = Figure(figsize=CHART_SIZE, dpi=CHART_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    if not labels:
+        ax.text(0.5, 0.5, 'No data', ha='center', va='center')
+        ax.set_axis_off()
+    elif kind == 'count':
+        _bar(ax, labels, data['counts'], colors, 'Count')
+    elif kind == 'share':
+        ax.pie(data['counts'], labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
+        ax.axis('equal')
+    elif data.get(kind) is None:
+        ax.text(0.5, 0.5, 'Not available for this dataset', ha='center', va='center')
+        ax.set_axis_off()
+    else:
+        _bar(ax, labels, data[kind], colors, 'Avg Temperature' if kind == 'temperature' else 'Avg Pressure')
+    ax.set_title(CHART_TITLES[kind])
+    fig.tight_layout()
+    # Fixed metadata keeps SVG output byte-identical across renders
+    fig.savefig(output, format=fmt, metadata={'Date': None} if fmt == 'svg' else None)
+
+
+def render_charts(jobs: List[tuple]) -> None:
+    """
+    Render (kind, data, fmt, output_path) jobs, in parallel on the render pool
+    when it is enabled. Raises the first rendering error.
+    """
+    pool = get_render_pool()
+    if pool is None:
+        for job in jobs:
+            render_chart(*job)
+        return
+    for future in [pool.submit(render_chart, *job) for job in jobs]:
+        future.result()
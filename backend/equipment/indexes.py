@@ -0,0 +1,28 @@
+"""
+Database indexes the equipment models declare in Meta.indexes.
+
+JsonbGinIndex is django.contrib.postgres' GinIndex for JSON columns. Only
+PostgreSQL (jsonb) can build it, so on every other backend its create and
+remove statements are SQL comments: the index stays part of the model and
+migration state everywhere while SQLite databases simply go without it.
+"""
+from django.contrib.postgres.indexes import GinIndex
+from django.db.backends.ddl_references import Statement
+
+
+class JsonbGinIndex(GinIndex):
+    """GIN index on a JSONField, skipped on databases other than PostgreSQL."""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return self._skipped(schema_editor)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return self._skipped(schema_editor)
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+    def _skipped(self, schema_editor):
+        # The schema editor executes whatever it is handed, so return a no-op
+        return Statement('-- %(name)s: GIN indexes need PostgreSQL', name=self.name)
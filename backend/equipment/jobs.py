@@ -0,0 +1,123 @@
+"""
+In-process background jobs for async uploads.
+
+The upload view spools the file to disk, creates an UploadJob and submits it
+here; a small thread pool parses it off the request path while the job row
+tracks phase and progress for /api/jobs/<id>/. No external broker is needed.
+Jobs live only in the process that queued them: a job left queued or running
+by a restarted or crashed worker stops making progress and, once
+settings.UPLOAD_JOB_STALE_SECONDS have passed, is marked failed when looked at.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import UploadJob
+from .services import store_upload
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Share of the progress bar given to parsing; saving and pruning fill the rest
+PARSE_PROGRESS_SHARE = 0.9
+STALE_JOB_ERROR = 'Upload was interrupted (the server restarted); please upload the file again'
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Lazily created worker pool shared by all upload jobs in this process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.UPLOAD_JOB_WORKERS,
+                thread_name_prefix='upload-job',
+            )
+        return _executor
+
+
+def spool_dir() -> Path:
+    path = Path(settings.UPLOAD_SPOOL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def submit_upload(user, uploaded_file) -> UploadJob:
+    """Write the upload to the spool directory, create its job and queue it."""
+    job = UploadJob(user=user, file_name=uploaded_file.name, file_size=uploaded_file.size or 0)
+    spool_path = spool_dir() / f"{job.id}.csv"
+    with open(spool_path, 'wb') as fh:
+        for chunk in uploaded_file.chunks():
+            fh.write(chunk)
+    job.spool_path = str(spool_path)
+    job.save()
+    get_executor().submit(run_upload_job, job.id)
+    return job
+
+
+def _update(job_id, **fields) -> None:
+    fields['updated_at'] = timezone.now()
+    UploadJob.objects.filter(pk=job_id).update(**fields)
+
+
+def expire_stale_jobs(**filters) -> int:
+    """
+    Mark queued/running jobs (matching `filters`) that made no progress for
+    settings.UPLOAD_JOB_STALE_SECONDS as failed and drop their spooled files.
+    Returns the number of jobs expired.
+    """
+    stale = UploadJob.objects.filter(
+        status__in=UploadJob.ACTIVE_STATUSES, updated_at__lt=UploadJob.stale_before(), **filters
+    )
+    job_ids = list(stale.values_list('pk', flat=True))
+    if not job_ids:
+        return 0
+    expired = stale.filter(pk__in=job_ids).update(
+        status=UploadJob.STATUS_FAILED, phase='failed', error=STALE_JOB_ERROR, updated_at=timezone.now()
+    )
+    for job_id in job_ids:
+        try:
+            os.remove(spool_dir() / f"{job_id}.csv")
+        except OSError:
+            pass
+    return expired
+
+
+def run_upload_job(job_id) -> None:
+    """Process one spooled upload. Runs on a worker thread."""
+    try:
+        job = UploadJob.objects.select_related('user').get(pk=job_id)
+        # A job expired while it waited in the queue has already been reported failed
+        if not UploadJob.objects.filter(pk=job_id, status=UploadJob.STATUS_QUEUED).update(
+                status=UploadJob.STATUS_RUNNING, phase='parsing', updated_at=timezone.now()):
+            return
+        with open(job.spool_path, 'rb') as fh:
+
+            def progress(phase, rows):
+                if phase == 'parsing':
+                    fraction = fh.tell() / job.file_size if job.file_size else 0.0
+                    value = PARSE_PROGRESS_SHARE * min(fraction, 1.0)
+                else:
+                    value = PARSE_PROGRESS_SHARE
+                _update(job_id, phase=phase, progress=round(value, 3), rows_processed=rows)
+
+            dataset, _, _ = store_upload(job.user, job.file_name, fh, progress=progress)
+        _update(job_id, status=UploadJob.STATUS_DONE, phase='done', progress=1.0, dataset=dataset)
+    except ValueError as e:
+        _update(job_id, status=UploadJob.STATUS_FAILED, phase='failed', error=str(e))
+    except Exception as e:
+        logger.exception('Upload job %s failed', job_id)
+        _update(job_id, status=UploadJob.STATUS_FAILED, phase='failed', error=f'Failed to parse CSV: {str(e)}')
+    finally:
+        try:
+            os.remove(spool_dir() / f"{job_id}.csv")
+        except OSError:
+            pass
+        connections.close_all()
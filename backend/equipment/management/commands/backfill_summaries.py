@@ -0,0 +1,49 @@
+"""
+Fill summary fields that older datasets are missing (see services.BACKFILL_FIELDS).
+
+    python manage.py backfill_summaries --batch-size 100
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from equipment.models import DataSummary
+from equipment.services import BACKFILL_FIELDS, backfill_summary
+
+
+class Command(BaseCommand):
+    help = 'Compute and save missing summary fields (e.g. type_stats) for existing datasets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Summaries loaded per query (bounds memory).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many summaries need backfilling.')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        missing = Q()
+        for field in BACKFILL_FIELDS:
+            missing |= Q(**{f'{field}__isnull': True})
+        pending = DataSummary.objects.filter(missing).select_related('dataset').defer('dataset__raw_data')
+        total = pending.count()
+        self.stdout.write(f'{total} summaries need backfilling')
+        if options['dry_run'] or not total:
+            return
+
+        done = updated = 0
+        last_pk = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for summary in batch:
+                try:
+                    if backfill_summary(summary):
+                        updated += 1
+                except Exception as e:
+                    self.stderr.write(f'Dataset {summary.dataset_id}: {e}')
+            done += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'[{done}/{total}] processed, {updated} updated')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} of {total} summaries'))
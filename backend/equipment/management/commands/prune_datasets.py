@@ -0,0 +1,16 @@
+"""
+Apply dataset retention for every user (for cron or other schedulers).
+
+    python manage.py prune_datasets
+"""
+from django.core.management.base import BaseCommand
+
+from equipment.retention import prune_all
+
+
+class Command(BaseCommand):
+    help = "Delete datasets beyond each user's retention count or age."
+
+    def handle(self, *args, **options):
+        deleted = prune_all()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} datasets'))
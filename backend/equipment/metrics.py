@@ -0,0 +1,265 @@
+"""
+In-process Prometheus metrics, exposed at /metrics in the text exposition format.
+
+Hot paths only bump counters and histogram buckets under a lock (a few dict
+lookups per request). Values that are expensive or shared between processes
+(bytes stored, active jobs, dataset count) are read when /metrics is scraped.
+Each server process keeps its own counters, so scrape every process (or run
+one) for complete totals.
+"""
+import bisect
+import hmac
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .models import UploadedDataset, UploadJob
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, '')) for n in self.label_names)
+
+    def label_sets(self) -> List[Tuple[str, ...]]:
+        with self._lock:
+            return list(self._values)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}' for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            state['counts'][index] += 1
+            state['sum'] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v['counts']), v['sum']) for k, v in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge whose samples come from a callable evaluated at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, collect, labels: Iterable[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f'{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}' for k, v in values.items()]
+
+
+REQUESTS = Counter('equipment_http_requests_total', 'HTTP requests by view, method and status code.',
+                   ['view', 'method', 'status'])
+REQUEST_LATENCY = Histogram('equipment_http_request_duration_seconds', 'Time to produce a response, by view.',
+                            ['view'])
+REQUEST_ERRORS = Counter('equipment_http_request_errors_total', 'Responses with status >= 500.',
+                         ['view'])
+ROWS_INGESTED = Counter('equipment_rows_ingested_total', 'CSV rows parsed into columnar storage.')
+INGEST_SECONDS = Counter('equipment_ingest_seconds_total',
+                         'Time spent parsing CSVs into storage; rate(rows) / rate(seconds) is rows per second.')
+BYTES_UPLOADED = Counter('equipment_upload_bytes_total', 'Bytes of CSV received by uploads.')
+UPLOADS = Counter('equipment_uploads_total', 'Uploaded files by outcome (created, deduplicated, error).', ['result'])
+CACHE_REQUESTS = Counter('equipment_cache_requests_total', 'Result cache lookups by kind and result (hit, miss, not_modified).',
+                         ['kind', 'result'])
+
+
+def record_ingest(rows: int, seconds: float, size: int = 0) -> None:
+    """Account for one parsed upload."""
+    ROWS_INGESTED.inc(rows)
+    INGEST_SECONDS.inc(seconds)
+    if size:
+        BYTES_UPLOADED.inc(size)
+
+
+def _cache_hit_ratio():
+    kinds = {labels[0] for labels in CACHE_REQUESTS.label_sets()}
+    ratios = {}
+    for kind in kinds:
+        hits = CACHE_REQUESTS.value(kind=kind, result='hit') + CACHE_REQUESTS.value(kind=kind, result='not_modified')
+        total = hits + CACHE_REQUESTS.value(kind=kind, result='miss')
+        if total:
+            ratios[(kind,)] = round(hits / total, 4)
+    return ratios
+
+
+def _dir_bytes(path) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
+
+
+def _bytes_stored():
+    return {
+        ('datasets',): _dir_bytes(settings.DATASET_STORAGE_DIR),
+        ('reports',): _dir_bytes(settings.REPORT_FILE_DIR),
+    }
+
+
+def _active_jobs():
+    active = UploadJob.ACTIVE_STATUSES
+    counts = {(s,): 0 for s in active}
+    # Stale jobs lost their worker and are not active any more (see jobs.expire_stale_jobs)
+    rows = (UploadJob.objects.filter(status__in=active, updated_at__gte=UploadJob.stale_before())
+            .order_by().values('status').annotate(n=Count('id')))
+    for row in rows:
+        counts[(row['status'],)] = row['n']
+    return counts
+
+
+def _datasets():
+    return UploadedDataset.objects.count()
+
+
+_started = time.time()
+
+REGISTRY = [
+    REQUESTS, REQUEST_LATENCY, REQUEST_ERRORS,
+    ROWS_INGESTED, INGEST_SECONDS, BYTES_UPLOADED, UPLOADS, CACHE_REQUESTS,
+    Gauge('equipment_cache_hit_ratio', 'Share of result cache lookups served without recomputing, by kind.',
+          _cache_hit_ratio, ['kind']),
+    Gauge('equipment_bytes_stored', 'Bytes on disk by store (dataset files, report files).', _bytes_stored, ['store']),
+    Gauge('equipment_upload_jobs_active', 'Upload jobs queued or running.', _active_jobs, ['status']),
+    Gauge('equipment_datasets', 'Datasets stored.', _datasets),
+    Gauge('equipment_process_start_time_seconds', 'Start time of this process since the Unix epoch.', lambda: _started),
+]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+def view_label(request) -> str:
+    """Short view name for a resolved request (e.g. 'upload_file'), 'unmatched' otherwise."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name.rsplit('.', 1)[-1]
+
+
+class MetricsMiddleware:
+    """Count requests and observe their latency per view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        # Unhandled view exceptions arrive here already converted to 500 responses
+        response = self.get_response(request)
+        view = view_label(request)
+        REQUESTS.inc(view=view, method=request.method, status=str(response.status_code))
+        if response.status_code >= 500:
+            REQUEST_ERRORS.inc(view=view)
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view=view)
+        return response
+
+
+def _metrics_allowed(request) -> bool:
+    if settings.METRICS_PUBLIC:
+        return True
+    token: Optional[str] = settings.METRICS_TOKEN
+    # Compared as bytes: compare_digest rejects str with non-ASCII characters
+    header = request.META.get('HTTP_AUTHORIZATION', '').encode('utf-8', 'surrogateescape')
+    if token and hmac.compare_digest(header, f'Bearer {token}'.encode()):
+        return True
+    # REMOTE_ADDR is the direct peer; behind a proxy list the proxy or use a token
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requests must send settings.METRICS_TOKEN as
+    'Authorization: Bearer <token>' or come from settings.METRICS_ALLOWED_IPS,
+    unless settings.METRICS_PUBLIC opens it to everyone.
+    """
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden('Forbidden\n', content_type='text/plain')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
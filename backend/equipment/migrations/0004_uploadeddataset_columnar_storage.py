@@ -0,0 +1,142 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+
+# A frozen copy of version 1 of the equipment.storage file format, so this
+# migration keeps working however the app's storage module changes later.
+FORMAT_VERSION = 1
+META_NAME = 'meta.json'
+NUMERIC = 'numeric'
+CATEGORY = 'category'
+
+
+def _storage_dir():
+    from pathlib import Path
+    from django.conf import settings
+
+    path = Path(settings.DATASET_STORAGE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _write_array(zf, name, arr):
+    import numpy as np
+
+    with zf.open(name, 'w', force_zip64=True) as fh:
+        np.lib.format.write_array(fh, np.ascontiguousarray(arr), allow_pickle=False)
+
+
+def _write_frame(path, df):
+    """Write df as a one-chunk dataset file, via a temp file moved into place."""
+    import json
+    import os
+    import zipfile
+
+    import numpy as np
+    import pandas as pd
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        kinds = []
+        for i, col in enumerate(df.columns):
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                _write_array(zf, f"c0/{i}.npy", series.to_numpy())
+                kinds.append(NUMERIC)
+            else:
+                codes, categories = pd.factorize(series, use_na_sentinel=True)
+                _write_array(zf, f"c0/{i}.npy", codes.astype(np.int32))
+                _write_array(zf, f"c0/{i}.cat.npy", np.asarray([str(c) for c in categories], dtype=str))
+                kinds.append(CATEGORY)
+        meta = {
+            'version': FORMAT_VERSION,
+            'columns': [str(c) for c in df.columns],
+            'chunks': [{'rows': int(len(df)), 'kinds': kinds}],
+        }
+        zf.writestr(META_NAME, json.dumps(meta))
+    os.replace(tmp_path, path)
+
+
+def _read_records(path):
+    """Load every row of a dataset file as JSON-safe dicts (NaN becomes None)."""
+    import json
+    import zipfile
+
+    import numpy as np
+    import pandas as pd
+
+    def read_array(zf, name):
+        with zf.open(name) as fh:
+            return np.lib.format.read_array(fh, allow_pickle=False)
+
+    records = []
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read(META_NAME))
+        for index, chunk in enumerate(meta['chunks']):
+            data = {}
+            for i, name in enumerate(meta['columns']):
+                values = read_array(zf, f"c{index}/{i}.npy")
+                if chunk['kinds'][i] == CATEGORY:
+                    labels = read_array(zf, f"c{index}/{i}.cat.npy").astype(object)
+                    values = np.asarray(pd.Categorical.from_codes(values, categories=labels), dtype=object)
+                data[name] = values
+            df = pd.DataFrame(data, columns=meta['columns'])
+            records.extend(df.astype(object).where(df.notna(), None).to_dict(orient='records'))
+    return records
+
+
+def raw_data_to_columns(apps, schema_editor):
+    """Move legacy raw_data rows into columnar storage files."""
+    import uuid
+
+    import pandas as pd
+
+    UploadedDataset = apps.get_model('equipment', 'UploadedDataset')
+    legacy = UploadedDataset.objects.filter(storage_path='').exclude(raw_data=[])
+    for dataset in legacy.iterator(chunk_size=50):
+        df = pd.DataFrame(dataset.raw_data)
+        df.columns = [str(c).strip() for c in df.columns]
+        name = f"{uuid.uuid4().hex}.cols"
+        _write_frame(_storage_dir() / name, df)
+        dataset.row_count = len(df)
+        dataset.storage_path = name
+        dataset.raw_data = []
+        dataset.save(update_fields=['storage_path', 'row_count', 'raw_data'])
+
+
+def columns_to_raw_data(apps, schema_editor):
+    """Restore raw_data rows from columnar storage files."""
+    import os
+
+    UploadedDataset = apps.get_model('equipment', 'UploadedDataset')
+    for dataset in UploadedDataset.objects.exclude(storage_path='').iterator(chunk_size=50):
+        path = _storage_dir() / dataset.storage_path
+        dataset.raw_data = _read_records(path)
+        dataset.storage_path = ''
+        dataset.save(update_fields=['storage_path', 'raw_data'])
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0003_datasummary_type_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadeddataset',
+            name='storage_path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='uploadeddataset',
+            name='row_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(raw_data_to_columns, columns_to_raw_data),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2
+
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def hash_existing(apps, schema_editor):
+    """Give existing datasets a content hash derived from their stored data file."""
+    # Reads the files directly rather than through equipment.storage, so later
+    # changes to that module can't change what this migration does
+    store = Path(settings.DATASET_STORAGE_DIR)
+    UploadedDataset = apps.get_model('equipment', 'UploadedDataset')
+    for dataset in UploadedDataset.objects.filter(content_hash='').iterator(chunk_size=50):
+        digest = hashlib.sha256()
+        if dataset.storage_path:
+            with open(store / dataset.storage_path, 'rb') as fh:
+                for block in iter(lambda: fh.read(1 << 20), b''):
+                    digest.update(block)
+        else:
+            digest.update(repr(dataset.raw_data).encode())
+        dataset.content_hash = digest.hexdigest()
+        dataset.save(update_fields=['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_uploadjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadeddataset',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(hash_existing, migrations.RunPython.noop),
+    ]
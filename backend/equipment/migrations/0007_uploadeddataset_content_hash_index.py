@@ -0,0 +1,18 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_uploadeddataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadeddataset',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
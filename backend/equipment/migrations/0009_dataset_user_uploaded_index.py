@@ -0,0 +1,17 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_retentionpolicy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='uploadeddataset',
+            index=models.Index(fields=['user', '-uploaded_at'], name='dataset_user_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2
+
+from django.db import migrations
+import equipment.indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_dataset_user_uploaded_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datasummary',
+            index=equipment.indexes.JsonbGinIndex(fields=['type_distribution'], name='summary_type_dist_gin'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SUMMARY_FIELDS = ['total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_stats', 'column_stats']
+
+
+# A frozen copy of equipment.trends.aggregate_rows as of this migration, so
+# later changes to that module can't change what this migration does
+TYPE_STATS_MEANS = {'Temperature': 'avg_temperature', 'Pressure': 'avg_pressure'}
+SUMMARY_MEANS = {'Flowrate': 'avg_flowrate', 'Pressure': 'avg_pressure', 'Temperature': 'avg_temperature'}
+
+
+def _from_column_stats(stats):
+    quantiles = stats.get('quantiles') or {}
+    row = {stat: stats.get(stat) for stat in ['mean', 'std', 'min', 'max']}
+    row.update({stat: quantiles.get(stat) for stat in ['p5', 'p25', 'p50', 'p75', 'p95']})
+    row['count'] = int(stats.get('count') or 0)
+    return row
+
+
+def _aggregate_rows(summary):
+    """TypeAggregate field values for a dict of DataSummary fields."""
+    rows = []
+    column_stats = summary.get('column_stats') or {}
+    if column_stats.get('columns'):
+        for col, stats in column_stats['columns'].items():
+            rows.append({'equipment_type': '', 'column': col, **_from_column_stats(stats)})
+        for eq_type, columns in column_stats.get('types', {}).items():
+            for col, stats in columns.items():
+                rows.append({'equipment_type': eq_type, 'column': col, **_from_column_stats(stats)})
+        return rows
+
+    total = int(summary.get('total_count') or 0)
+    for col, field in SUMMARY_MEANS.items():
+        rows.append({'equipment_type': '', 'column': col, 'count': total, 'mean': summary.get(field)})
+    for eq_type, stats in (summary.get('type_stats') or {}).items():
+        for col, key in TYPE_STATS_MEANS.items():
+            rows.append({'equipment_type': eq_type, 'column': col,
+                         'count': int(stats.get('count') or 0), 'mean': stats.get(key)})
+    return rows
+
+
+def summaries_to_aggregates(apps, schema_editor):
+    """Materialize TypeAggregate rows for every existing DataSummary."""
+    DataSummary = apps.get_model('equipment', 'DataSummary')
+    TypeAggregate = apps.get_model('equipment', 'TypeAggregate')
+    summaries = DataSummary.objects.only('dataset_id', *SUMMARY_FIELDS)
+    for summary in summaries.iterator(chunk_size=100):
+        data = {f: getattr(summary, f) for f in SUMMARY_FIELDS}
+        TypeAggregate.objects.bulk_create([
+            TypeAggregate(dataset_id=summary.dataset_id, **row) for row in _aggregate_rows(data)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0012_datasummary_column_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TypeAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_type', models.CharField(blank=True, default='', max_length=255)),
+                ('column', models.CharField(max_length=32)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(blank=True, null=True)),
+                ('std', models.FloatField(blank=True, null=True)),
+                ('min', models.FloatField(blank=True, null=True)),
+                ('max', models.FloatField(blank=True, null=True)),
+                ('p5', models.FloatField(blank=True, null=True)),
+                ('p25', models.FloatField(blank=True, null=True)),
+                ('p50', models.FloatField(blank=True, null=True)),
+                ('p75', models.FloatField(blank=True, null=True)),
+                ('p95', models.FloatField(blank=True, null=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='equipment.uploadeddataset')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='typeaggregate',
+            constraint=models.UniqueConstraint(fields=('dataset', 'column', 'equipment_type'), name='aggregate_unique'),
+        ),
+        migrations.RunPython(summaries_to_aggregates, migrations.RunPython.noop),
+    ]
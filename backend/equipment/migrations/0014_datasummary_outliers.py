@@ -0,0 +1,18 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0013_typeaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasummary',
+            name='outliers',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
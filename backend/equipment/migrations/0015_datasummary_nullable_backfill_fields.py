@@ -0,0 +1,44 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+BACKFILL_FIELDS = ['type_stats', 'column_stats', 'outliers']
+
+
+def empty_to_null(apps, schema_editor):
+    """Before this migration {} meant 'not computed yet'; NULL means that now."""
+    DataSummary = apps.get_model('equipment', 'DataSummary')
+    for field in BACKFILL_FIELDS:
+        DataSummary.objects.filter(**{field: {}}).update(**{field: None})
+
+
+def null_to_empty(apps, schema_editor):
+    DataSummary = apps.get_model('equipment', 'DataSummary')
+    for field in BACKFILL_FIELDS:
+        DataSummary.objects.filter(**{f'{field}__isnull': True}).update(**{field: {}})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0014_datasummary_outliers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='datasummary',
+            name='type_stats',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='datasummary',
+            name='column_stats',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='datasummary',
+            name='outliers',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+        migrations.RunPython(empty_to_null, null_to_empty),
+    ]
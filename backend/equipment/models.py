@@ -1,8 +1,16 @@
 """
 Models for the equipment app.
 """
+import uuid
+from datetime import timedelta
+
+import pandas as pd
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+from . import storage
+from .indexes import JsonbGinIndex
 
 
 class UploadedDataset(models.Model):
@@ -17,10 +25,59 @@ class UploadedDataset(models.Model):
     )
     file_name = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    raw_data = models.JSONField(default=list)  # Parsed CSV rows as list of dicts
+    raw_data = models.JSONField(default=list)  # Legacy: parsed CSV rows as list of dicts
+    # Columnar data file (name inside settings.DATASET_STORAGE_DIR); empty for legacy rows
+    storage_path = models.CharField(max_length=255, blank=True, default='')
+    row_count = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)  # SHA-256 of the uploaded file
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # History, detail and retention lookups all filter by user and order by newest first
+            models.Index(fields=['user', '-uploaded_at'], name='dataset_user_uploaded_idx'),
+        ]
+
+    def load_frame(self, columns=None):
+        """Load the dataset rows as a DataFrame, optionally only some columns."""
+        if self.storage_path:
+            return storage.read_frame(storage.storage_file(self.storage_path), columns)
+        df = pd.DataFrame(self.raw_data or [])
+        df.columns = [str(c).strip() for c in df.columns]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df
+
+    def iter_frames(self, columns=None):
+        """Yield the dataset rows one stored chunk at a time."""
+        if self.storage_path:
+            yield from storage.iter_frames(storage.storage_file(self.storage_path), columns)
+        else:
+            yield self.load_frame(columns)
+
+    def column_names(self):
+        """Column names of the stored rows."""
+        if self.storage_path:
+            return list(storage.read_meta(storage.storage_file(self.storage_path))['columns'])
+        return list(self.load_frame().columns)
+
+    def load_slice(self, start, stop, columns=None):
+        """Load rows [start, stop) without decoding the rest of the dataset."""
+        if self.storage_path:
+            return storage.read_slice(storage.storage_file(self.storage_path), start, stop, columns)
+        return self.load_frame(columns).iloc[start:stop].reset_index(drop=True)
+
+    def load_positions(self, rows, columns=None):
+        """Load the rows at ascending positions `rows` without decoding unrelated chunks."""
+        if self.storage_path:
+            return storage.read_rows(storage.storage_file(self.storage_path), rows, columns)
+        return self.load_frame(columns).iloc[list(rows)].reset_index(drop=True)
+
+    def load_rows(self):
+        """Return the dataset rows as a list of dicts (JSON-safe)."""
+        if self.storage_path:
+            return storage.frame_to_records(self.load_frame())
+        return self.raw_data or []
 
     def __str__(self):
         owner = getattr(self.user, 'username', 'unknown-user')
@@ -39,8 +96,125 @@ class DataSummary(models.Model):
     avg_pressure = models.FloatField()
     avg_temperature = models.FloatField()
     type_distribution = models.JSONField(default=dict)  # e.g. {"Pump": 5, "Valve": 3}
+    # The next three are NULL until computed (older datasets, see services.backfill_summary);
+    # a computed result may legitimately be empty.
     # Per-type: {"Pump": {"count": 5, "avg_temperature": 76.5, "avg_pressure": 12.1}, ...}
-    type_stats = models.JSONField(default=dict, blank=True)
+    type_stats = models.JSONField(null=True, blank=True, default=None)
+    # Std-dev, quantiles and histograms per column, overall and per type (utils.SummaryAccumulator.column_stats())
+    column_stats = models.JSONField(null=True, blank=True, default=None)
+    # Flagged Pressure/Temperature rows per column (outliers.OutlierDetector.result())
+    outliers = models.JSONField(null=True, blank=True, default=None)
+    # Row-level problems found on upload (utils.ValidationReport.to_dict()); empty for older datasets
+    validation = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Key lookups on type_distribution (PostgreSQL only, see indexes.JsonbGinIndex)
+            JsonbGinIndex(fields=['type_distribution'], name='summary_type_dist_gin'),
+        ]
 
     def __str__(self):
         return f"Summary for {self.dataset.file_name}"
+
+
+class TypeAggregate(models.Model):
+    """
+    Statistics of one numeric column for one equipment type of a dataset
+    (equipment_type '' covers the whole dataset), copied out of the DataSummary
+    when it is saved so trend and comparison queries read small indexed rows
+    instead of summary JSON or dataset rows.
+    """
+    dataset = models.ForeignKey(
+        UploadedDataset,
+        on_delete=models.CASCADE,
+        related_name='aggregates',
+    )
+    equipment_type = models.CharField(max_length=255, blank=True, default='')
+    column = models.CharField(max_length=32)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(null=True, blank=True)
+    std = models.FloatField(null=True, blank=True)
+    min = models.FloatField(null=True, blank=True)
+    max = models.FloatField(null=True, blank=True)
+    p5 = models.FloatField(null=True, blank=True)
+    p25 = models.FloatField(null=True, blank=True)
+    p50 = models.FloatField(null=True, blank=True)
+    p75 = models.FloatField(null=True, blank=True)
+    p95 = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Also the index trend and compare lookups use (dataset first)
+            models.UniqueConstraint(fields=['dataset', 'column', 'equipment_type'], name='aggregate_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.column} of {self.equipment_type or 'all types'} in dataset {self.dataset_id}"
+
+
+class UploadJob(models.Model):
+    """Background processing state for an upload submitted in async mode."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_jobs',
+    )
+    file_name = models.CharField(max_length=255)
+    spool_path = models.CharField(max_length=255, blank=True, default='')  # Stored upload awaiting processing
+    file_size = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    phase = models.CharField(max_length=32, default='queued')  # queued, parsing, saving, pruning, done
+    progress = models.FloatField(default=0.0)  # 0.0 - 1.0
+    rows_processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    dataset = models.ForeignKey(
+        UploadedDataset,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Job {self.id} ({self.file_name}: {self.status})"
+
+    @staticmethod
+    def stale_before():
+        """Active jobs not updated since this time have lost their worker (see jobs.expire_stale_jobs)."""
+        return timezone.now() - timedelta(seconds=settings.UPLOAD_JOB_STALE_SECONDS)
+
+    def is_stale(self) -> bool:
+        return self.status in self.ACTIVE_STATUSES and self.updated_at < self.stale_before()
+
+
+class RetentionPolicy(models.Model):
+    """Per-user overrides for how many datasets are kept and for how long."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='retention_policy',
+    )
+    # None falls back to settings.RETENTION_MAX_DATASETS / RETENTION_MAX_AGE_DAYS
+    max_datasets = models.PositiveIntegerField(null=True, blank=True)
+    max_age_days = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Retention for {getattr(self.user, 'username', 'unknown-user')}"
@@ -0,0 +1,135 @@
+"""
+Outlier detection: Pressure and Temperature values far from their equipment type's norm.
+
+Runs after the summary is computed (the last stage of ingest), using each
+type's mean, std-dev and quartiles from column_stats. The stored rows are
+then scanned once, chunk by chunk, and every value is scored with vectorized
+NumPy: it is flagged when |z| > Z_THRESHOLD or when it lies outside the Tukey
+fences q1 - IQR_FACTOR * IQR, q3 + IQR_FACTOR * IQR of its type. Only the
+flagged row indices, z-scores and rules are kept, at most MAX_ROWS per column
+(the most extreme), so the result fits in DataSummary.outliers.
+
+Like ingest, this touches no database or settings and can run in a worker process.
+"""
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+OUTLIER_COLUMNS = ['Pressure', 'Temperature']
+Z_THRESHOLD = 3.0
+IQR_FACTOR = 1.5
+# Types with fewer values than this have no meaningful norm and are never flagged
+MIN_TYPE_ROWS = 5
+# Flagged rows kept per column, most extreme first
+MAX_ROWS = 500
+# Bits of a flagged row's rule
+RULE_Z = 1
+RULE_IQR = 2
+
+
+class OutlierDetector:
+    """Streaming outlier scan over chunks with Type and OUTLIER_COLUMNS."""
+
+    def __init__(self, column_stats: Dict[str, Any]):
+        type_stats = column_stats.get('types', {})
+        self.types = pd.Index(list(type_stats))
+        self.rows_seen = 0
+        self.norms = {}
+        self.flagged = {col: [] for col in OUTLIER_COLUMNS}
+        for col in OUTLIER_COLUMNS:
+            # One slot per type plus a trailing NaN slot for rows of unknown/missing type
+            norms = np.full((4, len(self.types) + 1), np.nan)
+            for i, eq_type in enumerate(self.types):
+                stats = type_stats[eq_type].get(col) or {}
+                quantiles = stats.get('quantiles') or {}
+                if (stats.get('count') or 0) < MIN_TYPE_ROWS:
+                    continue
+                q1, q3 = quantiles.get('p25'), quantiles.get('p75')
+                if stats.get('std'):
+                    norms[0, i], norms[1, i] = stats['mean'], stats['std']
+                if q1 is not None and q3 is not None:
+                    norms[2, i], norms[3, i] = q1 - IQR_FACTOR * (q3 - q1), q3 + IQR_FACTOR * (q3 - q1)
+            self.norms[col] = norms
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Score one chunk; row numbers continue from the previous chunks."""
+        codes = self.types.get_indexer(chunk['Type'].astype(object))
+        codes[codes < 0] = len(self.types)
+        for col in OUTLIER_COLUMNS:
+            mean, std, low, high = self.norms[col][:, codes]
+            values = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z = (values - mean) / std
+                rule = np.where(np.abs(z) > Z_THRESHOLD, RULE_Z, 0) | np.where((values < low) | (values > high), RULE_IQR, 0)
+            hits = np.flatnonzero(rule)
+            if len(hits):
+                self.flagged[col].append((hits + self.rows_seen, z[hits], rule[hits], codes[hits]))
+        self.rows_seen += len(chunk)
+
+    def _column_result(self, col: str) -> Dict[str, Any]:
+        parts = self.flagged[col]
+        if not parts:
+            return {'count': 0, 'by_type': {}, 'rows': [], 'z': [], 'rules': []}
+        rows, z, rules, codes = (np.concatenate(p) for p in zip(*parts))
+        labels = list(self.types) + ['']
+        by_type = pd.Series(codes).value_counts()
+        result = {
+            'count': int(len(rows)),
+            'by_type': {labels[code]: int(n) for code, n in by_type.items() if code < len(self.types)},
+        }
+        if len(rows) > MAX_ROWS:
+            # Keep the most extreme; IQR-only flags (no usable z) rank last
+            keep = np.argsort(-np.nan_to_num(np.abs(z), nan=0.0), kind='stable')[:MAX_ROWS]
+            keep.sort()
+            rows, z, rules = rows[keep], z[keep], rules[keep]
+        result['rows'] = rows.tolist()
+        result['z'] = [None if np.isnan(v) else round(float(v), 2) for v in z]
+        result['rules'] = rules.tolist()
+        return result
+
+    def result(self) -> Dict[str, Any]:
+        """
+        {'params': {...}, 'columns': {column: {'count', 'by_type', 'rows', 'z', 'rules'}}}
+        where rows are 0-based row numbers in ascending order and rules are
+        bit flags (RULE_Z, RULE_IQR). 'count' includes rows beyond MAX_ROWS.
+        """
+        return {
+            'params': {'z_threshold': Z_THRESHOLD, 'iqr_factor': IQR_FACTOR,
+                       'min_type_rows': MIN_TYPE_ROWS, 'max_rows': MAX_ROWS},
+            'columns': {col: self._column_result(col) for col in OUTLIER_COLUMNS},
+        }
+
+
+def find_outliers(frames: Iterable[pd.DataFrame], column_stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Outliers of a dataset given as DataFrame chunks in row order (see OutlierDetector.result)."""
+    detector = OutlierDetector(column_stats)
+    for chunk in frames:
+        detector.update(chunk)
+    return detector.result()
+
+
+def rule_names(rule: int) -> List[str]:
+    """['z', 'iqr'] style names of a rule's bits."""
+    return [name for bit, name in ((RULE_Z, 'z'), (RULE_IQR, 'iqr')) if rule & bit]
+
+
+def flagged_rows(dataset, outliers: Dict[str, Any], column: str, types=None) -> List[Dict[str, Any]]:
+    """
+    Stored flagged rows of `column` joined with their Equipment Name, Type and
+    value (only the storage chunks holding them are read), in row order.
+    `types` optionally keeps only those equipment types.
+    """
+    entry = (outliers.get('columns') or {}).get(column)
+    if not entry or not entry['rows']:
+        return []
+    frame = dataset.load_positions(entry['rows'], ['Equipment Name', 'Type', column])
+    frame = frame.astype(object).where(frame.notna(), None)
+    records = []
+    for row, z, rule, name, eq_type, value in zip(entry['rows'], entry['z'], entry['rules'], frame['Equipment Name'],
+                                                   frame['Type'], frame[column]):
+        if types and eq_type not in types:
+            continue
+        records.append({'row': row, 'Equipment Name': name, 'Type': eq_type, column: value,
+                        'z': z, 'rules': rule_names(rule)})
+    return records
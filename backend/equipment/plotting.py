@@ -0,0 +1,215 @@
+"""
+Server-side chart data: pre-aggregated, downsampled series for large datasets.
+
+Clients never receive raw rows for plotting. A scatter of two columns is
+returned as a 2D histogram (counts on a bins x bins grid, filled chunk by
+chunk with one bincount each), and a column in row order is reduced to a
+fixed point budget with Largest-Triangle-Three-Buckets (LTTB), which keeps
+the spikes and dips a line chart would show. Series are pre-reduced while
+streaming (first, last, min and max sample per row-index bucket, as in M4),
+so LTTB runs on a bounded candidate set. Either way memory and response size
+depend on the requested bins / points, not on the number of rows.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PLOT_KINDS = ['histogram2d', 'series']
+# Row-index buckets per requested series point kept while streaming (each holds up to 4 samples)
+SERIES_BUCKETS_PER_POINT = 2
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices of at most `points` samples of the ordered series (x, y) chosen by
+    Largest-Triangle-Three-Buckets (`points` >= 3). The first and last samples are always kept.
+    """
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    # points - 2 buckets over the samples between the first and the last
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    starts, stops = edges[:-1], edges[1:]
+    sum_x, sum_y = np.r_[0.0, np.cumsum(x)], np.r_[0.0, np.cumsum(y)]
+    sizes = stops - starts
+    mean_x = (sum_x[stops] - sum_x[starts]) / sizes
+    mean_y = (sum_y[stops] - sum_y[starts]) / sizes
+    # Third triangle vertex: the next bucket's average, the last sample after the final bucket
+    next_x, next_y = np.r_[mean_x[1:], x[-1]], np.r_[mean_y[1:], y[-1]]
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        s, e = starts[i], stops[i]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[s:e] - ay) - (ax - x[s:e]) * (next_y[i] - ay))
+        a = s + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _values(chunk: pd.DataFrame, column: str) -> np.ndarray:
+    return pd.to_numeric(chunk[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class SeriesReducer:
+    """
+    Streaming M4 reduction of one column: the first, last, min and max sample of
+    each of `buckets` equal row-index ranges over `total_rows` rows, so at most
+    4 * buckets candidates are kept however many rows are fed.
+    """
+
+    def __init__(self, buckets: int, total_rows: int):
+        self.buckets = max(buckets, 1)
+        self.total_rows = max(total_rows, 1)
+        self.count = 0
+        # Row number per bucket and role (first, last, min, max); -1 while empty
+        self.rows = np.full((4, self.buckets), -1, dtype=np.int64)
+        self.values = np.full((4, self.buckets), np.nan)
+
+    def update(self, positions: np.ndarray, values: np.ndarray) -> None:
+        """Add samples at increasing row `positions` (NaN values already removed)."""
+        if not len(positions):
+            return
+        self.count += len(positions)
+        bucket = np.minimum(positions * self.buckets // self.total_rows, self.buckets - 1)
+        # Positions increase, so each bucket is one contiguous segment of this chunk
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], len(bucket)] - 1
+        ids = bucket[starts]
+        low = np.lexsort((values, bucket))[starts]
+        high = np.lexsort((-values, bucket))[starts]
+
+        new = self.rows[0, ids] < 0
+        self.rows[0, ids[new]], self.values[0, ids[new]] = positions[starts[new]], values[starts[new]]
+        self.rows[1, ids], self.values[1, ids] = positions[ends], values[ends]
+        lower = new | (values[low] < self.values[2, ids])
+        self.rows[2, ids[lower]], self.values[2, ids[lower]] = positions[low[lower]], values[low[lower]]
+        higher = new | (values[high] > self.values[3, ids])
+        self.rows[3, ids[higher]], self.values[3, ids[higher]] = positions[high[higher]], values[high[higher]]
+
+    def candidates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Retained (rows, values), in row order without duplicates."""
+        rows, values = self.rows.ravel(), self.values.ravel()
+        kept = rows >= 0
+        rows, index = np.unique(rows[kept], return_index=True)
+        return rows, values[kept][index]
+
+
+class PlotBuilder:
+    """
+    Single streaming pass over a dataset's chunks (in row order) that fills a
+    2D histogram of `x` vs `y` over `bounds` and reduces the `series` columns
+    to candidates for downsampling to `points`, bucketed by row number against
+    `total_rows` (the dataset's row count). `types` optionally keeps only those
+    equipment types.
+    """
+
+    def __init__(self, x: Optional[str], y: Optional[str], bins: int,
+                 bounds: Optional[Dict[str, Tuple[float, float]]], series: List[str], types=None,
+                 total_rows: int = 0, points: int = 1000):
+        self.x, self.y, self.bins = x, y, bins
+        self.series = series
+        self.types = types
+        self.rows_seen = 0
+        self.rows_kept = 0
+        # Without bounds (no numeric values, e.g. a header-only file) there is nothing to bin
+        self.binned = bool(x) and all((bounds or {}).get(col) for col in (x, y))
+        self.counts = np.zeros(bins * bins, dtype=np.int64) if self.binned else None
+        self.edges = {}
+        if self.binned:
+            for col in (x, y):
+                low, high = bounds[col]
+                # Summary min/max are rounded to STAT_DIGITS; widen so the extremes stay inside
+                low, high = low - abs(low) * 1e-5, high + abs(high) * 1e-5
+                if high <= low:
+                    low, high = low - 0.5, high + 0.5
+                self.edges[col] = np.linspace(low, high, bins + 1)
+        # Enough buckets that LTTB still has several candidates per output point
+        buckets = min(total_rows, points * SERIES_BUCKETS_PER_POINT)
+        self.reducers = {col: SeriesReducer(buckets, total_rows) for col in series}
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns to read from storage."""
+        needed = ([self.x, self.y] if self.binned else []) + self.series + (['Type'] if self.types else [])
+        return list(dict.fromkeys(needed))
+
+    def _bin(self, values: np.ndarray, col: str) -> np.ndarray:
+        edges = self.edges[col]
+        index = np.floor((values - edges[0]) / (edges[-1] - edges[0]) * self.bins)
+        # The upper edge belongs to the last bin; NaN and out-of-range values get -1
+        index[values == edges[-1]] = self.bins - 1
+        index[~((index >= 0) & (index < self.bins))] = -1
+        return index.astype(np.int64)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        positions = np.arange(self.rows_seen, self.rows_seen + len(chunk))
+        self.rows_seen += len(chunk)
+        if self.types:
+            keep = chunk['Type'].isin(self.types).to_numpy()
+            chunk, positions = chunk[keep], positions[keep]
+        self.rows_kept += len(chunk)
+        if self.binned:
+            ix, iy = self._bin(_values(chunk, self.x), self.x), self._bin(_values(chunk, self.y), self.y)
+            inside = (ix >= 0) & (iy >= 0)
+            self.counts += np.bincount(ix[inside] * self.bins + iy[inside], minlength=self.bins * self.bins)
+        for col in self.series:
+            values = _values(chunk, col)
+            present = ~np.isnan(values)
+            self.reducers[col].update(positions[present], values[present])
+
+    def histogram2d(self) -> Dict[str, Any]:
+        """
+        {'x', 'y', 'x_edges', 'y_edges', 'counts', 'total'}; counts[i][j] is x bin i,
+        y bin j. Edges and counts are empty when there are no values to bin.
+        """
+        if not self.binned:
+            return {'x': self.x, 'y': self.y, 'x_edges': [], 'y_edges': [], 'counts': [], 'total': 0}
+        return {
+            'x': self.x,
+            'y': self.y,
+            'x_edges': self.edges[self.x].tolist(),
+            'y_edges': self.edges[self.y].tolist(),
+            'counts': self.counts.reshape(self.bins, self.bins).tolist(),
+            'total': int(self.counts.sum()),
+        }
+
+    def downsampled(self, points: int) -> Dict[str, Dict[str, list]]:
+        """{column: {'x': [row numbers], 'y': [values], 'total': n}} with at most `points` samples each."""
+        result = {}
+        for col, reducer in self.reducers.items():
+            rows, values = reducer.candidates()
+            keep = lttb(rows.astype(np.float64), values, points)
+            result[col] = {'x': rows[keep].tolist(), 'y': values[keep].tolist(), 'total': reducer.count}
+        return result
+
+
+def build_plot(frames: Iterable[pd.DataFrame], builder: PlotBuilder, kinds: List[str], points: int) -> Dict[str, Any]:
+    """Feed `frames` (chunks with builder.columns) through `builder` and return the requested plot kinds."""
+    for chunk in frames:
+        builder.update(chunk)
+    result: Dict[str, Any] = {'rows': builder.rows_kept}
+    if 'histogram2d' in kinds:
+        result['histogram2d'] = builder.histogram2d()
+    if 'series' in kinds:
+        result['series'] = builder.downsampled(points)
+        result['points'] = points
+    return result
+
+
+def column_bounds(column_stats: Dict[str, Any], columns: List[str], types=None) -> Dict[str, Tuple[float, float]]:
+    """(min, max) of `columns` from a summary's column_stats, over `types` only when given."""
+    bounds = {}
+    for col in columns:
+        if types:
+            stats = [column_stats.get('types', {}).get(t, {}).get(col) or {} for t in types]
+        else:
+            stats = [column_stats.get('columns', {}).get(col) or {}]
+        lows = [s['min'] for s in stats if s.get('min') is not None]
+        highs = [s['max'] for s in stats if s.get('max') is not None]
+        if lows and highs:
+            bounds[col] = (min(lows), max(highs))
+    return bounds
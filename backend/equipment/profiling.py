@@ -0,0 +1,207 @@
+"""
+Per-request timing: where did the time of a slow request go?
+
+RequestTimingMiddleware gives each request a RequestProfile. Code on the hot
+paths marks its stages with `with stage('parse'):` (or wraps an iterator in
+timed_iter()), and the middleware adds database query count/time, optional
+tracemalloc peaks and DRF render time. The result is sent back as a
+Server-Timing header (visible in browser dev tools) and logged as one JSON
+line to the 'equipment.timing' logger. Requests slower than
+settings.PROFILE_DUMP_THRESHOLD_MS can also be run under cProfile and dumped
+to settings.PROFILE_DUMP_DIR for inspection with pstats or snakeviz. Only one
+profiler can be active per process (Python 3.12+ refuses a second), so
+concurrent requests are timed but only one at a time is profiled.
+
+Outside a request (background jobs, management commands) the hooks do nothing.
+"""
+import cProfile
+import json
+import logging
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('equipment.timing')
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+# Held by the request currently running under cProfile
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Stage timings, query stats and memory peaks collected for one request."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.peak_bytes = 0
+
+    def add(self, name: str, seconds: float, peak_bytes: int = 0) -> None:
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_bytes': 0})
+        entry['seconds'] += seconds
+        entry['calls'] += 1
+        entry['peak_bytes'] = max(entry['peak_bytes'], peak_bytes)
+        self.peak_bytes = max(self.peak_bytes, peak_bytes)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """Connection.execute_wrapper hook counting and timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.db_queries += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value (durations in milliseconds)."""
+        parts = [f'total;dur={total * 1000:.1f}',
+                 f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"']
+        for name, entry in self.stages.items():
+            part = f'{name};dur={entry["seconds"] * 1000:.1f}'
+            if entry['calls'] > 1:
+                part += f';desc="{entry["calls"]} calls"'
+            parts.append(part)
+        if self.trace_memory:
+            parts.append(f'mem;desc="peak {self.peak_bytes / 2**20:.1f} MB"')
+        return ', '.join(parts)
+
+    def as_dict(self, total: float) -> dict:
+        data = {
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(self.db_seconds * 1000, 2),
+            'db_queries': self.db_queries,
+            'stages': {
+                name: {'ms': round(entry['seconds'] * 1000, 2), 'calls': entry['calls']}
+                for name, entry in self.stages.items()
+            },
+        }
+        if self.trace_memory:
+            for name, entry in self.stages.items():
+                data['stages'][name]['peak_kb'] = round(entry['peak_bytes'] / 1024, 1)
+            data['peak_kb'] = round(self.peak_bytes / 1024, 1)
+        return data
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage `name` of the current request (no-op outside one)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    tracing = profile.trace_memory and tracemalloc.is_tracing()
+    if tracing:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] - base if tracing else 0
+        profile.add(name, seconds, peak)
+
+
+def timed_iter(iterable: Iterable, name: str) -> Iterator:
+    """Yield from `iterable`, counting the time spent producing each item as stage `name`."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def _dump_name(request, total: float) -> str:
+    path = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+    return f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{path}-{total * 1000:.0f}ms.prof'
+
+
+class RequestTimingMiddleware:
+    """Collect a RequestProfile per request and report it (see module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_TIMING_ENABLED:
+            return self.get_response(request)
+
+        profile = RequestProfile(trace_memory=settings.REQUEST_TIMING_MEMORY)
+        token = _current.set(profile)
+        started_tracing = profile.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profiler = None
+        if settings.PROFILE_DUMP_THRESHOLD_MS > 0 and _profiler_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.db_wrapper))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+            total = profile.elapsed()
+            if profile.trace_memory and tracemalloc.is_tracing():
+                profile.peak_bytes = max(profile.peak_bytes, tracemalloc.get_traced_memory()[1])
+        finally:
+            if profiler is not None:
+                _profiler_lock.release()
+            if started_tracing:
+                tracemalloc.stop()
+            _current.reset(token)
+
+        response['Server-Timing'] = profile.server_timing(total)
+        self._log(request, response, profile, total)
+        if profiler is not None and total * 1000 >= settings.PROFILE_DUMP_THRESHOLD_MS:
+            dump_dir = Path(settings.PROFILE_DUMP_DIR)
+            dump_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(dump_dir / _dump_name(request, total))
+        return response
+
+    def process_template_response(self, request, response):
+        """Time DRF/template rendering, which happens after the view returns."""
+        profile = _current.get()
+        if profile is not None:
+            started = time.perf_counter()
+
+            def rendered(_response):
+                profile.add('render', time.perf_counter() - started)
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def _log(request, response, profile: RequestProfile, total: float) -> None:
+        slow = total * 1000 >= settings.REQUEST_TIMING_LOG_MS
+        level = logging.INFO if slow else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+        record = {'method': request.method, 'path': request.path, 'status': response.status_code}
+        record.update(profile.as_dict(total))
+        logger.log(level, json.dumps(record))
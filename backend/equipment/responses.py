@@ -0,0 +1,139 @@
+"""
+Streaming responses: files with HTTP Range support, and dataset rows
+encoded incrementally as NDJSON or JSON so memory per request stays bounded.
+Rows are encoded column by column (each column's values formatted in one
+pass, then stitched per row), and read exactly like paged responses: floats
+keep their shortest round-trip form (12.3, not 12.300000000000001) and NaN
+becomes null.
+"""
+import json
+import os
+import re
+from typing import List
+
+import numpy as np
+import pandas as pd
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+# Rows encoded per write when streaming dataset rows
+ROWS_PER_WRITE = 5000
+
+
+def _parse_range(header: str, size: int):
+    """
+    Parse a single-range 'Range: bytes=...' header.
+    Returns (start, end) inclusive, None to ignore the header, or 'invalid'.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _iter_file(path, start: int, length: int):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = fh.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def ranged_file_response(request, path, content_type: str, filename: str, etag: str, attachment: bool = True):
+    """
+    Stream a file from disk, as an attachment unless `attachment` is False.
+    Honours a single-range Range header (206 / 416) unless If-Range names a
+    different ETag.
+    """
+    size = os.path.getsize(path)
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    byte_range = _parse_range(header, size) if header and (not if_range or if_range == etag) else None
+
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_iter_file(path, start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = f'{"attachment" if attachment else "inline"}; filename="{filename}"'
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type,
+                                as_attachment=attachment, filename=filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
+
+
+def _json_values(column: pd.Series) -> List[str]:
+    """JSON text of every value of `column`, as json.dumps would write it."""
+    if column.dtype.kind == 'f':
+        values = column.to_numpy(dtype=np.float64)
+        text = list(map(float.__repr__, values.tolist()))
+        for i in np.flatnonzero(~np.isfinite(values)).tolist():
+            text[i] = 'null' if np.isnan(values[i]) else json.dumps(values[i].item())
+        return text
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) picks the trailing null
+        categories = [json.dumps(c) for c in column.cat.categories.tolist()] + ['null']
+        return [categories[code] for code in column.cat.codes.to_numpy().tolist()]
+    return [json.dumps(None if pd.isna(v) else v) for v in column.astype(object).tolist()]
+
+
+def rows_json(df: pd.DataFrame) -> List[str]:
+    """One compact JSON object per row of `df`, equal to json.dumps of frame_to_records(df) rows."""
+    if not len(df.columns):
+        return ['{}'] * len(df)
+    keys = [json.dumps(str(col)).replace('{', '{{').replace('}', '}}') for col in df.columns]
+    template = '{{' + ','.join(f'{key}:{{}}' for key in keys) + '}}'
+    return list(map(template.format, *[_json_values(df[col]) for col in df.columns]))
+
+
+def _row_batches(frames, encode):
+    for df in frames:
+        for start in range(0, len(df), ROWS_PER_WRITE):
+            yield encode(df.iloc[start:start + ROWS_PER_WRITE])
+
+
+def ndjson_response(frames, filename: str):
+    """Stream DataFrames as newline-delimited JSON, one object per row."""
+    def encode(df):
+        return ''.join(row + '\n' for row in rows_json(df))
+
+    response = StreamingHttpResponse(_row_batches(frames, encode), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def json_rows_response(frames, head: dict, filename: str):
+    """Stream `head` as a JSON object whose last key, "rows", holds every row of `frames`."""
+    def generate():
+        yield json.dumps(head)[:-1] + (', ' if head else '') + '"rows": ['
+        first = True
+        for body in _row_batches(frames, lambda df: ','.join(rows_json(df))):
+            if body:
+                yield body if first else ',' + body
+                first = False
+        yield ']}'
+
+    response = StreamingHttpResponse(generate(), content_type='application/json')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,125 @@
+"""
+Dataset retention: keep each user's newest N datasets, optionally only those
+younger than a maximum age.
+
+Pruning is set-based (one lookup for the cutoff row, one for the stale
+datasets' ids and files, then one DELETE or UPDATE per table) so its cost
+does not depend on history size or on how many datasets go. It runs right after each
+upload, or, when settings.RETENTION_SWEEP_INTERVAL is set, in a background
+sweeper thread so uploads skip it entirely.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache
+from .models import DataSummary, RetentionPolicy, TypeAggregate, UploadedDataset, UploadJob
+from .signals import delete_unreferenced_files
+
+logger = logging.getLogger(__name__)
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def retention_limits(user) -> Tuple[int, Optional[int]]:
+    """(max_datasets, max_age_days or None) for `user`, falling back to settings."""
+    max_datasets = settings.RETENTION_MAX_DATASETS
+    max_age_days = settings.RETENTION_MAX_AGE_DAYS or None
+    policy = RetentionPolicy.objects.filter(user=user).first()
+    if policy is not None:
+        if policy.max_datasets:
+            max_datasets = policy.max_datasets
+        if policy.max_age_days:
+            max_age_days = policy.max_age_days
+    return max_datasets, max_age_days
+
+
+def prune_user(user) -> int:
+    """Delete `user`'s datasets beyond the retention limits. Returns how many were deleted."""
+    max_datasets, max_age_days = retention_limits(user)
+    datasets = UploadedDataset.objects.filter(user=user)
+    conditions = []
+
+    # Oldest dataset still within the count limit; everything older goes
+    cutoff = (datasets.order_by('-uploaded_at', '-pk')
+              .values_list('uploaded_at', 'pk')[max_datasets - 1:max_datasets].first())
+    if cutoff is not None:
+        uploaded_at, pk = cutoff
+        conditions.append(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, pk__lt=pk))
+    if max_age_days:
+        conditions.append(Q(uploaded_at__lt=timezone.now() - timedelta(days=max_age_days)))
+    if not conditions:
+        return 0
+
+    stale = conditions[0]
+    for condition in conditions[1:]:
+        stale |= condition
+    stale_datasets = datasets.filter(stale)
+    # Deleted without loading instances or sending delete signals; the file
+    # cleanup the signals would do runs once below for all deleted datasets
+    with transaction.atomic(savepoint=False):
+        doomed = list(stale_datasets.values_list('pk', 'storage_path'))
+        if not doomed:
+            return 0
+        pks = [pk for pk, _ in doomed]
+        DataSummary.objects.filter(dataset__in=pks).delete()
+        TypeAggregate.objects.filter(dataset__in=pks).delete()
+        UploadJob.objects.filter(dataset__in=pks).update(dataset=None)
+        deleted = UploadedDataset.objects.filter(pk__in=pks)._raw_delete(UploadedDataset.objects.db)
+    delete_unreferenced_files(path for _, path in doomed)
+    for pk in pks:
+        cache.delete_report_files(pk)
+    return deleted
+
+
+def prune_all() -> int:
+    """Apply retention for every user that owns datasets."""
+    # order_by() drops the default ordering, which would otherwise defeat DISTINCT on PostgreSQL
+    user_ids = UploadedDataset.objects.exclude(user=None).order_by().values_list('user_id', flat=True).distinct()
+    total = 0
+    for user_id in list(user_ids):
+        total += prune_user(user_id)
+    return total
+
+
+def after_upload(user) -> None:
+    """Prune inline, or make sure the background sweeper is running if one is configured."""
+    if settings.RETENTION_SWEEP_INTERVAL > 0:
+        start_sweeper()
+    else:
+        prune_user(user)
+
+
+def _sweep_forever(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            deleted = prune_all()
+            if deleted:
+                logger.info('Retention sweep deleted %d datasets', deleted)
+        except Exception:
+            logger.exception('Retention sweep failed')
+        finally:
+            connections.close_all()
+
+
+def start_sweeper() -> None:
+    """Start the background sweeper thread once per process."""
+    global _sweeper
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(
+                target=_sweep_forever,
+                args=(settings.RETENTION_SWEEP_INTERVAL,),
+                name='retention-sweeper',
+                daemon=True,
+            )
+            _sweeper.start()
@@ -1,8 +1,9 @@
 """
 Serializers for the equipment API.
 """
+from django.conf import settings
 from rest_framework import serializers
-from .models import UploadedDataset, DataSummary
+from .models import UploadedDataset, DataSummary, RetentionPolicy, UploadJob
 
 
 class UploadedDatasetListSerializer(serializers.ModelSerializer):
@@ -13,14 +14,54 @@ class UploadedDatasetListSerializer(serializers.ModelSerializer):
 
 
 class UploadedDatasetDetailSerializer(serializers.ModelSerializer):
-    """Serializer for full dataset including raw_data."""
+    """
+    Serializer for a dataset including raw_data (rows loaded from columnar storage).
+    Pass context={'rows': [...]} to serialize one page instead of every row.
+    """
+    raw_data = serializers.SerializerMethodField()
+
     class Meta:
         model = UploadedDataset
-        fields = ['id', 'file_name', 'uploaded_at', 'raw_data']
+        fields = ['id', 'file_name', 'uploaded_at', 'row_count', 'raw_data']
+
+    def get_raw_data(self, obj):
+        if 'rows' in self.context:
+            return self.context['rows']
+        return obj.load_rows()
 
 
 class DataSummarySerializer(serializers.ModelSerializer):
     """Serializer for DataSummary."""
     class Meta:
         model = DataSummary
-        fields = ['id', 'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution', 'type_stats']
+        fields = ['id', 'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution', 'type_stats',
+                  'column_stats', 'validation']
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    """Serializer for async upload job status."""
+    dataset_id = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = UploadJob
+        fields = ['id', 'file_name', 'status', 'phase', 'progress', 'rows_processed', 'error',
+                  'dataset_id', 'created_at', 'updated_at']
+
+
+class RetentionPolicySerializer(serializers.ModelSerializer):
+    """Serializer for a user's retention overrides."""
+    class Meta:
+        model = RetentionPolicy
+        fields = ['max_datasets', 'max_age_days']
+
+    def validate_max_datasets(self, value):
+        if value is not None and not 1 <= value <= settings.RETENTION_MAX_DATASETS_LIMIT:
+            raise serializers.ValidationError(
+                f'Must be between 1 and {settings.RETENTION_MAX_DATASETS_LIMIT}'
+            )
+        return value
+
+    def validate_max_age_days(self, value):
+        if value is not None and value < 1:
+            raise serializers.ValidationError('Must be at least 1 day')
+        return value
@@ -0,0 +1,193 @@
+"""
+Upload processing shared by the synchronous upload view and background jobs.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from . import metrics, storage
+from .models import UploadedDataset, DataSummary
+from .outliers import OUTLIER_COLUMNS, find_outliers
+from .profiling import stage
+from .retention import after_upload
+from .trends import save_aggregates
+from .utils import NUMERIC_COLUMNS, compact_frame, compute_column_stats, compute_type_stats, hash_upload, ingest_csv
+
+# DataSummary fields filled from the summary dict returned by compute_summary / ingest_csv
+SUMMARY_FIELDS = ['total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution', 'type_stats',
+                  'column_stats', 'outliers', 'validation']
+
+
+def _type_stats_from_rows(dataset, summary) -> Dict[str, Any]:
+    return compute_type_stats(compact_frame(dataset.load_frame(['Type', 'Temperature', 'Pressure'])))
+
+
+def _column_stats_from_rows(dataset, summary) -> Dict[str, Any]:
+    return compute_column_stats(dataset.iter_frames(['Type'] + NUMERIC_COLUMNS))
+
+
+def _outliers_from_rows(dataset, summary) -> Dict[str, Any]:
+    # Type norms come from the summary being filled (column_stats runs first in
+    # BACKFILL_FIELDS), never dataset.summary: loading legacy raw_data refreshes
+    # the dataset and drops its cached summary, whose reload lacks unsaved fields.
+    columns = ['Type'] + OUTLIER_COLUMNS
+    frames = dataset.iter_frames(columns) if set(columns) <= set(dataset.column_names()) else []
+    return find_outliers(frames, summary.column_stats or {})
+
+
+# Summary fields older datasets may lack, with how to recompute each from the
+# stored rows and the summary as filled so far
+BACKFILL_FIELDS: Dict[str, Callable[[UploadedDataset, DataSummary], Any]] = {
+    'type_stats': _type_stats_from_rows,
+    'column_stats': _column_stats_from_rows,
+    'outliers': _outliers_from_rows,
+}
+
+
+def missing_summary_fields(summary: DataSummary) -> List[str]:
+    """BACKFILL_FIELDS never computed for `summary` (NULL); an empty computed value is not missing."""
+    return [f for f in BACKFILL_FIELDS if getattr(summary, f) is None]
+
+
+def backfill_summary(summary: DataSummary) -> List[str]:
+    """
+    Compute missing summary fields from the dataset's stored rows and save them,
+    empty results included, so each field is computed at most once.
+    Returns the names of the fields that were filled.
+    """
+    filled = missing_summary_fields(summary)
+    for field in filled:
+        setattr(summary, field, BACKFILL_FIELDS[field](summary.dataset, summary))
+    if filled:
+        summary.save(update_fields=filled)
+        save_aggregates(summary.dataset, {f: getattr(summary, f) for f in SUMMARY_FIELDS})
+    return filled
+
+
+def find_duplicate(user, content_hash: str) -> Optional[UploadedDataset]:
+    """
+    Most recent stored dataset with the same content, within the scope set by
+    settings.UPLOAD_DEDUP_SCOPE ('user', 'global' or 'off').
+    """
+    scope = settings.UPLOAD_DEDUP_SCOPE
+    if scope == 'off' or not content_hash:
+        return None
+    candidates = UploadedDataset.objects.filter(content_hash=content_hash, summary__isnull=False).exclude(storage_path='')
+    if scope != 'global':
+        candidates = candidates.filter(user=user)
+    return candidates.select_related('summary').defer('raw_data').order_by('-uploaded_at').first()
+
+
+def find_duplicates(user, content_hashes: List[str]) -> Dict[str, UploadedDataset]:
+    """find_duplicate() for many hashes in one query: {content_hash: most recent matching dataset}."""
+    scope = settings.UPLOAD_DEDUP_SCOPE
+    content_hashes = [h for h in content_hashes if h]
+    if scope == 'off' or not content_hashes:
+        return {}
+    candidates = UploadedDataset.objects.filter(
+        content_hash__in=content_hashes, summary__isnull=False
+    ).exclude(storage_path='')
+    if scope != 'global':
+        candidates = candidates.filter(user=user)
+    found = {}
+    for dataset in candidates.select_related('summary').defer('raw_data').order_by('-uploaded_at'):
+        found.setdefault(dataset.content_hash, dataset)
+    return found
+
+
+def lock_datasets(pks: Iterable[int]) -> Set[int]:
+    """
+    Lock the UploadedDataset rows `pks` until the current transaction ends and
+    return the ones that still exist. A dataset sharing a duplicate's stored
+    file is saved under this lock, so retention cannot delete the source row
+    and, with it, the file in between: pruning either waits and then finds
+    the file still referenced, or has already deleted the source row.
+    """
+    return set(UploadedDataset.objects.select_for_update().filter(pk__in=list(pks)).values_list('pk', flat=True))
+
+
+def _upload_size(uploaded_file) -> int:
+    size = getattr(uploaded_file, 'size', None)
+    if size is None:
+        try:
+            size = os.fstat(uploaded_file.fileno()).st_size
+        except (AttributeError, OSError):
+            size = 0
+    return size
+
+
+def store_upload(user, file_name: str, uploaded_file,
+                 progress: Optional[Callable[[str, int], None]] = None) -> Tuple[UploadedDataset, Dict[str, Any], bool]:
+    """
+    Stream the CSV into columnar storage, save UploadedDataset and DataSummary,
+    then apply `user`'s retention policy.
+    Content already stored (see find_duplicate) is not parsed again: the new
+    dataset shares the stored file and gets a copy of the existing summary
+    (saved with the source row locked, see lock_datasets).
+    `progress(phase, rows_so_far)` is called as processing advances.
+    Returns (dataset, summary_data, deduplicated).
+    Raises ValueError for invalid CSVs; nothing is saved in that case.
+    """
+    def report(phase, rows):
+        if progress is not None:
+            progress(phase, rows)
+
+    with stage('dedup'):
+        content_hash = hash_upload(uploaded_file)
+        duplicate = find_duplicate(user, content_hash)
+    if duplicate is not None:
+        report('saving', duplicate.row_count)
+        summary_data = {f: getattr(duplicate.summary, f) for f in SUMMARY_FIELDS}
+        with stage('db_write'), transaction.atomic():
+            if lock_datasets([duplicate.pk]):
+                dataset = UploadedDataset.objects.create(
+                    user=user,
+                    file_name=file_name,
+                    storage_path=duplicate.storage_path,
+                    row_count=duplicate.row_count,
+                    content_hash=content_hash,
+                )
+                DataSummary.objects.create(dataset=dataset, **summary_data)
+                save_aggregates(dataset, summary_data)
+            else:
+                # Pruned since it was found: parse the upload as new content
+                duplicate = None
+    if duplicate is None:
+        storage_name = storage.new_storage_name()
+        report('parsing', 0)
+        started = time.perf_counter()
+        try:
+            summary_data, row_count = ingest_csv(
+                uploaded_file, storage.storage_dir() / storage_name,
+                on_chunk=lambda rows: report('parsing', rows),
+            )
+        except Exception:
+            metrics.UPLOADS.inc(result='error')
+            raise
+        metrics.record_ingest(row_count, time.perf_counter() - started, _upload_size(uploaded_file))
+
+        report('saving', row_count)
+        try:
+            with stage('db_write'):
+                dataset = UploadedDataset.objects.create(
+                    user=user,
+                    file_name=file_name,
+                    storage_path=storage_name,
+                    row_count=row_count,
+                    content_hash=content_hash,
+                )
+                DataSummary.objects.create(dataset=dataset, **{f: summary_data.get(f) for f in SUMMARY_FIELDS})
+                save_aggregates(dataset, summary_data)
+        except Exception:
+            storage.delete_file(storage_name)
+            raise
+
+    metrics.UPLOADS.inc(result='deduplicated' if duplicate is not None else 'created')
+    report('pruning', dataset.row_count)
+    with stage('prune'):
+        after_upload(user)
+
+    return dataset, summary_data, duplicate is not None
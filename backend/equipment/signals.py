@@ -0,0 +1,42 @@
+"""
+Signal handlers for the equipment app.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import cache, storage
+from .models import UploadedDataset
+
+
+def delete_unreferenced_files(paths) -> None:
+    """Remove the storage files in `paths` that no dataset row references any more, with one query."""
+    paths = set(paths) - {''}
+    if not paths:
+        return
+    referenced = set(UploadedDataset.objects.filter(storage_path__in=paths).values_list('storage_path', flat=True))
+    for name in paths - referenced:
+        storage.delete_file(name)
+
+
+@receiver(post_delete, sender=UploadedDataset)
+def delete_dataset_storage(sender, instance, **kwargs):
+    """Remove the columnar data file once no dataset row references it (deduplicated uploads share files)."""
+    delete_unreferenced_files([instance.storage_path])
+
+
+@receiver(post_delete, sender=UploadedDataset)
+def delete_dataset_report_files(sender, instance, **kwargs):
+    """Remove cached report files (PDFs) of a deleted dataset."""
+    cache.delete_report_files(instance.pk)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Apply the PRAGMAs of settings.SQLITE_PROFILE to each new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
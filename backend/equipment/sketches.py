@@ -0,0 +1,208 @@
+"""
+Mergeable streaming sketches used by the summary engine (utils.SummaryAccumulator).
+
+QuantileDigest is a merging t-digest: values are folded into (mean, weight)
+centroids that get smaller towards the tails, so median, p95 and p99 stay
+accurate with a bounded number of centroids however many rows are added.
+BinnedHistogram counts values in bins of width 2**exponent aligned at zero;
+coarsening merges pairs of adjacent bins exactly, so histograms built over
+different chunks, processes or datasets always combine without error.
+
+Both take NumPy arrays, never loop over rows in Python, and round-trip through
+plain JSON-friendly dicts (to_dict / from_dict).
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# t-digest compression: at most about DIGEST_COMPRESSION / 2 centroids per digest
+DIGEST_COMPRESSION = 200
+# Bins kept per histogram; coarsening halves the count when a range needs more
+HISTOGRAM_MAX_BINS = 64
+# Finest bin width relative to the largest magnitude seen, keeps bin indices well inside int64
+_MIN_RELATIVE_EXPONENT = -40
+
+
+def _compress(means: np.ndarray, weights: np.ndarray, compression: int):
+    """
+    Merge sorted (mean, weight) points into centroids spanning at most one
+    unit of the t-digest scale function k(q) = compression / (2 pi) * asin(2q - 1).
+    """
+    total = weights.sum()
+    cumulative = np.cumsum(weights)
+    q = (cumulative - weights / 2) / total
+    cluster = np.floor(compression / (2 * math.pi) * (np.arcsin(2 * q - 1) + math.pi / 2)).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights
+
+
+class QuantileDigest:
+    """Approximate quantiles of a stream of values (t-digest with the k1 scale function)."""
+
+    def __init__(self, compression: int = DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    @classmethod
+    def from_sorted(cls, values: np.ndarray, compression: int = DIGEST_COMPRESSION) -> 'QuantileDigest':
+        """Digest of an ascending array of finite values."""
+        digest = cls(compression)
+        if len(values):
+            digest.means, digest.weights = _compress(values, np.ones(len(values)), compression)
+            digest.min, digest.max = float(values[0]), float(values[-1])
+        return digest
+
+    def update(self, values: np.ndarray) -> None:
+        """Add an array of values (NaNs are ignored)."""
+        values = np.sort(values[~np.isnan(values)])
+        self.merge(QuantileDigest.from_sorted(values, self.compression))
+
+    def merge(self, other: 'QuantileDigest') -> 'QuantileDigest':
+        """Fold another digest into this one. Returns self."""
+        if not len(other.weights):
+            return self
+        if not len(self.weights):
+            means, weights = other.means, other.weights
+        else:
+            means = np.concatenate([self.means, other.means])
+            weights = np.concatenate([self.weights, other.weights])
+            order = np.argsort(means, kind='stable')
+            means, weights = means[order], weights[order]
+        self.means, self.weights = _compress(means, weights, self.compression)
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """Estimated values at quantiles `qs` (0..1), interpolating between centroid centres."""
+        qs = list(qs)
+        if not len(self.weights):
+            return [None] * len(qs)
+        total = self.weights.sum()
+        centres = np.cumsum(self.weights) - self.weights / 2
+        positions = np.r_[0.0, centres, total]
+        values = np.r_[self.min, self.means, self.max]
+        return [float(v) for v in np.interp(np.asarray(qs) * total, positions, values)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'compression': self.compression,
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist(),
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileDigest':
+        digest = cls(data.get('compression', DIGEST_COMPRESSION))
+        digest.means = np.asarray(data.get('means', []), dtype=np.float64)
+        digest.weights = np.asarray(data.get('weights', []), dtype=np.float64)
+        digest.min, digest.max = data.get('min'), data.get('max')
+        return digest
+
+
+def grid_exponent(low: float, high: float, exponent: Optional[int] = None) -> int:
+    """
+    Smallest bin exponent (>= `exponent` if given) whose zero-aligned bins of
+    width 2**exponent cover [low, high] in at most HISTOGRAM_MAX_BINS bins.
+    """
+    magnitude = max(abs(low), abs(high))
+    floor = (math.frexp(magnitude)[1] if magnitude else 0) + _MIN_RELATIVE_EXPONENT
+    span = high - low
+    needed = math.frexp(span / HISTOGRAM_MAX_BINS)[1] - 1 if span > 0 else floor
+    result = max(needed, floor, exponent if exponent is not None else floor)
+    while math.floor(high / 2.0 ** result) - math.floor(low / 2.0 ** result) + 1 > HISTOGRAM_MAX_BINS:
+        result += 1
+    return result
+
+
+class BinnedHistogram:
+    """
+    Exact counts in zero-aligned bins of width 2**exponent: bin i covers
+    [i * width, (i + 1) * width). Dense counts start at bin `offset`.
+    """
+
+    def __init__(self):
+        self.exponent: Optional[int] = None
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def width(self) -> float:
+        return 2.0 ** self.exponent
+
+    def exponent_for(self, low: float, high: float) -> int:
+        """Bin exponent needed to also count values in [low, high] (see grid_exponent)."""
+        if self.exponent is None:
+            return grid_exponent(low, high)
+        low = min(low, self.offset * self.width)
+        high = max(high, (self.offset + len(self.counts) - 1) * self.width)
+        return grid_exponent(low, high, self.exponent)
+
+    def _coarsen(self, exponent: int) -> None:
+        shift = exponent - self.exponent
+        if shift <= 0:
+            return
+        bins = (np.arange(len(self.counts)) + self.offset) >> shift
+        self.offset = int(bins[0]) if len(bins) else self.offset >> shift
+        self.counts = np.bincount(bins - self.offset, weights=self.counts).astype(np.int64)
+        self.exponent = exponent
+
+    def add(self, exponent: int, offset: int, counts: np.ndarray) -> None:
+        """Add dense `counts` of bins of width 2**exponent starting at bin `offset`."""
+        nonzero = np.flatnonzero(counts)
+        if not len(nonzero):
+            return
+        incoming = BinnedHistogram()
+        incoming.exponent = exponent
+        incoming.offset = offset + int(nonzero[0])
+        incoming.counts = np.asarray(counts[nonzero[0]:nonzero[-1] + 1], dtype=np.int64)
+        if self.exponent is None:
+            self.exponent, self.offset, self.counts = incoming.exponent, incoming.offset, incoming.counts
+        else:
+            target = max(self.exponent, exponent)
+            self._coarsen(target)
+            incoming._coarsen(target)
+            low = min(self.offset, incoming.offset)
+            high = max(self.offset + len(self.counts), incoming.offset + len(incoming.counts))
+            merged = np.zeros(high - low, dtype=np.int64)
+            merged[self.offset - low:self.offset - low + len(self.counts)] += self.counts
+            merged[incoming.offset - low:incoming.offset - low + len(incoming.counts)] += incoming.counts
+            self.offset, self.counts = low, merged
+        while len(self.counts) > HISTOGRAM_MAX_BINS:
+            self._coarsen(self.exponent + 1)
+
+    def merge(self, other: 'BinnedHistogram') -> 'BinnedHistogram':
+        """Fold another histogram into this one. Returns self."""
+        if other.exponent is not None:
+            self.add(other.exponent, other.offset, other.counts)
+        return self
+
+    def as_bins(self) -> Dict[str, list]:
+        """{'edges': [n + 1 floats], 'counts': [n ints]} for charts."""
+        if self.exponent is None:
+            return {'edges': [], 'counts': []}
+        edges = (np.arange(len(self.counts) + 1) + self.offset) * self.width
+        return {'edges': edges.tolist(), 'counts': self.counts.tolist()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'exponent': self.exponent, 'offset': self.offset, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BinnedHistogram':
+        histogram = cls()
+        histogram.exponent = data.get('exponent')
+        histogram.offset = int(data.get('offset', 0))
+        histogram.counts = np.asarray(data.get('counts', []), dtype=np.int64)
+        return histogram
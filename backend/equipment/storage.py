@@ -0,0 +1,247 @@
+"""
+Columnar on-disk storage for uploaded datasets.
+
+Each dataset is written to a single zip container holding one typed NumPy
+array per column, grouped in chunks:
+
+    meta.json                 column names and per-chunk row counts / kinds
+    c<chunk>/<col>.npy        numeric values, or int32 category codes
+    c<chunk>/<col>.cat.npy    category labels for text columns
+
+Column names are stored once in the metadata instead of on every row, numeric
+columns keep their native dtype, and text columns are dictionary-encoded, so a
+dataset loads straight back into a DataFrame without building per-row dicts.
+"""
+import json
+import os
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+FORMAT_VERSION = 1
+FILE_SUFFIX = '.cols'
+META_NAME = 'meta.json'
+NUMERIC = 'numeric'
+CATEGORY = 'category'
+
+
+def storage_dir() -> Path:
+    """Directory holding the columnar dataset files (created on demand)."""
+    path = Path(settings.DATASET_STORAGE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def storage_file(name: str) -> Path:
+    """Absolute path for a storage name as saved on UploadedDataset.storage_path."""
+    return Path(settings.DATASET_STORAGE_DIR) / name
+
+
+def new_storage_name() -> str:
+    """Unique file name for a new dataset."""
+    return f"{uuid.uuid4().hex}{FILE_SUFFIX}"
+
+
+class ColumnarWriter:
+    """
+    Write DataFrame chunks into a columnar dataset file.
+    Data goes to a temporary file which is moved into place on close(), so a
+    failed upload never leaves a half-written dataset behind. `columns` records
+    the column names up front (e.g. from a CSV header), so they are kept even
+    if no chunk is ever written.
+    """
+
+    def __init__(self, path, columns: Optional[List[str]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self._zf = zipfile.ZipFile(self._tmp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.columns: List[str] = [str(c) for c in columns or []]
+        self.chunks: List[dict] = []
+        self.row_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write_array(self, name: str, arr: np.ndarray) -> None:
+        with self._zf.open(name, 'w', force_zip64=True) as fh:
+            np.lib.format.write_array(fh, np.ascontiguousarray(arr), allow_pickle=False)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Append one chunk. All chunks must share the same columns."""
+        names = [str(c) for c in df.columns]
+        if not self.chunks and not self.columns:
+            self.columns = names
+        elif names != self.columns:
+            raise ValueError('All chunks must have the same columns')
+
+        index = len(self.chunks)
+        kinds = []
+        for i, col in enumerate(df.columns):
+            series = df[col]
+            prefix = f"c{index}/{i}"
+            if pd.api.types.is_numeric_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+                self._write_array(f"{prefix}.npy", series.to_numpy())
+                kinds.append(NUMERIC)
+            else:
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    codes = series.cat.codes.to_numpy()
+                    categories = series.cat.categories
+                else:
+                    codes, categories = pd.factorize(series, use_na_sentinel=True)
+                labels = np.asarray([str(c) for c in categories], dtype=str)
+                self._write_array(f"{prefix}.npy", codes.astype(np.int32))
+                self._write_array(f"{prefix}.cat.npy", labels)
+                kinds.append(CATEGORY)
+        self.chunks.append({'rows': int(len(df)), 'kinds': kinds})
+        self.row_count += int(len(df))
+
+    def close(self) -> None:
+        meta = {'version': FORMAT_VERSION, 'columns': self.columns, 'chunks': self.chunks}
+        self._zf.writestr(META_NAME, json.dumps(meta))
+        self._zf.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._zf.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+def write_frame(path, df: pd.DataFrame) -> int:
+    """Write a whole DataFrame as a single chunk. Returns the row count."""
+    with ColumnarWriter(path) as writer:
+        writer.write(df)
+    return writer.row_count
+
+
+def read_meta(path) -> dict:
+    """Return the metadata dict of a dataset file."""
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read(META_NAME))
+
+
+def _read_array(zf: zipfile.ZipFile, name: str) -> np.ndarray:
+    with zf.open(name) as fh:
+        return np.lib.format.read_array(fh, allow_pickle=False)
+
+
+def _read_chunk(zf, index: int, chunk: dict, all_columns: List[str], columns: List[str]) -> pd.DataFrame:
+    data = {}
+    for name in columns:
+        i = all_columns.index(name)
+        prefix = f"c{index}/{i}"
+        values = _read_array(zf, f"{prefix}.npy")
+        if chunk['kinds'][i] == CATEGORY:
+            labels = _read_array(zf, f"{prefix}.cat.npy")
+            values = pd.Categorical.from_codes(values, categories=labels.astype(object))
+            values = np.asarray(values, dtype=object)
+        data[name] = values
+    return pd.DataFrame(data, columns=columns)
+
+
+def _resolve_columns(meta: dict, columns: Optional[List[str]]) -> List[str]:
+    all_columns = meta['columns']
+    if columns is None:
+        return list(all_columns)
+    return [c for c in columns if c in all_columns]
+
+
+def iter_frames(path, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield the dataset one stored chunk at a time, reading only `columns`
+    (all columns when None). Unknown column names are ignored.
+    """
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read(META_NAME))
+        selected = _resolve_columns(meta, columns)
+        for index, chunk in enumerate(meta['chunks']):
+            yield _read_chunk(zf, index, chunk, meta['columns'], selected)
+
+
+def read_frame(path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load a dataset file (optionally only some columns) into one DataFrame."""
+    frames = list(iter_frames(path, columns))
+    if not frames:
+        meta = read_meta(path)
+        return pd.DataFrame(columns=_resolve_columns(meta, columns))
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_slice(path, start: int, stop: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load rows [start, stop) of a dataset file, decoding only the chunks that
+    overlap the range.
+    """
+    frames = []
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read(META_NAME))
+        selected = _resolve_columns(meta, columns)
+        chunk_start = 0
+        for index, chunk in enumerate(meta['chunks']):
+            chunk_stop = chunk_start + chunk['rows']
+            if chunk_stop > start and chunk_start < stop:
+                df = _read_chunk(zf, index, chunk, meta['columns'], selected)
+                frames.append(df.iloc[max(start - chunk_start, 0):stop - chunk_start])
+            chunk_start = chunk_stop
+            if chunk_start >= stop:
+                break
+    if not frames:
+        return pd.DataFrame(columns=selected)
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_rows(path, rows, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load the rows at ascending positions `rows` of a dataset file, decoding
+    only the chunks that contain them.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    frames = []
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read(META_NAME))
+        selected = _resolve_columns(meta, columns)
+        chunk_start = 0
+        for index, chunk in enumerate(meta['chunks']):
+            if not len(rows) or chunk_start > rows[-1]:
+                break
+            chunk_stop = chunk_start + chunk['rows']
+            first, last = np.searchsorted(rows, [chunk_start, chunk_stop])
+            if last > first:
+                df = _read_chunk(zf, index, chunk, meta['columns'], selected)
+                frames.append(df.iloc[rows[first:last] - chunk_start])
+            chunk_start = chunk_stop
+    if not frames:
+        return pd.DataFrame(columns=selected)
+    return pd.concat(frames, ignore_index=True)
+
+
+def frame_to_records(df: pd.DataFrame) -> list:
+    """Convert a DataFrame to JSON-safe row dicts (NaN becomes None)."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def delete_file(name: str) -> None:
+    """Remove a stored dataset file; missing files are ignored."""
+    if not name:
+        return
+    try:
+        os.remove(storage_file(name))
+    except OSError:
+        pass
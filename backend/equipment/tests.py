@@ -0,0 +1,990 @@
+"""
+Regression tests for the equipment app.
+
+History endpoints must run a fixed number of queries however many datasets
+the user has, so a missing select_related / only() (an N+1) fails here.
+Summary backfill of legacy datasets must match what ingest would store.
+Plot series memory must stay bounded by the point budget, not the row count.
+Concurrent rebuilds of the desktop app archive must not share a temp file.
+/metrics is closed to anonymous remote clients unless explicitly opened.
+Concurrent requests with cProfile dumps on must not fight over the profiler.
+Upload jobs orphaned by a worker restart must end up failed, not pending forever.
+Batch uploads are size-checked before extraction and deduplicated in one query.
+Row filters and plots of columns a dataset lacks are client errors, not server errors.
+Exported rows are encoded exactly like paged rows.
+A CSV with a header but no rows keeps its columns.
+A duplicate pruned while its content is re-uploaded is parsed again, not linked to a deleted file.
+Columnar files read back whole, as row ranges and as row positions across chunks.
+Chunked CSV ingest stores and summarises the same rows whatever the chunk size.
+Summary accumulators merged from parts give the statistics of the whole data.
+Dataset pages paginate, project, filter and sort rows stored in several chunks.
+Cached responses carry ETags that follow the query and answer If-None-Match with 304.
+Re-uploaded content shares the stored file within the dedup scope until its last dataset goes.
+Batch uploads take loose CSVs and zip/tar archives and report every file.
+Upload validation counts missing and invalid values per column with sample row numbers.
+Analysis frames use float32 and categoricals only where no values change.
+Merged quantile digests stay within rank tolerance and merged histograms count exactly.
+Trends and comparisons are read from per-type aggregates in a fixed number of queries.
+Dataset plots bin every complete row and downsample series to real rows within the point budget.
+Summary charts are rendered once per dataset and embedded in PDF reports.
+"""
+import io
+import json
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import app_archive
+from .charts import CHART_KINDS, render_charts
+from .jobs import STALE_JOB_ERROR, run_upload_job
+from .models import DataSummary, UploadedDataset, UploadJob
+from .plotting import SERIES_BUCKETS_PER_POINT, PlotBuilder, build_plot
+from .profiling import RequestTimingMiddleware
+from .responses import rows_json
+from .retention import prune_user
+from .services import backfill_summary, find_duplicate, find_duplicates, missing_summary_fields, store_upload
+from .sketches import DIGEST_COMPRESSION, HISTOGRAM_MAX_BINS, BinnedHistogram, QuantileDigest
+from .storage import ColumnarWriter, frame_to_records, read_frame, read_meta, read_rows, read_slice
+from .utils import VALIDATION_SAMPLES, SummaryAccumulator, compact_frame, generate_pdf, ingest_csv
+
+TMP_DIR = tempfile.mkdtemp()
+# Retention policy, cutoff, stale datasets, 3 dependant tables, datasets, shared-file check
+PRUNE_QUERIES = 8
+
+
+def _csv(index: int) -> bytes:
+    rows = ''.join(f'Pump-{index}-{i},{("Pump", "Valve", "Mixer")[i % 3]},{10 + i},{1 + i},{50 + i}\n'
+                   for i in range(10))
+    return ('Equipment Name,Type,Flowrate,Pressure,Temperature\n' + rows).encode()
+
+
+@override_settings(
+    DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store',
+    REPORT_FILE_DIR=Path(TMP_DIR) / 'reports',
+    UPLOAD_SPOOL_DIR=Path(TMP_DIR) / 'spool',
+    RETENTION_MAX_DATASETS=50,
+    CHART_RENDER_WORKERS=0,
+)
+class HistoryQueryCountTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        # Dataset files outlive each test's rolled-back transaction
+        shutil.rmtree(Path(TMP_DIR) / 'store', ignore_errors=True)
+        self.user = User.objects.create_user('owner', password='pw')
+        self.client = APIClient()
+        # force_authenticate keeps auth lookups out of the counts
+        self.client.force_authenticate(self.user)
+        self.ids = [self._upload(i) for i in range(6)]
+        for cache in caches.all():
+            cache.clear()
+
+    def _upload(self, index: int) -> int:
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile(f'data{index}.csv', _csv(index))})
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['dataset_id']
+
+    def test_dataset_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/datasets/')
+        self.assertEqual(len(response.json()), 6)
+
+    def test_dataset_detail(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/datasets/{self.ids[0]}/')
+        self.assertEqual(len(response.json()['raw_data']), 10)
+
+    def test_summary_detail(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/summary/{self.ids[0]}/')
+        self.assertEqual(response.json()['total_count'], 10)
+
+    def test_download_pdf(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/pdf/{self.ids[0]}/')
+        self.assertEqual(response.status_code, 200)
+        # Draining the stream closes the response; closing it again would fire
+        # request_finished and drop the test's connection on PostgreSQL
+        b''.join(response.streaming_content)
+
+    def test_prune_is_constant_in_deleted_datasets(self):
+        for keep, deleted in ((4, 2), (1, 3)):
+            with self.settings(RETENTION_MAX_DATASETS=keep):
+                with self.assertNumQueries(PRUNE_QUERIES):
+                    self.assertEqual(prune_user(self.user), deleted)
+        self.assertEqual(UploadedDataset.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(len(list((Path(TMP_DIR) / 'store').glob('*.cols'))), 1)
+
+
+class LegacyBackfillTests(TestCase):
+    """Summaries of datasets stored as raw_data JSON (before columnar storage) filled in on demand."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('legacy', password='pw')
+
+    def _legacy_summary(self, rows):
+        dataset = UploadedDataset.objects.create(user=self.user, file_name='legacy.csv', raw_data=rows,
+                                                 row_count=len(rows))
+        DataSummary.objects.create(dataset=dataset, total_count=len(rows), avg_flowrate=0, avg_pressure=0,
+                                   avg_temperature=0, type_distribution={})
+        return UploadedDataset.objects.select_related('summary').defer('raw_data').get(pk=dataset.pk).summary
+
+    def test_outliers_use_freshly_computed_column_stats(self):
+        rows = [{'Equipment Name': f'P{i}', 'Type': 'Pump', 'Flowrate': 10.0, 'Pressure': 5.0 + (i % 3) / 10,
+                 'Temperature': 100.0 + i % 5} for i in range(30)]
+        rows[7]['Temperature'] = 900.0
+        summary = self._legacy_summary(rows)
+        backfill_summary(summary)
+        outliers = DataSummary.objects.get(pk=summary.pk).outliers['columns']['Temperature']
+        self.assertEqual((outliers['count'], outliers['rows']), (1, [7]))
+
+    def test_column_stats_match_ingest(self):
+        rows = [{'Equipment Name': f'V{i}', 'Type': 'Valve', 'Flowrate': 30.2, 'Pressure': (8.7, 15.1)[i % 2],
+                 'Temperature': 55.4} for i in range(10)]
+        summary = self._legacy_summary(rows)
+        backfill_summary(summary)
+        pressure = DataSummary.objects.get(pk=summary.pk).column_stats['columns']['Pressure']
+        self.assertEqual((pressure['min'], pressure['max']), (8.7, 15.1))
+
+    def test_empty_results_are_computed_once(self):
+        rows = [{'Equipment Name': f'X{i}', 'Flowrate': 1.0, 'Pressure': 2.0, 'Temperature': 3.0} for i in range(3)]
+        summary = self._legacy_summary(rows)
+        self.assertEqual(backfill_summary(summary), ['type_stats', 'column_stats', 'outliers'])
+        summary = DataSummary.objects.get(pk=summary.pk)
+        self.assertEqual(summary.type_stats, {})
+        self.assertEqual(missing_summary_fields(summary), [])
+        self.assertEqual(backfill_summary(summary), [])
+
+
+class PlotSeriesTests(TestCase):
+    """Series downsampling keeps a bounded number of candidates while streaming."""
+
+    def test_candidates_are_bounded_and_keep_spikes(self):
+        rows, points = 200_000, 100
+        values = np.sin(np.arange(rows) / 5000.0)
+        values[123_457] = 50.0
+        values[98_765] = -50.0
+        builder = PlotBuilder(None, None, 1, None, ['Pressure'], total_rows=rows, points=points)
+        frames = (pd.DataFrame({'Pressure': values[i:i + 7000]}) for i in range(0, rows, 7000))
+        series = build_plot(frames, builder, ['series'], points)['series']['Pressure']
+        self.assertLessEqual(builder.reducers['Pressure'].rows.size, 4 * points * SERIES_BUCKETS_PER_POINT)
+        self.assertEqual(series['total'], rows)
+        self.assertEqual(len(series['x']), points)
+        self.assertEqual((series['x'][0], series['x'][-1]), (0, rows - 1))
+        self.assertIn(123_457, series['x'])
+        self.assertIn(98_765, series['x'])
+
+    def test_no_values_means_no_edges(self):
+        builder = PlotBuilder('Pressure', 'Temperature', 10, {}, [], total_rows=0)
+        histogram = build_plot([pd.DataFrame({'Pressure': [], 'Temperature': []})], builder,
+                               ['histogram2d'], 10)['histogram2d']
+        self.assertEqual((histogram['x_edges'], histogram['y_edges'], histogram['counts'], histogram['total']),
+                         ([], [], [], 0))
+
+    def test_short_series_is_returned_whole(self):
+        builder = PlotBuilder(None, None, 1, None, ['Flowrate'], total_rows=5, points=10)
+        frame = pd.DataFrame({'Flowrate': [1.0, None, 3.0, 2.0, 5.0]})
+        series = build_plot([frame], builder, ['series'], 10)['series']['Flowrate']
+        self.assertEqual((series['x'], series['y'], series['total']), ([0, 2, 3, 4], [1.0, 3.0, 2.0, 5.0], 4))
+
+
+class AppArchiveTests(TestCase):
+
+    def test_concurrent_builds_leave_a_valid_archive(self):
+        # Bypasses the in-process lock, as separate worker processes would
+        root = app_archive.desktop_dir()
+        files = app_archive._source_files(root)
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / app_archive.ARCHIVE_NAME
+            with ThreadPoolExecutor(4) as pool:
+                for future in [pool.submit(app_archive._build, root, files, target) for _ in range(8)]:
+                    future.result()
+            with zipfile.ZipFile(target) as zf:
+                self.assertIsNone(zf.testzip())
+                self.assertEqual(len(zf.namelist()), len(files))
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], [app_archive.ARCHIVE_NAME])
+
+
+@override_settings(METRICS_TOKEN='secret', METRICS_ALLOWED_IPS=['127.0.0.1'], METRICS_PUBLIC=False)
+class MetricsAccessTests(TestCase):
+
+    def _get(self, **extra):
+        return self.client.get('/metrics', REMOTE_ADDR='203.0.113.7', **extra).status_code
+
+    def test_remote_scrape_needs_the_token(self):
+        self.assertEqual(self._get(), 403)
+        self.assertEqual(self._get(HTTP_AUTHORIZATION='Bearer wrong'), 403)
+        self.assertEqual(self._get(HTTP_AUTHORIZATION='Bearer secret'), 200)
+        self.assertEqual(self._get(HTTP_AUTHORIZATION='Bearer sécret'), 403)
+
+    def test_allowed_address_needs_no_token(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_no_token_is_not_open_access(self):
+        self.assertEqual(self._get(), 403)
+        self.assertEqual(self._get(HTTP_AUTHORIZATION='Bearer '), 403)
+        with self.settings(METRICS_PUBLIC=True):
+            self.assertEqual(self._get(), 200)
+
+
+@override_settings(REQUEST_TIMING_ENABLED=True, PROFILE_DUMP_THRESHOLD_MS=0.001,
+                   PROFILE_DUMP_DIR=Path(TMP_DIR) / 'profiles')
+class RequestProfilingTests(TestCase):
+
+    def test_concurrent_requests_are_profiled_one_at_a_time(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_view(request):
+            started.set()
+            release.wait(5)
+            return HttpResponse('ok')
+
+        middleware = RequestTimingMiddleware(slow_view)
+        factory = RequestFactory()
+        with ThreadPoolExecutor(1) as pool:
+            first = pool.submit(middleware, factory.get('/slow'))
+            self.assertTrue(started.wait(5))
+            # The first request holds the profiler: this one is timed but not profiled
+            second = RequestTimingMiddleware(lambda request: HttpResponse('ok'))(factory.get('/fast'))
+            release.set()
+            self.assertEqual(first.result().status_code, 200)
+        self.assertIn('total;dur=', second['Server-Timing'])
+        dumps = [p.name for p in (Path(TMP_DIR) / 'profiles').glob('*.prof')]
+        self.assertEqual(len(dumps), 1)
+        self.assertIn('slow', dumps[0])
+        shutil.rmtree(Path(TMP_DIR) / 'profiles')
+
+
+@override_settings(UPLOAD_JOB_STALE_SECONDS=600, UPLOAD_SPOOL_DIR=Path(TMP_DIR) / 'spool')
+class StaleUploadJobTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('jobs', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _job(self, status, age_seconds):
+        job = UploadJob.objects.create(user=self.user, file_name='orphan.csv', status=status)
+        spool = Path(TMP_DIR) / 'spool' / f'{job.id}.csv'
+        spool.parent.mkdir(parents=True, exist_ok=True)
+        spool.write_bytes(b'Equipment Name,Type,Flowrate,Pressure,Temperature\n')
+        UploadJob.objects.filter(pk=job.pk).update(
+            spool_path=str(spool), updated_at=timezone.now() - timedelta(seconds=age_seconds))
+        return job.pk, spool
+
+    def test_stale_jobs_are_reported_failed(self):
+        for status in UploadJob.ACTIVE_STATUSES:
+            job_id, spool = self._job(status, 601)
+            data = self.client.get(f'/api/jobs/{job_id}/').json()
+            self.assertEqual((data['status'], data['error']), (UploadJob.STATUS_FAILED, STALE_JOB_ERROR))
+            self.assertFalse(spool.exists())
+
+    def test_recent_jobs_are_left_alone(self):
+        job_id, spool = self._job(UploadJob.STATUS_RUNNING, 60)
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').json()['status'], UploadJob.STATUS_RUNNING)
+        self.assertTrue(spool.exists())
+
+    def test_worker_skips_a_job_expired_in_the_queue(self):
+        job_id, _ = self._job(UploadJob.STATUS_QUEUED, 601)
+        self.client.get(f'/api/jobs/{job_id}/')
+        # Worker threads close their connections; the test's must stay open
+        with mock.patch('equipment.jobs.connections'):
+            run_upload_job(job_id)
+        job = UploadJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.error, job.dataset_id), (UploadJob.STATUS_FAILED, STALE_JOB_ERROR, None))
+
+
+@override_settings(
+    DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store',
+    UPLOAD_SPOOL_DIR=Path(TMP_DIR) / 'batch-spool',
+    BATCH_UPLOAD_WORKERS=0,
+    BATCH_UPLOAD_MAX_FILES=4,
+    BATCH_UPLOAD_MAX_BYTES=64 * 1024,
+    RETENTION_MAX_DATASETS=50,
+)
+class BatchLimitTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('batcher', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _zip(self, members) -> SimpleUploadedFile:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for name, data in members:
+                zf.writestr(name, data)
+        return SimpleUploadedFile('batch.zip', buffer.getvalue())
+
+    def _post(self, **files):
+        return self.client.post('/api/upload/batch/', files)
+
+    def _spooled(self):
+        spool = Path(TMP_DIR) / 'batch-spool'
+        return list(spool.iterdir()) if spool.exists() else []
+
+    def test_oversized_member_is_rejected_before_extraction(self):
+        # Compresses to a few hundred bytes, unpacks past the limit
+        bomb = _csv(0) + b'Pump-x,Pump,1,1,1\n' * 10_000
+        response = self._post(archive=self._zip([('bomb.csv', bomb)]))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bytes of CSV data', response.json()['error'])
+        self.assertEqual(self._spooled(), [])
+
+    def test_too_many_members_are_rejected_before_extraction(self):
+        response = self._post(archive=self._zip([(f'd{i}.csv', _csv(i)) for i in range(5)]))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 4 files', response.json()['error'])
+        self.assertEqual(self._spooled(), [])
+
+    def test_duplicates_are_found_in_one_query(self):
+        def queries(count):
+            with CaptureQueriesContext(connection) as captured:
+                self._post(archive=self._zip([(f'd{i}.csv', _csv(i)) for i in range(count)]))
+            return len(captured)
+
+        self._post(archive=self._zip([(f'd{i}.csv', _csv(i)) for i in range(4)]))
+        # Every file is a duplicate now; lookups must not grow with the batch
+        self.assertEqual(queries(2), queries(4))
+        results = self._post(archive=self._zip([('d1.csv', _csv(1))])).json()['results']
+        self.assertEqual(results[0]['status'], 'deduplicated')
+
+    def test_duplicate_pruned_before_reuse_is_parsed_again(self):
+        self._post(archive=self._zip([('d1.csv', _csv(1))]))
+        source = UploadedDataset.objects.get(user=self.user)
+        found = find_duplicates(self.user, [source.content_hash])
+        # Deleted (with its file) between the duplicate lookup and the insert
+        source.delete()
+        with mock.patch('equipment.batch.find_duplicates', return_value=found):
+            response = self._post(archive=self._zip([('a.csv', _csv(1)), ('b.csv', _csv(1))]))
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'deduplicated'])
+        datasets = [UploadedDataset.objects.get(pk=r['dataset_id']) for r in results]
+        self.assertEqual(datasets[0].storage_path, datasets[1].storage_path)
+        self.assertEqual(len(datasets[1].load_frame()), 10)
+
+
+class LegacyDatasetQueryTests(TestCase):
+    """Datasets stored as raw_data may lack columns the API lets clients filter on."""
+
+    def setUp(self):
+        user = User.objects.create_user('partial', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        rows = [{'Equipment Name': f'P{i}', 'Flowrate': float(i)} for i in range(3)]
+        self.dataset = UploadedDataset.objects.create(user=user, file_name='partial.csv', raw_data=rows,
+                                                      row_count=len(rows))
+        DataSummary.objects.create(dataset=self.dataset, total_count=len(rows), avg_flowrate=1.0, avg_pressure=0,
+                                   avg_temperature=0, type_distribution={})
+
+    def test_filters_on_missing_columns_are_rejected(self):
+        for query in ('min_pressure=1', 'max_temperature=5', 'type=Pump'):
+            response = self.client.get(f'/api/datasets/{self.dataset.pk}/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('error', response.json())
+
+    def test_plot_of_missing_columns(self):
+        url = f'/api/datasets/{self.dataset.pk}/plot/'
+        for query in ('', '?kind=histogram2d&x=Flowrate&y=Pressure', '?kind=series&series=Pressure'):
+            self.assertEqual(self.client.get(url + query).status_code, 400, query)
+        # Default series are the numeric columns the dataset has
+        series = self.client.get(url + '?kind=series').json()['series']
+        self.assertEqual(list(series), ['Flowrate'])
+        self.assertEqual(series['Flowrate']['y'], [0.0, 1.0, 2.0])
+
+    def test_filters_on_present_columns_still_apply(self):
+        response = self.client.get(f'/api/datasets/{self.dataset.pk}/?min_flowrate=1')
+        self.assertEqual([row['Flowrate'] for row in response.json()['raw_data']], [1.0, 2.0])
+
+
+class ExportEncodingTests(TestCase):
+
+    def test_rows_match_json_of_records(self):
+        df = pd.DataFrame({
+            'Equipment Name': ['P "1" é', None, 'P3', 'P4'],
+            'Type': pd.Categorical(['Pump', None, 'Valve', 'Pump']),
+            'Flowrate': [12.3, np.nan, 1e-7, 123456789012.0],
+            'Pressure': [0.1, 2.5, np.inf, -0.0],
+        })
+        expected = [json.dumps(row, separators=(',', ':')) for row in frame_to_records(df)]
+        self.assertEqual(rows_json(df), expected)
+        self.assertEqual(rows_json(df.iloc[:0]), [])
+
+    @override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', RETENTION_MAX_DATASETS=50)
+    def test_export_reads_like_pages(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('exporter', password='pw'))
+        csv = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,12.3,0.1,\nP2,Valve,30.2,8.7,55.4\n'
+        pk = client.post('/api/upload/', {'file': SimpleUploadedFile('e.csv', csv)}).json()['dataset_id']
+        page = client.get(f'/api/datasets/{pk}/').json()['raw_data']
+        for fmt in ('ndjson', 'json'):
+            response = client.get(f'/api/datasets/{pk}/export/?output={fmt}')
+            body = b''.join(response.streaming_content).decode()
+            rows = [json.loads(line) for line in body.splitlines()] if fmt == 'ndjson' else json.loads(body)['rows']
+            self.assertEqual(rows, page, fmt)
+            self.assertIn('12.3,', body)
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', CHART_RENDER_WORKERS=0)
+class HeaderOnlyUploadTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('header', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        header = _csv(0).partition(b'\n')[0]
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('empty.csv', header)})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.url = f"/api/datasets/{response.json()['dataset_id']}/"
+
+    def test_columns_survive_without_rows(self):
+        response = self.client.get(self.url + '?sort=Type')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['fields'], ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+        self.assertEqual(response.json()['raw_data'], [])
+
+    def test_plot_has_no_edges(self):
+        response = self.client.get(self.url + 'plot/?kind=histogram2d&x=Pressure&y=Temperature')
+        self.assertEqual(response.status_code, 200, response.content)
+        histogram = response.json()['histogram2d']
+        self.assertEqual((histogram['x_edges'], histogram['y_edges'], histogram['total']), ([], [], 0))
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', RETENTION_MAX_DATASETS=1, UPLOAD_DEDUP_SCOPE='user')
+class DedupRaceTests(TestCase):
+
+    def test_duplicate_pruned_before_reuse_is_parsed_again(self):
+        user = User.objects.create_user('racer', password='pw')
+        source, _, _ = store_upload(user, 'a.csv', SimpleUploadedFile('a.csv', _csv(7)))
+        found = find_duplicate(user, source.content_hash)
+        # Retention (keeping one dataset) removes the source and its file before it is reused
+        store_upload(user, 'b.csv', SimpleUploadedFile('b.csv', _csv(8)))
+        self.assertFalse(UploadedDataset.objects.filter(pk=source.pk).exists())
+
+        with mock.patch('equipment.services.find_duplicate', return_value=found):
+            dataset, summary, deduplicated = store_upload(user, 'c.csv', SimpleUploadedFile('c.csv', _csv(7)))
+        self.assertFalse(deduplicated)
+        self.assertNotEqual(dataset.storage_path, source.storage_path)
+        self.assertEqual(len(dataset.load_frame()), 10)
+        self.assertEqual(summary['total_count'], 10)
+
+
+class ColumnarStorageTests(TestCase):
+
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp(dir=TMP_DIR)) / 'data.cols'
+        self.frame = pd.DataFrame({
+            'Equipment Name': [f'P{i}' for i in range(7)],
+            'Type': ['Pump', 'Valve', None, 'Pump', 'Mixer', 'Valve', 'Pump'],
+            'Flowrate': [1.5, np.nan, 3.0, 4.25, 5.0, 6.0, 7.0],
+            'Pressure': np.arange(7, dtype=np.int64),
+        })
+        # Chunks of 3, 3 and 1 rows
+        with ColumnarWriter(self.path) as writer:
+            for start in range(0, 7, 3):
+                writer.write(self.frame.iloc[start:start + 3])
+
+    def test_read_frame_round_trips(self):
+        stored = read_frame(self.path)
+        self.assertEqual(frame_to_records(stored), frame_to_records(self.frame))
+        self.assertEqual(stored['Pressure'].dtype, np.int64)
+        self.assertEqual(list(read_frame(self.path, ['Flowrate', 'Type', 'Unknown']).columns), ['Flowrate', 'Type'])
+
+    def test_read_slice_spans_chunks(self):
+        for start, stop in ((0, 7), (2, 5), (3, 6), (6, 9), (7, 8)):
+            expected = self.frame.iloc[start:stop][['Type', 'Flowrate']].reset_index(drop=True)
+            stored = read_slice(self.path, start, stop, ['Type', 'Flowrate'])
+            self.assertEqual(frame_to_records(stored), frame_to_records(expected), (start, stop))
+
+    def test_read_rows_picks_positions(self):
+        rows = [0, 2, 3, 6]
+        stored = read_rows(self.path, rows)
+        self.assertEqual(frame_to_records(stored), frame_to_records(self.frame.iloc[rows]))
+        self.assertEqual(len(read_rows(self.path, [])), 0)
+
+
+class ChunkedIngestTests(TestCase):
+
+    def test_chunk_size_does_not_change_the_result(self):
+        # A blank line lands inside the second chunk of 4 rows
+        lines = _csv(0).decode().splitlines(keepends=True)
+        data = ''.join(lines[:6] + [',,,,\n'] + lines[6:]).encode()
+        directory = Path(tempfile.mkdtemp(dir=TMP_DIR))
+        progress = []
+        chunked, chunked_rows = ingest_csv(io.BytesIO(data), directory / 'chunked.cols', chunk_rows=4,
+                                           on_chunk=progress.append)
+        whole, whole_rows = ingest_csv(io.BytesIO(data), directory / 'whole.cols', chunk_rows=1000)
+
+        self.assertEqual((chunked_rows, whole_rows), (10, 10))
+        self.assertEqual(progress, [4, 7, 10])
+        self.assertEqual(read_meta(directory / 'chunked.cols')['chunks'][1]['rows'], 3)
+        for field in ('total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature',
+                      'type_distribution', 'type_stats'):
+            self.assertEqual(chunked[field], whole[field], field)
+        self.assertEqual(frame_to_records(read_frame(directory / 'chunked.cols')),
+                         frame_to_records(read_frame(directory / 'whole.cols')))
+
+
+class AccumulatorMergeTests(TestCase):
+
+    def test_merged_parts_match_the_whole(self):
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame({
+            'Type': rng.choice(['Pump', 'Valve', 'Mixer'], 3000),
+            'Flowrate': rng.normal(100, 15, 3000),
+            'Pressure': rng.gamma(2.0, 3.0, 3000),
+            'Temperature': rng.normal(60, 5, 3000),
+        })
+        df.loc[rng.choice(3000, 200, replace=False), 'Pressure'] = np.nan
+
+        merged = SummaryAccumulator()
+        for part in np.array_split(np.arange(3000), [700, 2100]):
+            # One part goes through the JSON-friendly state, as from a worker process
+            partial = SummaryAccumulator.from_dict(SummaryAccumulator.from_frame(df.iloc[part]).to_dict())
+            merged.merge(partial)
+        result = merged.result()
+
+        self.assertEqual(result['total_count'], 3000)
+        self.assertEqual(result['type_distribution'], df['Type'].value_counts().to_dict())
+        groups = [('', df)] + list(df.groupby('Type'))
+        for eq_type, rows in groups:
+            stats = result['column_stats']['types'][eq_type] if eq_type else result['column_stats']['columns']
+            for col in ('Flowrate', 'Pressure', 'Temperature'):
+                values = rows[col].dropna()
+                got = stats[col]
+                self.assertEqual(got['count'], len(values), (eq_type, col))
+                self.assertEqual((got['min'], got['max']), (values.min(), values.max()), (eq_type, col))
+                self.assertAlmostEqual(got['mean'], values.mean(), delta=1e-5 * abs(values.mean()))
+                self.assertAlmostEqual(got['std'], values.std(), delta=1e-5 * values.std())
+                self.assertEqual(sum(got['histogram']['counts']), len(values))
+        self.assertEqual(result['avg_pressure'], round(df['Pressure'].mean(), 2))
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', CSV_CHUNK_ROWS=4, CHART_RENDER_WORKERS=0)
+class DatasetQueryTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('reader', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('data.csv', _csv(0))})
+        self.url = f"/api/datasets/{response.json()['dataset_id']}/"
+
+    def _get(self, query):
+        response = self.client.get(f'{self.url}?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_pages_follow_next_offset(self):
+        names, offset = [], 0
+        while offset is not None:
+            page = self._get(f'limit=4&offset={offset}')
+            self.assertEqual(page['count'], 10)
+            names += [row['Equipment Name'] for row in page['raw_data']]
+            offset = page['next_offset']
+        self.assertEqual(names, [f'Pump-0-{i}' for i in range(10)])
+
+    def test_fields_project_rows(self):
+        page = self._get('fields=Type,Flowrate&limit=2')
+        self.assertEqual(page['fields'], ['Type', 'Flowrate'])
+        self.assertEqual(page['raw_data'], [{'Type': 'Pump', 'Flowrate': 10}, {'Type': 'Valve', 'Flowrate': 11}])
+
+    def test_filters_and_sort(self):
+        page = self._get('type=Valve&min_flowrate=12&fields=Flowrate')
+        self.assertEqual((page['count'], page['raw_data']), (2, [{'Flowrate': 14}, {'Flowrate': 17}]))
+        page = self._get('sort=-Pressure&limit=3&fields=Pressure')
+        self.assertEqual([row['Pressure'] for row in page['raw_data']], [10, 9, 8])
+        self.assertEqual(page['next_offset'], 3)
+
+    def test_invalid_queries_are_rejected(self):
+        for query in ('fields=Colour', 'sort=Colour', 'limit=0', 'offset=x', 'min_pressure=high'):
+            self.assertEqual(self.client.get(f'{self.url}?{query}').status_code, 400, query)
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', REPORT_FILE_DIR=Path(TMP_DIR) / 'reports',
+                   CHART_RENDER_WORKERS=0)
+class ConditionalRequestTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('revalidator', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('data.csv', _csv(0))})
+        self.pk = response.json()['dataset_id']
+
+    def _get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            # Draining closes the file response (see HistoryQueryCountTests.test_download_pdf)
+            b''.join(response.streaming_content)
+        return response
+
+    def test_matching_etag_gets_304(self):
+        for url in (f'/api/summary/{self.pk}/', f'/api/datasets/{self.pk}/?limit=3', f'/api/pdf/{self.pk}/'):
+            response = self._get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response['ETag']
+            revalidated = self._get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(revalidated.status_code, 304, url)
+            self.assertEqual(revalidated['ETag'], etag)
+            self.assertEqual(revalidated.content, b'')
+            self.assertEqual(self._get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200, url)
+
+    def test_etag_follows_the_query(self):
+        url = f'/api/datasets/{self.pk}/'
+        etag = self.client.get(url + '?limit=3&offset=2')['ETag']
+        self.assertEqual(self.client.get(url + '?offset=2&limit=3')['ETag'], etag)
+        self.assertNotEqual(self.client.get(url + '?limit=3&offset=3')['ETag'], etag)
+        self.assertNotEqual(self.client.get(f'/api/summary/{self.pk}/')['ETag'], etag)
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'dedup-store', UPLOAD_DEDUP_SCOPE='user',
+                   CHART_RENDER_WORKERS=0)
+class DeduplicationTests(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(Path(TMP_DIR) / 'dedup-store', ignore_errors=True)
+
+    def _upload(self, user, data, name='data.csv'):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/upload/', {'file': SimpleUploadedFile(name, data)})
+        self.assertEqual(response.status_code, 201, response.content)
+        return UploadedDataset.objects.get(pk=response.json()['dataset_id']), response.json()
+
+    def _files(self):
+        return len(list((Path(TMP_DIR) / 'dedup-store').glob('*.cols')))
+
+    def test_same_content_shares_the_stored_file(self):
+        user = User.objects.create_user('twice', password='pw')
+        first, _ = self._upload(user, _csv(0))
+        second, body = self._upload(user, _csv(0), 'copy.csv')
+        self.assertTrue(body['deduplicated'])
+        self.assertEqual(second.storage_path, first.storage_path)
+        self.assertEqual(second.file_name, 'copy.csv')
+        self.assertEqual(second.summary.total_count, first.summary.total_count)
+        self.assertEqual(second.aggregates.count(), first.aggregates.count())
+        self.assertEqual(self._files(), 1)
+
+        # The shared file goes with the last dataset using it
+        first.delete()
+        self.assertEqual(self._files(), 1)
+        second.delete()
+        self.assertEqual(self._files(), 0)
+
+    def test_scope(self):
+        owner, other = User.objects.create_user('owner', password='pw'), User.objects.create_user('other')
+        self._upload(owner, _csv(0))
+        self.assertFalse(self._upload(other, _csv(0))[1]['deduplicated'])
+        self.assertFalse(self._upload(owner, _csv(1))[1]['deduplicated'])
+        with self.settings(UPLOAD_DEDUP_SCOPE='global'):
+            self.assertTrue(self._upload(User.objects.create_user('third'), _csv(1))[1]['deduplicated'])
+        with self.settings(UPLOAD_DEDUP_SCOPE='off'):
+            self.assertFalse(self._upload(owner, _csv(0))[1]['deduplicated'])
+        self.assertEqual(self._files(), 4)
+
+
+@override_settings(
+    DATASET_STORAGE_DIR=Path(TMP_DIR) / 'batch-store',
+    UPLOAD_SPOOL_DIR=Path(TMP_DIR) / 'batch-spool',
+    BATCH_UPLOAD_WORKERS=0,
+    RETENTION_MAX_DATASETS=50,
+    CHART_RENDER_WORKERS=0,
+)
+class BatchUploadTests(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(Path(TMP_DIR) / 'batch-store', ignore_errors=True)
+        self.user = User.objects.create_user('bulk', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_loose_files_and_archives(self):
+        zipped = io.BytesIO()
+        with zipfile.ZipFile(zipped, 'w') as zf:
+            zf.writestr('nested/a.csv', _csv(1))
+            zf.writestr('readme.md', b'not data')
+            zf.writestr('copy.csv', _csv(0))
+        tarred = io.BytesIO()
+        with tarfile.open(fileobj=tarred, mode='w:gz') as tf:
+            for name, data in (('b.csv', _csv(2)), ('bad.csv', b'Name,Colour\nx,red\n')):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+        response = self.client.post('/api/upload/batch/', {
+            'files': [SimpleUploadedFile('data.csv', _csv(0)), SimpleUploadedFile('notes.txt', b'x')],
+            'archive': [SimpleUploadedFile('one.zip', zipped.getvalue()),
+                        SimpleUploadedFile('two.tar.gz', tarred.getvalue())],
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        results = response.json()['results']
+        self.assertEqual([(r['file_name'], r['status']) for r in results], [
+            ('data.csv', 'created'), ('notes.txt', 'error'), ('a.csv', 'created'),
+            ('copy.csv', 'deduplicated'), ('b.csv', 'created'), ('bad.csv', 'error'),
+        ])
+        self.assertIn('Missing required columns', results[5]['error'])
+        self.assertTrue(all(r['retained'] and r['summary']['total_count'] == 10
+                            for r in results if r['status'] != 'error'))
+
+        datasets = UploadedDataset.objects.filter(user=self.user)
+        self.assertEqual(datasets.count(), 4)
+        self.assertEqual(len(set(datasets.values_list('storage_path', flat=True))), 3)
+        self.assertEqual(len(list((Path(TMP_DIR) / 'batch-store').glob('*.cols'))), 3)
+        self.assertEqual(list((Path(TMP_DIR) / 'batch-spool').iterdir()), [])
+
+    def test_unreadable_archive_is_rejected(self):
+        response = self.client.post('/api/upload/batch/', {'archive': SimpleUploadedFile('x.zip', b'garbage')})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not a zip or tar archive', response.json()['error'])
+
+
+class ValidationReportTests(TestCase):
+
+    def _ingest(self, body: str):
+        data = ('Equipment Name,Type,Flowrate,Pressure,Temperature\n' + body).encode()
+        path = Path(tempfile.mkdtemp(dir=TMP_DIR)) / 'data.cols'
+        summary, _ = ingest_csv(io.BytesIO(data), path, chunk_rows=2)
+        return summary['validation'], read_frame(path)
+
+    def test_problems_are_counted_per_column_with_row_numbers(self):
+        report, stored = self._ingest('A,Pump,1,2,3\nB, ,1,x,3\nC,Valve,,2,inf\nD,Valve,4,5,6\n')
+        self.assertEqual((report['rows'], report['invalid_rows'], report['valid']), (4, 2, False))
+        columns = report['columns']
+        self.assertEqual(columns['Type'], {'missing': 1, 'invalid': 0, 'samples': []})
+        self.assertEqual(columns['Flowrate'], {'missing': 1, 'invalid': 0, 'samples': []})
+        self.assertEqual(columns['Pressure'], {'missing': 0, 'invalid': 1, 'samples': [{'row': 2, 'value': 'x'}]})
+        # Row 3 sits in the second chunk of two rows
+        self.assertEqual(columns['Temperature']['samples'], [{'row': 3, 'value': 'inf'}])
+        # Invalid values are stored as empty, the rows are kept
+        self.assertEqual(frame_to_records(stored[['Type', 'Pressure', 'Temperature']]), [
+            {'Type': 'Pump', 'Pressure': 2.0, 'Temperature': 3.0},
+            {'Type': None, 'Pressure': None, 'Temperature': 3.0},
+            {'Type': 'Valve', 'Pressure': 2.0, 'Temperature': None},
+            {'Type': 'Valve', 'Pressure': 5.0, 'Temperature': 6.0},
+        ])
+
+    def test_samples_are_capped(self):
+        report, _ = self._ingest(''.join(f'P{i},Pump,bad{i},1,1\n' for i in range(VALIDATION_SAMPLES + 5)))
+        flowrate = report['columns']['Flowrate']
+        self.assertEqual(flowrate['invalid'], VALIDATION_SAMPLES + 5)
+        self.assertEqual([s['row'] for s in flowrate['samples']], list(range(1, VALIDATION_SAMPLES + 1)))
+        self.assertTrue(all(v['missing'] == 0 for v in report['columns'].values()))
+        clean, _ = self._ingest('A,Pump,1,2,3\n')
+        self.assertEqual((clean['invalid_rows'], clean['valid']), (0, True))
+
+
+class CompactFrameTests(TestCase):
+
+    def test_dtypes(self):
+        df = pd.DataFrame({
+            'Equipment Name': ['P1', 'P1', 'P1', 'P2'],
+            'Type': [' Pump', 'Pump ', '', 'Valve'],
+            'Flowrate': [1.5, 2.25, None, 4.0],
+            'Pressure': ['1.1', 'x', '3', '4'],
+            'Temperature': [0.1, 1e-300, 3.0, 123456.789],
+        })
+        compact = compact_frame(df)
+        self.assertEqual(compact['Flowrate'].dtype, np.float32)
+        self.assertEqual(compact['Pressure'].dtype, np.float32)
+        # 1e-300 underflows in float32, so the column stays float64
+        self.assertEqual(compact['Temperature'].dtype, np.float64)
+        self.assertIsInstance(compact['Type'].dtype, pd.CategoricalDtype)
+        self.assertEqual(list(compact['Type'].cat.categories), ['Pump', 'Valve'])
+        self.assertTrue(pd.isna(compact['Type'][2]))
+        self.assertIsInstance(compact['Equipment Name'].dtype, pd.CategoricalDtype)
+        self.assertTrue(np.isnan(compact['Pressure'][1]))
+        self.assertEqual(compact_frame(df, float32=False)['Flowrate'].dtype, np.float64)
+        # The input frame is left as it was
+        self.assertEqual(list(df['Pressure']), ['1.1', 'x', '3', '4'])
+
+    def test_values_survive_within_tolerance(self):
+        values = np.random.default_rng(5).normal(50, 10, 1000).round(2)
+        compact = compact_frame(pd.DataFrame({'Flowrate': values}))
+        self.assertEqual(compact['Flowrate'].dtype, np.float32)
+        np.testing.assert_allclose(compact['Flowrate'].to_numpy(np.float64), values, rtol=1e-6)
+        unique = compact_frame(pd.DataFrame({'Equipment Name': [f'P{i}' for i in range(10)]}))
+        self.assertNotIsInstance(unique['Equipment Name'].dtype, pd.CategoricalDtype)
+
+
+class SketchAccuracyTests(TestCase):
+
+    def test_digest_quantiles_after_merging(self):
+        values = np.random.default_rng(11).lognormal(3, 1, 100_000)
+        digest = QuantileDigest()
+        for part in np.array_split(values, 50):
+            digest.merge(QuantileDigest.from_dict(json.loads(json.dumps(
+                QuantileDigest.from_sorted(np.sort(part)).to_dict()))))
+        self.assertLessEqual(len(digest.weights), DIGEST_COMPRESSION)
+        self.assertEqual((digest.count, digest.min, digest.max), (len(values), values.min(), values.max()))
+        ordered = np.sort(values)
+        qs = [0.001, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999]
+        for q, estimate in zip(qs, digest.quantiles(qs)):
+            rank = np.searchsorted(ordered, estimate) / len(ordered)
+            self.assertLess(abs(rank - q), 0.002, q)
+
+    def test_histogram_counts_are_exact(self):
+        values = np.random.default_rng(12).normal(-20, 40, 20_000)
+        histogram = BinnedHistogram()
+        for part in np.array_split(values, 7):
+            incoming = BinnedHistogram()
+            exponent = incoming.exponent_for(float(part.min()), float(part.max()))
+            bins = np.floor(part / 2.0 ** exponent).astype(np.int64)
+            incoming.add(exponent, int(bins.min()), np.bincount(bins - bins.min()))
+            histogram.merge(BinnedHistogram.from_dict(incoming.to_dict()))
+        bins = histogram.as_bins()
+        self.assertLessEqual(len(bins['counts']), HISTOGRAM_MAX_BINS)
+        self.assertLessEqual(bins['edges'][0], values.min())
+        self.assertGreater(bins['edges'][-1], values.max())
+        self.assertEqual(bins['counts'], np.histogram(values, bins['edges'])[0].tolist())
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', CHART_RENDER_WORKERS=0)
+class TrendCompareTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('analyst', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        later = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nA,Pump,1,1,70\nB,Pump,2,1,80\n'
+        self.a, self.b = (self._upload(name, data) for name, data in (('a.csv', _csv(0)), ('b.csv', later)))
+
+    def _upload(self, name, data):
+        return self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, data)}).json()['dataset_id']
+
+    def test_trend_series(self):
+        # Retention policy, datasets, aggregates
+        with self.assertNumQueries(3):
+            data = self.client.get('/api/trends/?column=Temperature&stats=mean,count').json()
+        self.assertEqual([d['id'] for d in data['datasets']], [self.a, self.b])
+        self.assertEqual(data['overall'], {'mean': [54.5, 75.0], 'count': [10, 2]})
+        self.assertEqual(data['types']['Pump']['mean'], [54.5, 75.0])
+        self.assertEqual(data['types']['Valve'], {'mean': [54.0, None], 'count': [3, None]})
+
+        data = self.client.get('/api/trends/?column=Temperature&stats=max&type=Pump&limit=1').json()
+        self.assertEqual(([d['id'] for d in data['datasets']], data['overall'], list(data['types'])),
+                         ([self.b], {'max': [80.0]}, ['Pump']))
+        self.assertEqual(self.client.get('/api/trends/?column=Colour').status_code, 400)
+
+    def test_compare(self):
+        # Datasets, aggregates
+        with self.assertNumQueries(2):
+            data = self.client.get(f'/api/compare/?a={self.a}&b={self.b}&column=Temperature').json()
+        overall = data['columns']['Temperature']['overall']
+        self.assertEqual((overall['a']['mean'], overall['b']['mean']), (54.5, 75.0))
+        self.assertEqual((overall['delta']['mean'], overall['delta']['mean_pct']), (20.5, 37.61))
+        self.assertEqual((overall['a']['count'], overall['delta']['max']), (10, 21.0))
+        valve = data['columns']['Temperature']['types']['Valve']
+        self.assertEqual((valve['b'], valve['delta']), (None, None))
+        self.assertEqual(list(data['columns']), ['Temperature'])
+
+        other = User.objects.create_user('outsider')
+        client = APIClient()
+        client.force_authenticate(other)
+        self.assertEqual(client.get(f'/api/compare/?a={self.a}&b={self.b}').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/compare/?a={self.a}').status_code, 400)
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', CSV_CHUNK_ROWS=1000, CHART_RENDER_WORKERS=0)
+class DatasetPlotTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(24)
+        self.frame = pd.DataFrame({
+            'Equipment Name': [f'E{i}' for i in range(5000)],
+            'Type': rng.choice(['Pump', 'Valve'], 5000),
+            'Flowrate': rng.normal(100, 10, 5000).round(3),
+            'Pressure': rng.gamma(3, 2, 5000).round(3),
+            'Temperature': rng.normal(60, 8, 5000).round(3),
+        })
+        self.frame.loc[::97, 'Pressure'] = np.nan
+        user = User.objects.create_user('plotter', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        upload = SimpleUploadedFile('plot.csv', self.frame.to_csv(index=False).encode())
+        self.url = f"/api/datasets/{self.client.post('/api/upload/', {'file': upload}).json()['dataset_id']}/plot/"
+
+    def test_histogram_counts_every_complete_row(self):
+        for query, rows in (('', self.frame), ('&type=Pump', self.frame[self.frame['Type'] == 'Pump'])):
+            histogram = self.client.get(self.url + '?kind=histogram2d&bins=8' + query).json()['histogram2d']
+            rows = rows.dropna(subset=['Pressure'])
+            expected, _, _ = np.histogram2d(rows['Pressure'], rows['Temperature'],
+                                            [histogram['x_edges'], histogram['y_edges']])
+            self.assertEqual(histogram['total'], len(rows), query)
+            self.assertEqual(histogram['counts'], expected.astype(int).tolist(), query)
+
+    def test_series_are_downsampled_rows(self):
+        series = self.client.get(self.url + '?kind=series&series=Flowrate,Pressure&points=100').json()['series']
+        self.assertEqual(list(series), ['Flowrate', 'Pressure'])
+        for column, data in series.items():
+            values = self.frame[column]
+            self.assertEqual(data['total'], int(values.notna().sum()))
+            self.assertEqual(len(data['x']), 100)
+            self.assertEqual(data['x'], sorted(data['x']))
+            self.assertEqual((data['x'][0], data['x'][-1]), (0 if column == 'Flowrate' else 1, 4999))
+            self.assertEqual(data['y'], values.iloc[data['x']].tolist())
+
+    def test_bad_parameters(self):
+        for query in ('kind=pie', 'x=Colour', 'bins=0', 'points=2', 'series=Colour'):
+            self.assertEqual(self.client.get(f'{self.url}?{query}').status_code, 400, query)
+
+
+@override_settings(DATASET_STORAGE_DIR=Path(TMP_DIR) / 'store', REPORT_FILE_DIR=Path(TMP_DIR) / 'chart-reports',
+                   CHART_RENDER_WORKERS=0)
+class ChartTests(TestCase):
+
+    def setUp(self):
+        shutil.rmtree(Path(TMP_DIR) / 'chart-reports', ignore_errors=True)
+        user = User.objects.create_user('charter', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.pk = self.client.post('/api/upload/', {'file': SimpleUploadedFile('c.csv', _csv(0))}).json()['dataset_id']
+
+    def _get(self, url):
+        response = self.client.get(url)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_images_are_rendered_once(self):
+        with mock.patch('equipment.views.render_charts', wraps=render_charts) as render:
+            for _ in range(2):
+                response, body = self._get(f'/api/datasets/{self.pk}/charts/count.png')
+                self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/png'))
+                self.assertTrue(body.startswith(b'\x89PNG'))
+            self.assertEqual(render.call_count, 1)
+            response, body = self._get(f'/api/datasets/{self.pk}/charts/temperature.svg')
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', body)
+        for url in (f'/api/datasets/{self.pk}/charts/pie.png', f'/api/datasets/{self.pk}/charts/count.gif'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_pdf_embeds_every_chart(self):
+        with mock.patch('equipment.views.generate_pdf', wraps=generate_pdf) as generate:
+            response, body = self._get(f'/api/pdf/{self.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body.startswith(b'%PDF'))
+        charts = generate.call_args.kwargs['charts']
+        self.assertEqual([path.name.split('-')[2] for path in charts], [f'chart_{kind}' for kind in CHART_KINDS])
+        self.assertTrue(all(path.suffix == '.png' and path.exists() for path in charts))
@@ -0,0 +1,140 @@
+"""
+Cross-dataset trends and comparisons.
+
+Every saved DataSummary is also flattened into TypeAggregate rows (one per
+dataset, equipment type and numeric column). Trend series and dataset diffs
+are answered from those rows with one or two indexed queries, so their cost
+grows with the number of datasets and types, never with dataset size.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from .models import TypeAggregate, UploadedDataset
+from .utils import NUMERIC_COLUMNS
+
+AGGREGATE_STATS = ['count', 'mean', 'std', 'min', 'max', 'p5', 'p25', 'p50', 'p75', 'p95']
+# type_stats keys holding per-type means, for summaries saved before column_stats existed
+_TYPE_STATS_MEANS = {'Temperature': 'avg_temperature', 'Pressure': 'avg_pressure'}
+_SUMMARY_MEANS = {'Flowrate': 'avg_flowrate', 'Pressure': 'avg_pressure', 'Temperature': 'avg_temperature'}
+
+
+def _from_column_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    quantiles = stats.get('quantiles') or {}
+    row = {stat: stats.get(stat) for stat in ['mean', 'std', 'min', 'max']}
+    row.update({stat: quantiles.get(stat) for stat in ['p5', 'p25', 'p50', 'p75', 'p95']})
+    row['count'] = int(stats.get('count') or 0)
+    return row
+
+
+def aggregate_rows(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    TypeAggregate field values for a summary dict (DataSummary fields).
+    Uses column_stats when present, otherwise the means in type_stats and the
+    summary's overall averages.
+    """
+    rows = []
+    column_stats = summary.get('column_stats') or {}
+    if column_stats.get('columns'):
+        for col, stats in column_stats['columns'].items():
+            rows.append({'equipment_type': '', 'column': col, **_from_column_stats(stats)})
+        for eq_type, columns in column_stats.get('types', {}).items():
+            for col, stats in columns.items():
+                rows.append({'equipment_type': eq_type, 'column': col, **_from_column_stats(stats)})
+        return rows
+
+    total = int(summary.get('total_count') or 0)
+    for col, field in _SUMMARY_MEANS.items():
+        rows.append({'equipment_type': '', 'column': col, 'count': total, 'mean': summary.get(field)})
+    for eq_type, stats in (summary.get('type_stats') or {}).items():
+        for col, key in _TYPE_STATS_MEANS.items():
+            rows.append({'equipment_type': eq_type, 'column': col,
+                         'count': int(stats.get('count') or 0), 'mean': stats.get(key)})
+    return rows
+
+
+def build_aggregates(dataset, summary: Dict[str, Any]) -> List[TypeAggregate]:
+    """Unsaved TypeAggregate rows of `dataset` (use bulk_create)."""
+    return [TypeAggregate(dataset=dataset, **row) for row in aggregate_rows(summary)]
+
+
+def save_aggregates(dataset, summary: Dict[str, Any]) -> None:
+    """Replace the TypeAggregate rows of `dataset` with those of `summary`."""
+    TypeAggregate.objects.filter(dataset=dataset).delete()
+    TypeAggregate.objects.bulk_create(build_aggregates(dataset, summary))
+
+
+def _dataset_info(dataset) -> Dict[str, Any]:
+    return {'id': dataset.id, 'file_name': dataset.file_name, 'uploaded_at': dataset.uploaded_at}
+
+
+def trend_series(user, column: str, stats: List[str], types: Optional[Iterable[str]] = None,
+                 limit: int = 5) -> Dict[str, Any]:
+    """
+    `stats` of `column` across `user`'s newest `limit` datasets, oldest first:
+    {'datasets': [...], 'overall': {stat: [values]}, 'types': {type: {stat: [values]}}}.
+    Series are aligned with 'datasets'; None where a dataset lacks the type.
+    """
+    datasets = list(UploadedDataset.objects.filter(user=user)
+                    .only('id', 'file_name', 'uploaded_at').order_by('-uploaded_at', '-pk')[:limit])
+    datasets.reverse()
+    position = {d.id: i for i, d in enumerate(datasets)}
+
+    rows = TypeAggregate.objects.filter(dataset_id__in=position, column=column)
+    if types:
+        rows = rows.filter(equipment_type__in=[''] + list(types))
+    overall = {stat: [None] * len(datasets) for stat in stats}
+    by_type: Dict[str, Dict[str, list]] = {}
+    for row in rows.values('dataset_id', 'equipment_type', *stats):
+        if row['equipment_type']:
+            series = by_type.get(row['equipment_type'])
+            if series is None:
+                series = by_type[row['equipment_type']] = {stat: [None] * len(datasets) for stat in stats}
+        else:
+            series = overall
+        i = position[row['dataset_id']]
+        for stat in stats:
+            series[stat][i] = row[stat]
+    return {
+        'datasets': [_dataset_info(d) for d in datasets],
+        'overall': overall,
+        'types': dict(sorted(by_type.items())),
+    }
+
+
+def _delta(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """b - a for every statistic both sides have, plus the relative change of the mean in percent."""
+    if a is None or b is None:
+        return None
+    delta = {stat: round(b[stat] - a[stat], 6) if a[stat] is not None and b[stat] is not None else None
+             for stat in AGGREGATE_STATS}
+    delta['mean_pct'] = (round((b['mean'] - a['mean']) / abs(a['mean']) * 100, 2)
+                         if delta['mean'] is not None and a['mean'] else None)
+    return delta
+
+
+def compare_datasets(a, b, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Side-by-side statistics of datasets `a` and `b` with their differences, per column:
+    {'columns': {column: {'overall': {'a', 'b', 'delta'}, 'types': {type: {'a', 'b', 'delta'}}}}}.
+    A side is None when that dataset has no such type.
+    """
+    columns = columns or NUMERIC_COLUMNS
+    stats: Dict[str, Dict[str, Dict[str, Any]]] = {col: {} for col in columns}
+    rows = TypeAggregate.objects.filter(dataset_id__in=[a.id, b.id], column__in=columns)
+    for row in rows.values('dataset_id', 'equipment_type', 'column', *AGGREGATE_STATS):
+        side = 'a' if row['dataset_id'] == a.id else 'b'
+        entry = stats[row['column']].setdefault(row['equipment_type'], {'a': None, 'b': None})
+        entry[side] = {stat: row[stat] for stat in AGGREGATE_STATS}
+    if a.id == b.id:
+        for col_stats in stats.values():
+            for entry in col_stats.values():
+                entry['b'] = entry['a']
+
+    result = {}
+    for col in columns:
+        entries = {t: {**e, 'delta': _delta(e['a'], e['b'])} for t, e in stats[col].items()}
+        empty = {'a': None, 'b': None, 'delta': None}
+        result[col] = {
+            'overall': entries.pop('', empty),
+            'types': dict(sorted(entries.items())),
+        }
+    return {'a': _dataset_info(a), 'b': _dataset_info(b), 'columns': result}
@@ -10,9 +10,18 @@ urlpatterns = [
     path('auth/login/', views.auth_login),
     path('auth/logout/', views.auth_logout),
     path('upload/', views.upload_file),
+    path('upload/batch/', views.upload_batch),
+    path('jobs/<uuid:job_id>/', views.job_status),
+    path('retention/', views.retention_policy),
     path('datasets/', views.dataset_list),
     path('datasets/<int:pk>/', views.dataset_detail),
+    path('datasets/<int:pk>/export/', views.dataset_export),
+    path('datasets/<int:pk>/outliers/', views.dataset_outliers),
+    path('datasets/<int:pk>/plot/', views.dataset_plot),
+    path('datasets/<int:pk>/charts/<slug:kind>.<slug:fmt>', views.dataset_chart),
     path('summary/<int:pk>/', views.summary_detail),
     path('pdf/<int:pk>/', views.download_pdf),
+    path('trends/', views.trends),
+    path('compare/', views.compare),
     path('download-app/', views.download_app),
 ]
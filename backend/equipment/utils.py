@@ -1,18 +1,158 @@
 """
 Utility functions for CSV parsing, summary computation, and PDF generation.
 """
+import hashlib
 import io
-from typing import Dict, Any
+import logging
+import math
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+from django.conf import settings
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+
+from . import storage
+from .outliers import OUTLIER_COLUMNS, find_outliers, flagged_rows
+from .profiling import stage, timed_iter
+from .sketches import BinnedHistogram, QuantileDigest
+
+logger = logging.getLogger(__name__)
 
 
 REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+# Offending values kept per column in a ValidationReport
+VALIDATION_SAMPLES = 5
+# Largest relative change allowed when compact_frame() stores a numeric column as float32
+FLOAT32_RTOL = 1e-6
+# Text columns with at most this share of distinct values become categoricals in compact_frame()
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# Quantiles reported in column_stats (as p1, p5, ... p99) and their significant digits
+SUMMARY_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+STAT_DIGITS = 6
+
+
+def hash_upload(uploaded_file) -> str:
+    """SHA-256 hex digest of an uploaded file's bytes. Rewinds the file afterwards."""
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(1 << 20), b''):
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def _normalize_categories(values: pd.Series) -> pd.Series:
+    """
+    Categorical copy of a text column with labels stripped and blanks treated
+    as missing. Labels are cleaned once per distinct value, not once per row.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    labels = pd.Index(uniques.astype(str)).str.strip()
+    label_codes, categories = pd.factorize(labels.where(labels != '', None), use_na_sentinel=True)
+    # Map each row's original code to the code of its cleaned label (-1 stays missing)
+    lookup = np.append(label_codes, -1)
+    return pd.Series(pd.Categorical.from_codes(lookup[codes], categories=categories),
+                     index=values.index, name=values.name)
+
+
+class ValidationReport:
+    """
+    Row-level problems found while coercing uploaded chunks, per column:
+    'missing' (empty cells), 'invalid' (values that are not finite numbers,
+    stored as empty) and up to VALIDATION_SAMPLES examples with their 1-based
+    data row number.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.invalid_rows = 0
+        self.columns: Dict[str, Dict[str, Any]] = {
+            col: {'missing': 0, 'invalid': 0, 'samples': []} for col in ['Type'] + NUMERIC_COLUMNS
+        }
+
+    def _add_samples(self, col: str, raw: pd.Series, mask: np.ndarray) -> None:
+        samples = self.columns[col]['samples']
+        room = VALIDATION_SAMPLES - len(samples)
+        if room > 0:
+            positions = np.flatnonzero(mask)[:room]
+            for index, value in zip(raw.index[positions], raw.iloc[positions]):
+                samples.append({'row': int(index) + 1, 'value': str(value)})
+
+    def check(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Coerce a chunk with vectorized operations and record its problems:
+        numeric columns become float64 (bad values -> NaN), Type is stripped and
+        made categorical. Returns the coerced chunk.
+        """
+        self.rows += len(chunk)
+        bad_rows = np.zeros(len(chunk), dtype=bool)
+        for col in NUMERIC_COLUMNS:
+            raw = chunk[col]
+            values = pd.to_numeric(raw, errors='coerce').astype('float64')
+            missing = raw.isna().to_numpy()
+            invalid = ~missing & ~np.isfinite(values.to_numpy())
+            if invalid.any():
+                self._add_samples(col, raw, invalid)
+                values = values.mask(invalid)
+            self.columns[col]['missing'] += int(missing.sum())
+            self.columns[col]['invalid'] += int(invalid.sum())
+            bad_rows |= missing | invalid
+            chunk[col] = values
+
+        types = _normalize_categories(chunk['Type'])
+        missing = types.isna().to_numpy()
+        self.columns['Type']['missing'] += int(missing.sum())
+        bad_rows |= missing
+        chunk['Type'] = types
+
+        self.invalid_rows += int(bad_rows.sum())
+        return chunk
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'invalid_rows': self.invalid_rows,
+            'valid': self.invalid_rows == 0,
+            'columns': self.columns,
+        }
+
+
+def csv_columns(uploaded_file) -> pd.Index:
+    """Header column names of the uploaded CSV, whitespace stripped. Rewinds the file afterwards."""
+    header = pd.read_csv(uploaded_file, nrows=0)
+    uploaded_file.seek(0)
+    return header.columns.str.strip()
+
+
+def iter_csv_chunks(uploaded_file, chunk_rows: Optional[int] = None,
+                    report: Optional[ValidationReport] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read the uploaded CSV in chunks of `chunk_rows` rows (settings.CSV_CHUNK_ROWS
+    by default) so memory stays bounded regardless of file size.
+    - Validates required columns on the header before reading any rows
+    - Strips column whitespace
+    - Drops empty rows (chunks left empty are skipped)
+    - Coerces numeric columns and Type, recording problems in `report` (see ValidationReport)
+    Raises ValueError if columns are missing.
+    """
+    chunk_rows = chunk_rows or settings.CSV_CHUNK_ROWS
+    columns = csv_columns(uploaded_file)
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    report = report if report is not None else ValidationReport()
+    for chunk in pd.read_csv(uploaded_file, chunksize=chunk_rows):
+        chunk.columns = columns
+        chunk = chunk.dropna(how='all')
+        if len(chunk):
+            yield report.check(chunk)
 
 
 def parse_csv(uploaded_file) -> pd.DataFrame:
@@ -21,49 +161,413 @@ def parse_csv(uploaded_file) -> pd.DataFrame:
     - Strips column whitespace
     - Drops empty rows
     - Validates required columns exist
+    - Returns compact dtypes (see compact_frame)
     Raises ValueError if columns are missing.
     """
-    df = pd.read_csv(uploaded_file)
-    df.columns = df.columns.str.strip()
-    df = df.dropna(how='all')
-    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    chunks = list(iter_csv_chunks(uploaded_file))
+    if not chunks:
+        uploaded_file.seek(0)
+        return pd.DataFrame(columns=csv_columns(uploaded_file))
+    return compact_frame(pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0])
+
+
+def memory_footprint(df: pd.DataFrame) -> int:
+    """Bytes held by a DataFrame, including the Python strings of object columns."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _as_float32(values: pd.Series) -> Optional[pd.Series]:
+    """float32 copy of a numeric column, or None if that would change any value by more than FLOAT32_RTOL."""
+    data = values.to_numpy(dtype='float64', na_value=np.nan)
+    with np.errstate(over='ignore', under='ignore'):
+        small = data.astype(np.float32)
+    back = small.astype(np.float64)
+    finite = np.isfinite(data)
+    if not np.array_equal(finite, np.isfinite(back)):
+        return None
+    if not np.all(np.abs(back[finite] - data[finite]) <= FLOAT32_RTOL * np.abs(data[finite])):
+        return None
+    return pd.Series(small, index=values.index, name=values.name)
+
+
+def compact_frame(df: pd.DataFrame, float32: bool = True) -> pd.DataFrame:
+    """
+    Copy of `df` with dtypes suited to in-memory analysis: numeric columns are
+    coerced and stored as float32 where precision allows (float64 when
+    `float32` is False), Type is a cleaned categorical and Equipment Name
+    becomes categorical when names repeat.
+    Aggregations still accumulate in float64 (see SummaryAccumulator).
+    Stored datasets and API output keep full float64 precision.
+    """
+    before = memory_footprint(df) if logger.isEnabledFor(logging.DEBUG) else None
+    df = df.copy(deep=False)
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce').astype('float64')
+            small = _as_float32(values) if float32 else None
+            df[col] = small if small is not None else values
+    if 'Type' in df.columns:
+        df['Type'] = _normalize_categories(df['Type'])
+    name = 'Equipment Name'
+    if name in df.columns and not isinstance(df[name].dtype, pd.CategoricalDtype) and len(df):
+        if df[name].nunique(dropna=True) <= CATEGORY_MAX_UNIQUE_RATIO * len(df):
+            df[name] = df[name].astype('category')
+    if before is not None:
+        logger.debug('compact_frame: %d rows, %d -> %d bytes', len(df), before, memory_footprint(df))
     return df
 
 
-def compute_summary(df: pd.DataFrame) -> Dict[str, Any]:
+def _empty_moments() -> Dict[str, Any]:
+    return {'count': 0, 'sum': 0.0, 'm2': 0.0, 'min': None, 'max': None}
+
+
+def _merge_moments(into: Dict[str, Any], count, total, m2, minimum, maximum) -> None:
     """
-    Compute summary statistics from the DataFrame.
-    Returns dict with total_count, avg_flowrate, avg_pressure, avg_temperature,
-    type_distribution (count per type), and type_stats (per-type count, avg_temperature, avg_pressure).
-    """
-    total_count = float(len(df))
-    avg_flowrate = round(df['Flowrate'].mean(), 2) if total_count > 0 else 0.0
-    avg_pressure = round(df['Pressure'].mean(), 2) if total_count > 0 else 0.0
-    avg_temperature = round(df['Temperature'].mean(), 2) if total_count > 0 else 0.0
-    type_distribution = df['Type'].value_counts().to_dict()
-
-    # Per-type stats: count, avg_temperature, avg_pressure for each equipment type
-    type_stats = {}
-    for eq_type in df['Type'].dropna().unique():
-        sub = df[df['Type'] == eq_type]
-        type_stats[str(eq_type)] = {
-            'count': int(len(sub)),
-            'avg_temperature': round(sub['Temperature'].mean(), 2),
-            'avg_pressure': round(sub['Pressure'].mean(), 2),
-        }
+    Fold one partial (count, sum, sum of squared deviations from its mean,
+    min, max) into `into`, combining the squared deviations with Chan's formula.
+    """
+    count = int(count)
+    if not count:
+        return
+    total, m2 = float(total), float(m2)
+    if into['count']:
+        delta = total / count - into['sum'] / into['count']
+        m2 += delta * delta * into['count'] * count / (into['count'] + count)
+    into['count'] += count
+    into['sum'] += total
+    into['m2'] += m2
+    minimum, maximum = float(minimum), float(maximum)
+    into['min'] = minimum if into['min'] is None else min(into['min'], minimum)
+    into['max'] = maximum if into['max'] is None else max(into['max'], maximum)
 
+
+def _significant(value: Optional[float]) -> Optional[float]:
+    return None if value is None else float(f'{value:.{STAT_DIGITS}g}')
+
+
+def _column_stats(moments: Dict[str, Any], digest: QuantileDigest, histogram: BinnedHistogram) -> Dict[str, Any]:
+    """Public statistics of one column (overall or for one type)."""
+    count = moments['count']
+    mean = moments['sum'] / count if count else None
+    std = math.sqrt(moments['m2'] / (count - 1)) if count > 1 else None
+    quantiles = digest.quantiles(SUMMARY_QUANTILES)
     return {
-        'total_count': total_count,
-        'avg_flowrate': avg_flowrate,
-        'avg_pressure': avg_pressure,
-        'avg_temperature': avg_temperature,
-        'type_distribution': type_distribution,
-        'type_stats': type_stats,
+        'count': count,
+        'mean': _significant(mean),
+        'std': _significant(std),
+        'min': moments['min'],
+        'max': moments['max'],
+        'quantiles': {f'p{q * 100:g}': _significant(v) for q, v in zip(SUMMARY_QUANTILES, quantiles)},
+        'histogram': histogram.as_bins(),
     }
 
 
+class SummaryAccumulator:
+    """
+    Mergeable single-pass summary engine.
+
+    Keeps count, sum, squared deviations, min and max per numeric column,
+    overall and per equipment type, plus a quantile digest and a histogram
+    (see sketches.py) unless created with sketches=False. update() folds in a
+    DataFrame chunk with vectorized groupbys and one sort per column, merge()
+    combines accumulators built over other chunks, processes or datasets, and
+    to_dict()/from_dict() make the partial state JSON/pickle friendly.
+    result() returns the summary dict compute_summary() has always returned,
+    plus column_stats.
+    """
+
+    def __init__(self, sketches: bool = True):
+        self.sketches = sketches
+        self.total_rows = 0
+        self.columns: Dict[str, Dict[str, Any]] = {col: _empty_moments() for col in NUMERIC_COLUMNS}
+        self.digests = {col: QuantileDigest() for col in NUMERIC_COLUMNS}
+        self.histograms = {col: BinnedHistogram() for col in NUMERIC_COLUMNS}
+        # type -> {'rows': n, 'columns': {column: moments}, 'digests': {...}, 'histograms': {...}}
+        self.types: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, sketches: bool = True) -> 'SummaryAccumulator':
+        accumulator = cls(sketches)
+        accumulator.update(df)
+        return accumulator
+
+    def _type_entry(self, key: str) -> Dict[str, Any]:
+        entry = self.types.get(key)
+        if entry is None:
+            entry = self.types[key] = {
+                'rows': 0,
+                'columns': {col: _empty_moments() for col in NUMERIC_COLUMNS},
+                'digests': {col: QuantileDigest() for col in NUMERIC_COLUMNS},
+                'histograms': {col: BinnedHistogram() for col in NUMERIC_COLUMNS},
+            }
+        return entry
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Fold one chunk into the running totals."""
+        self.total_rows += len(df)
+        cols = [c for c in NUMERIC_COLUMNS if c in df.columns]
+        values = df[cols].astype('float64')
+
+        counts = values.count()
+        for col in cols:
+            _merge_moments(self.columns[col], counts[col], values[col].sum(),
+                           values[col].var(ddof=0) * counts[col], values[col].min(), values[col].max())
+
+        if 'Type' not in df.columns:
+            if self.sketches:
+                self._update_sketches(values, np.full(len(df), -1), [])
+            return
+        keys = df['Type']
+        grouped = values.groupby(keys, sort=False, observed=True)
+        sizes = grouped.size()
+        counts, sums, mins, maxs = grouped.count(), grouped.sum(), grouped.min(), grouped.max()
+        m2s = grouped.var(ddof=0).mul(counts)
+        for eq_type, rows in sizes.items():
+            entry = self._type_entry(str(eq_type))
+            entry['rows'] += int(rows)
+            for col in cols:
+                _merge_moments(entry['columns'][col], counts.at[eq_type, col], sums.at[eq_type, col],
+                               m2s.at[eq_type, col], mins.at[eq_type, col], maxs.at[eq_type, col])
+        if self.sketches:
+            codes, uniques = pd.factorize(keys, sort=False)
+            self._update_sketches(values, codes, [str(u) for u in uniques])
+
+    def _update_sketches(self, values: pd.DataFrame, codes: np.ndarray, keys: List[str]) -> None:
+        """Fold a chunk into the digests and histograms; `codes` index `keys`, -1 for rows without a type."""
+        for col in values.columns:
+            data = values[col].to_numpy()
+            valid = ~np.isnan(data)
+            data, group = data[valid], codes[valid].astype(np.int16 if len(keys) < 2**15 else np.int32)
+            if not len(data):
+                continue
+            # Group rows by type (a radix sort for small codes), then sort each type's run in place
+            order = np.argsort(group, kind='stable')
+            data, group = data[order], group[order]
+            starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+            for start, end in zip(starts, np.r_[starts[1:], len(data)]):
+                data[start:end].sort()
+                digest = QuantileDigest.from_sorted(data[start:end])
+                self.digests[col].merge(digest)
+                if group[start] >= 0:
+                    self._type_entry(keys[group[start]])['digests'][col].merge(digest)
+
+            # Count every type on the column's bin grid with a single bincount
+            histogram = self.histograms[col]
+            exponent = histogram.exponent_for(float(data.min()), float(data.max()))
+            bins = np.floor(data / 2.0 ** exponent).astype(np.int64)
+            offset = int(bins.min())
+            width = int(bins.max()) - offset + 1
+            table = np.bincount((group + 1).astype(np.int64) * width + (bins - offset),
+                                minlength=(len(keys) + 1) * width).reshape(len(keys) + 1, width)
+            histogram.add(exponent, offset, table.sum(axis=0))
+            for code in group[starts]:
+                if code >= 0:
+                    self._type_entry(keys[code])['histograms'][col].add(exponent, offset, table[code + 1])
+
+    def merge(self, other: 'SummaryAccumulator') -> 'SummaryAccumulator':
+        """Combine another accumulator's totals into this one. Returns self."""
+        self.total_rows += other.total_rows
+        for col, m in other.columns.items():
+            _merge_moments(self.columns.setdefault(col, _empty_moments()),
+                           m['count'], m['sum'], m['m2'], m['min'], m['max'])
+            self.digests[col].merge(other.digests[col])
+            self.histograms[col].merge(other.histograms[col])
+        for key, other_entry in other.types.items():
+            entry = self._type_entry(key)
+            entry['rows'] += other_entry['rows']
+            for col, m in other_entry['columns'].items():
+                _merge_moments(entry['columns'].setdefault(col, _empty_moments()),
+                               m['count'], m['sum'], m['m2'], m['min'], m['max'])
+                entry['digests'][col].merge(other_entry['digests'][col])
+                entry['histograms'][col].merge(other_entry['histograms'][col])
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        def sketches(digests, histograms):
+            return {
+                'digests': {col: d.to_dict() for col, d in digests.items()},
+                'histograms': {col: h.to_dict() for col, h in histograms.items()},
+            }
+
+        return {
+            'total_rows': self.total_rows,
+            'columns': self.columns,
+            **sketches(self.digests, self.histograms),
+            'types': {
+                key: {'rows': entry['rows'], 'columns': entry['columns'],
+                      **sketches(entry['digests'], entry['histograms'])}
+                for key, entry in self.types.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SummaryAccumulator':
+        accumulator = cls()
+        accumulator.total_rows = int(data.get('total_rows', 0))
+        accumulator.columns.update(data.get('columns', {}))
+        for col, d in data.get('digests', {}).items():
+            accumulator.digests[col] = QuantileDigest.from_dict(d)
+        for col, h in data.get('histograms', {}).items():
+            accumulator.histograms[col] = BinnedHistogram.from_dict(h)
+        for key, entry_data in data.get('types', {}).items():
+            entry = accumulator._type_entry(key)
+            entry['rows'] = entry_data['rows']
+            entry['columns'].update(entry_data['columns'])
+            for col, d in entry_data.get('digests', {}).items():
+                entry['digests'][col] = QuantileDigest.from_dict(d)
+            for col, h in entry_data.get('histograms', {}).items():
+                entry['histograms'][col] = BinnedHistogram.from_dict(h)
+        return accumulator
+
+    @staticmethod
+    def _mean(moments: Dict[str, Any]) -> Optional[float]:
+        return round(moments['sum'] / moments['count'], 2) if moments['count'] else None
+
+    def type_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-type count, avg_temperature and avg_pressure."""
+        return {
+            t: {
+                'count': entry['rows'],
+                'avg_temperature': self._mean(entry['columns']['Temperature']),
+                'avg_pressure': self._mean(entry['columns']['Pressure']),
+            }
+            for t, entry in self.types.items()
+        }
+
+    def column_stats(self) -> Dict[str, Any]:
+        """
+        {'columns': {column: stats}, 'types': {type: {column: stats}}} where stats
+        has count, mean, std, min, max, quantiles (p1 .. p99) and histogram
+        ({'edges': [...], 'counts': [...]}).
+        """
+        return {
+            'columns': {
+                col: _column_stats(self.columns[col], self.digests[col], self.histograms[col])
+                for col in NUMERIC_COLUMNS
+            },
+            'types': {
+                t: {
+                    col: _column_stats(entry['columns'][col], entry['digests'][col], entry['histograms'][col])
+                    for col in NUMERIC_COLUMNS
+                }
+                for t, entry in self.types.items()
+            },
+        }
+
+    def result(self) -> Dict[str, Any]:
+        averages = {col: self._mean(self.columns[col]) or 0.0 for col in NUMERIC_COLUMNS}
+        by_count = sorted(self.types.items(), key=lambda item: item[1]['rows'], reverse=True)
+        summary = {
+            'total_count': float(self.total_rows),
+            'avg_flowrate': averages['Flowrate'],
+            'avg_pressure': averages['Pressure'],
+            'avg_temperature': averages['Temperature'],
+            'type_distribution': {t: entry['rows'] for t, entry in by_count},
+            'type_stats': self.type_stats(),
+        }
+        if self.sketches:
+            summary['column_stats'] = self.column_stats()
+        return summary
+
+
+def ingest_csv(uploaded_file, storage_path, chunk_rows: Optional[int] = None,
+               on_chunk: Optional[Callable[[int], None]] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Stream an uploaded CSV chunk by chunk into columnar storage at
+    `storage_path`, accumulating the summary along the way.
+    `on_chunk(rows_so_far)` is called after each chunk is written.
+    Returns (summary_data, row_count); summary_data['validation'] is the
+    ValidationReport of the file and summary_data['outliers'] the result of
+    one more pass over the stored rows (see outliers.py). Nothing is left on
+    disk on failure.
+    """
+    accumulator = SummaryAccumulator()
+    report = ValidationReport()
+    # The header fixes the stored columns, so a file without data rows keeps them too
+    columns = list(csv_columns(uploaded_file))
+    with storage.ColumnarWriter(storage_path, columns) as writer:
+        for chunk in timed_iter(iter_csv_chunks(uploaded_file, chunk_rows, report), 'parse'):
+            with stage('summary'):
+                accumulator.update(chunk)
+            with stage('store'):
+                writer.write(chunk)
+            if on_chunk is not None:
+                on_chunk(writer.row_count)
+    summary = accumulator.result()
+    summary['validation'] = report.to_dict()
+    try:
+        with stage('outliers'):
+            frames = storage.iter_frames(storage_path, ['Type'] + OUTLIER_COLUMNS)
+            summary['outliers'] = find_outliers(frames, summary['column_stats'])
+    except Exception:
+        Path(storage_path).unlink(missing_ok=True)
+        raise
+    return summary, writer.row_count
+
+
+def ingest_csv_file(source_path, storage_path, chunk_rows: int) -> Tuple[Dict[str, Any], int]:
+    """
+    ingest_csv() for a CSV already on disk. Touches no database or settings,
+    so it can run in a worker process (used by batch uploads).
+    """
+    with open(source_path, 'rb') as fh:
+        return ingest_csv(fh, storage_path, chunk_rows)
+
+
+def compute_summary(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Compute summary statistics from the DataFrame in a single groupby pass.
+    Returns dict with total_count, avg_flowrate, avg_pressure, avg_temperature,
+    type_distribution (count per type), type_stats (per-type count, avg_temperature, avg_pressure)
+    and column_stats (see SummaryAccumulator.column_stats).
+    """
+    return SummaryAccumulator.from_frame(df).result()
+
+
+def compute_column_stats(frames) -> Dict[str, Any]:
+    """column_stats (std-dev, quantiles, histograms) of an iterable of DataFrame chunks."""
+    accumulator = SummaryAccumulator()
+    for df in frames:
+        # float64 values as in ingest_csv; min/max of float32 copies read 8.699999809265137
+        accumulator.update(compact_frame(df, float32=False))
+    return accumulator.column_stats()
+
+
+def compute_type_stats(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute type_stats (count, avg_temperature, avg_pressure per type) from a
+    DataFrame. Returns {} if the Type/Temperature/Pressure columns are missing.
+    """
+    for col in ['Type', 'Temperature', 'Pressure']:
+        if col not in df.columns:
+            return {}
+    return SummaryAccumulator.from_frame(df, sketches=False).type_stats()
+
+
+def query_frame(df: pd.DataFrame, types=None, ranges=None, sort: Optional[str] = None) -> pd.DataFrame:
+    """
+    Filter rows with vectorized masks and optionally sort them.
+    - types: keep rows whose Type is in this list
+    - ranges: {column: (min or None, max or None)}, inclusive bounds
+    - sort: column name, prefixed with '-' for descending
+    """
+    mask = pd.Series(True, index=df.index)
+    if types:
+        mask &= df['Type'].astype(str).isin(types)
+    for col, (low, high) in (ranges or {}).items():
+        values = pd.to_numeric(df[col], errors='coerce')
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    if not mask.all():
+        df = df[mask]
+    if sort:
+        col = sort.lstrip('-')
+        df = df.sort_values(col, ascending=not sort.startswith('-'), kind='stable', na_position='last')
+    return df.reset_index(drop=True)
+
+
 def compute_type_stats_from_raw_data(raw_data: list) -> Dict[str, Dict[str, Any]]:
     """
     Compute type_stats (count, avg_temperature, avg_pressure per type) from
@@ -75,28 +579,66 @@ def compute_type_stats_from_raw_data(raw_data: list) -> Dict[str, Dict[str, Any]
     # Normalize column names (could be 'Temperature' or 'Pressure' from CSV)
     col_map = {c: c.strip() for c in df.columns}
     df = df.rename(columns=col_map)
-    for col in ['Type', 'Temperature', 'Pressure']:
-        if col not in df.columns:
-            return {}
-    type_stats = {}
-    for eq_type in df['Type'].dropna().unique():
-        sub = df[df['Type'] == eq_type]
-        type_stats[str(eq_type)] = {
-            'count': int(len(sub)),
-            'avg_temperature': round(float(sub['Temperature'].mean()), 2),
-            'avg_pressure': round(float(sub['Pressure'].mean()), 2),
-        }
-    return type_stats
+    return compute_type_stats(compact_frame(df))
+
+
+PDF_OUTLIER_ROWS = 20
+# Height / width of the embedded chart images (charts.CHART_SIZE)
+PDF_CHART_ASPECT = 4.0 / 6.4
 
 
-def generate_pdf(dataset, summary) -> io.BytesIO:
+def _outlier_section(dataset, outliers, styles):
+    """Flagged counts per column and type, then the most extreme flagged rows."""
+    params = outliers.get('params', {})
+    elements = [Paragraph("<b>Outliers</b>", styles['Heading2']),
+                Paragraph(f"Values with |z| &gt; {params.get('z_threshold')} or outside "
+                          f"{params.get('iqr_factor')} x IQR of their equipment type.", styles['Normal']),
+                Spacer(1, 8)]
+    counts = [['Column', 'Flagged', 'By type']]
+    worst = []
+    for col, entry in outliers['columns'].items():
+        by_type = ', '.join(f"{t}: {n}" for t, n in sorted(entry.get('by_type', {}).items(), key=lambda kv: -kv[1]))
+        counts.append([col, str(entry.get('count', 0)), Paragraph(by_type or '-', styles['Normal'])])
+        for row in flagged_rows(dataset, outliers, col):
+            worst.append((abs(row['z']) if row['z'] is not None else 0.0, col, row))
+    elements.append(_report_table(counts, colWidths=[80, 60, 300]))
+
+    if worst:
+        worst.sort(key=lambda item: -item[0])
+        rows = [['Row', 'Equipment', 'Type', 'Column', 'Value', 'z', 'Rules']]
+        for _, col, row in worst[:PDF_OUTLIER_ROWS]:
+            rows.append([str(row['row'] + 1), str(row['Equipment Name']), str(row['Type']), col, str(row[col]),
+                         '' if row['z'] is None else str(row['z']), ', '.join(row['rules'])])
+        elements.append(Spacer(1, 12))
+        elements.append(Paragraph(f"Most extreme {len(rows) - 1} flagged values", styles['Normal']))
+        elements.append(Spacer(1, 6))
+        elements.append(_report_table(rows))
+    return elements
+
+
+def _report_table(data, **kwargs):
+    table = Table(data, **kwargs)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    return table
+
+
+def generate_pdf(dataset, summary, output=None, charts=None):
     """
     Generate a PDF report using ReportLab.
-    Includes title, file name, upload date, summary stats, and type distribution table.
-    Returns a BytesIO buffer.
+    Includes title, file name, upload date, summary stats, type distribution table,
+    the chart images in `charts` (paths, laid out two per row) and flagged outliers.
+    Writes to `output` (path or binary file) if given, otherwise returns a BytesIO buffer.
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
+    buffer = io.BytesIO() if output is None else output
+    doc = SimpleDocTemplate(buffer if isinstance(buffer, io.IOBase) else str(buffer), pagesize=letter, rightMargin=72, leftMargin=72,
                            topMargin=72, bottomMargin=18)
     styles = getSampleStyleSheet()
     title_style = ParagraphStyle(
@@ -144,6 +686,21 @@ def generate_pdf(dataset, summary) -> io.BytesIO:
     ]))
     elements.append(table)
 
+    if charts:
+        elements.append(Spacer(1, 20))
+        elements.append(Paragraph("<b>Charts</b>", styles['Heading2']))
+        width = (doc.width - 12) / 2
+        images = [Image(str(path), width=width, height=width * PDF_CHART_ASPECT) for path in charts]
+        grid = Table([images[i:i + 2] for i in range(0, len(images), 2)])
+        grid.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+        elements.append(grid)
+
+    outliers = getattr(summary, 'outliers', None) or {}
+    if outliers.get('columns'):
+        elements.append(Spacer(1, 20))
+        elements.extend(_outlier_section(dataset, outliers, styles))
+
     doc.build(elements)
-    buffer.seek(0)
+    if output is None:
+        buffer.seek(0)
     return buffer
@@ -1,23 +1,35 @@
 """
 API views for the equipment app.
 """
-import io
-import zipfile
-from pathlib import Path
-
+import pandas as pd
 from django.conf import settings
 from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
-from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 
-from .models import UploadedDataset, DataSummary
-from .serializers import UploadedDatasetListSerializer, UploadedDatasetDetailSerializer, DataSummarySerializer
-from .utils import parse_csv, compute_summary, compute_type_stats_from_raw_data, generate_pdf
+from . import cache
+from .app_archive import ARCHIVE_NAME, get_archive
+from .batch import collect_sources, store_batch
+from .charts import CHART_FORMATS, CHART_KINDS, chart_data, render_charts
+from .jobs import expire_stale_jobs, submit_upload
+from .models import UploadedDataset, DataSummary, RetentionPolicy, UploadJob
+from .outliers import OUTLIER_COLUMNS, flagged_rows
+from .plotting import PLOT_KINDS, PlotBuilder, build_plot, column_bounds
+from .profiling import stage
+from .responses import json_rows_response, ndjson_response, ranged_file_response
+from .retention import prune_user, retention_limits
+from .serializers import (
+    UploadedDatasetListSerializer, UploadedDatasetDetailSerializer, DataSummarySerializer,
+    RetentionPolicySerializer, UploadJobSerializer,
+)
+from .services import backfill_summary, missing_summary_fields, store_upload
+from .storage import frame_to_records
+from .trends import AGGREGATE_STATS, compare_datasets, trend_series
+from .utils import NUMERIC_COLUMNS, generate_pdf, query_frame
 
 
 @api_view(['GET'])
@@ -32,23 +44,18 @@ def ensure_csrf(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def download_app(request):
-    """Serve the desktop app as a zip file."""
-    project_root = Path(settings.BASE_DIR).parent
-    desktop_dir = project_root / 'desktop'
-    if not desktop_dir.exists():
+    """
+    Serve the desktop app as a zip file. The archive is prebuilt on disk and
+    only rebuilt when desktop/ changes; supports ETag revalidation and Range requests.
+    """
+    archive = get_archive()
+    if archive is None:
         return Response({'error': 'Desktop app not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for file_path in desktop_dir.rglob('*'):
-            if file_path.is_file() and '__pycache__' not in str(file_path):
-                arcname = file_path.relative_to(desktop_dir.parent)
-                zf.write(file_path, arcname)
-
-    buffer.seek(0)
-    response = HttpResponse(buffer.read(), content_type='application/zip')
-    response['Content-Disposition'] = 'attachment; filename="chemical-equipment-visualizer-desktop.zip"'
-    return response
+    path, fingerprint = archive
+    etag = f'"{fingerprint}"'
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    return ranged_file_response(request, path, 'application/zip', ARCHIVE_NAME, etag)
 
 
 @api_view(['POST'])
@@ -117,12 +124,24 @@ def auth_logout(request):
     return Response({'detail': 'Logged out'})
 
 
+def _wants_async(request) -> bool:
+    """True if the client asked for (or the server defaults to) async upload processing."""
+    value = request.query_params.get('async', request.data.get('async'))
+    if value is None:
+        return settings.UPLOAD_ASYNC_DEFAULT
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def upload_file(request):
     """
-    Receive 'file' in request.FILES, parse CSV, compute summary,
-    save UploadedDataset and DataSummary, keep only last 5 datasets.
+    Receive 'file' in request.FILES, stream the CSV in chunks into columnar
+    storage while validating rows and computing the summary, save
+    UploadedDataset and DataSummary, then apply the user's retention policy.
+    The response includes the validation report (missing/invalid values per column).
+    With async=true (or settings.UPLOAD_ASYNC_DEFAULT) the file is queued as an
+    UploadJob instead and 202 is returned with the job id to poll.
     """
     if 'file' not in request.FILES:
         return Response(
@@ -137,88 +156,551 @@ def upload_file(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    if _wants_async(request):
+        job = submit_upload(request.user, uploaded_file)
+        return Response({
+            'job_id': str(job.id),
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.id}/',
+        }, status=status.HTTP_202_ACCEPTED)
+
     try:
-        df = parse_csv(uploaded_file)
+        dataset, summary_data, deduplicated = store_upload(request.user, uploaded_file.name, uploaded_file)
     except ValueError as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': f'Failed to parse CSV: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
-    summary_data = compute_summary(df)
-    raw_data = df.to_dict(orient='records')
-
-    dataset = UploadedDataset.objects.create(
-        user=request.user,
-        file_name=uploaded_file.name,
-        raw_data=raw_data
-    )
-    DataSummary.objects.create(
-        dataset=dataset,
-        total_count=summary_data['total_count'],
-        avg_flowrate=summary_data['avg_flowrate'],
-        avg_pressure=summary_data['avg_pressure'],
-        avg_temperature=summary_data['avg_temperature'],
-        type_distribution=summary_data['type_distribution'],
-        type_stats=summary_data.get('type_stats', {}),
-    )
-
-    # Delete datasets beyond the 5 most recent for THIS user only
-    excess = UploadedDataset.objects.filter(user=request.user).order_by('-uploaded_at')[5:]
-    for d in excess:
-        d.delete()
-
+    summary_data = dict(summary_data)
+    # Flagged rows are served by /datasets/<id>/outliers/
+    summary_data.pop('outliers', None)
     return Response({
         'dataset_id': dataset.id,
         'summary': summary_data,
+        'validation': summary_data.pop('validation', None) or {},
+        'deduplicated': deduplicated,
     }, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_batch(request):
+    """
+    Receive many CSVs as 'files' and/or zip/tar archives of CSVs as 'archive',
+    parse them concurrently and save them in bulk. Returns per-file results.
+    Batches over BATCH_UPLOAD_MAX_FILES CSVs or BATCH_UPLOAD_MAX_BYTES of CSV
+    data are rejected before anything is extracted.
+    """
+    files = request.FILES.getlist('files')
+    archives = request.FILES.getlist('archive')
+    if not files and not archives:
+        return Response({'error': 'No files provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        items = collect_sources(files, archives)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not items:
+        return Response({'error': 'No CSV files found'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = store_batch(request.user, items)
+    created = any(r['status'] != 'error' for r in results)
+    return Response(
+        {'results': results},
+        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """Return phase and progress of an async upload job; jobs that lost their worker are reported failed."""
+    try:
+        job = UploadJob.objects.get(pk=job_id, user=request.user)
+    except UploadJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.is_stale():
+        expire_stale_jobs(pk=job.pk)
+        job.refresh_from_db()
+    return Response(UploadJobSerializer(job).data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dataset_list(request):
-    """Return list of last 5 datasets (id, file_name, uploaded_at)."""
-    datasets = UploadedDataset.objects.filter(user=request.user)[:5]
+    """
+    Return list of the user's retained datasets, newest first (id, file_name, uploaded_at).
+    Optional query param type (comma separated): only datasets containing those equipment types.
+    """
+    max_datasets, _ = retention_limits(request.user)
+    datasets = UploadedDataset.objects.filter(user=request.user)
+    types = [t.strip() for t in request.query_params.get('type', '').split(',') if t.strip()]
+    if types:
+        # Served by the GIN index on type_distribution when running on PostgreSQL
+        datasets = datasets.filter(summary__type_distribution__has_any_keys=types)
+    datasets = datasets.only('id', 'file_name', 'uploaded_at')[:max_datasets]
     serializer = UploadedDatasetListSerializer(datasets, many=True)
     return Response(serializer.data)
 
 
+def _parse_int(params, name, default, minimum=0, maximum=None):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+    if value < minimum:
+        raise ValueError(f"'{name}' must be >= {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _parse_dataset_query(params, columns):
+    """
+    Validate dataset_detail query params against the dataset's columns.
+    Returns dict with offset, limit, fields, types, ranges, sort.
+    Raises ValueError with a client-facing message.
+    """
+    query = {
+        'offset': _parse_int(params, 'offset', 0),
+        'limit': _parse_int(params, 'limit', settings.DATASET_PAGE_SIZE, minimum=1,
+                            maximum=settings.DATASET_MAX_PAGE_SIZE),
+        'fields': None,
+        'types': None,
+        'ranges': {},
+        'sort': None,
+    }
+    if params.get('fields'):
+        fields = [f.strip() for f in params['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        query['fields'] = fields
+    if params.get('type'):
+        if 'Type' not in columns:
+            raise ValueError("Cannot filter by type: the dataset has no Type column")
+        query['types'] = [t.strip() for t in params['type'].split(',') if t.strip()]
+    for col in NUMERIC_COLUMNS:
+        low, high = params.get(f'min_{col.lower()}'), params.get(f'max_{col.lower()}')
+        if low is None and high is None:
+            continue
+        if col not in columns:
+            raise ValueError(f"Cannot filter by unknown column: {col}")
+        try:
+            query['ranges'][col] = (float(low) if low else None, float(high) if high else None)
+        except ValueError:
+            raise ValueError(f"Range bounds for {col} must be numbers")
+    if params.get('sort'):
+        if params['sort'].lstrip('-') not in columns:
+            raise ValueError(f"Cannot sort by unknown column: {params['sort'].lstrip('-')}")
+        query['sort'] = params['sort']
+    return query
+
+
+def _parse_list(params, name, choices, default):
+    """Comma separated query param restricted to `choices`; `default` when absent."""
+    values = [v.strip() for v in params.get(name, '').split(',') if v.strip()]
+    unknown = [v for v in values if v not in choices]
+    if unknown:
+        raise ValueError(f"Unknown {name}: {', '.join(unknown)} (choose from {', '.join(choices)})")
+    return values or list(default)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def retention_policy(request):
+    """
+    GET: the user's effective retention (max_datasets, max_age_days).
+    PUT: override them; null resets a value to the server default.
+    """
+    if request.method == 'PUT':
+        policy, _ = RetentionPolicy.objects.get_or_create(user=request.user)
+        serializer = RetentionPolicySerializer(policy, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        prune_user(request.user)
+    max_datasets, max_age_days = retention_limits(request.user)
+    return Response({'max_datasets': max_datasets, 'max_age_days': max_age_days})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dataset_detail(request, pk):
-    """Return one dataset with its raw_data."""
+    """
+    Return one page of a dataset's rows.
+    Query params: offset, limit (default settings.DATASET_PAGE_SIZE), fields (comma
+    separated columns), type (comma separated), min_/max_<flowrate|pressure|temperature>,
+    sort (column, '-' prefix for descending). Only the needed columns are read.
+    """
     try:
-        dataset = UploadedDataset.objects.get(pk=pk, user=request.user)
+        dataset = UploadedDataset.objects.defer('raw_data').get(pk=pk, user=request.user)
     except UploadedDataset.DoesNotExist:
         return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
-    serializer = UploadedDatasetDetailSerializer(dataset)
-    return Response(serializer.data)
+
+    columns = dataset.column_names()
+    try:
+        query = _parse_dataset_query(request.query_params, columns)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    etag = cache.etag_for(dataset, 'page', cache.query_variant(request.query_params))
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    data = cache.get_or_compute(
+        cache.cache_key(dataset, 'page', cache.query_variant(request.query_params)),
+        lambda: _dataset_page(dataset, query, columns),
+    )
+    return cache.with_etag(Response(data), etag)
+
+
+def _dataset_page(dataset, query, columns):
+    """Build the dataset_detail response body for a validated query."""
+    fields = query['fields'] or columns
+    offset, limit = query['offset'], query['limit']
+    with stage('load'):
+        if query['types'] or query['ranges'] or query['sort']:
+            frames = list(_iter_query_frames(dataset, query, columns))
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=fields)
+            count = len(df)
+            page = df.iloc[offset:offset + limit]
+        else:
+            count = dataset.row_count if dataset.storage_path else len(dataset.raw_data or [])
+            page = dataset.load_slice(offset, offset + limit, fields)
+
+    with stage('serialize'):
+        serializer = UploadedDatasetDetailSerializer(dataset, context={'rows': frame_to_records(page)})
+        data = dict(serializer.data)
+    data.update({
+        'count': count,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if offset + limit < count else None,
+        'fields': fields,
+    })
+    return data
+
+
+def _iter_query_frames(dataset, query, columns):
+    """Yield the rows matching a dataset query chunk by chunk (one frame when sorting)."""
+    fields = query['fields'] or columns
+    needed = list(fields)
+    extra = list(query['ranges'])
+    if query['types']:
+        extra.append('Type')
+    if query['sort']:
+        extra.append(query['sort'].lstrip('-'))
+    needed += [c for c in dict.fromkeys(extra) if c not in needed]
+    if query['sort']:
+        yield query_frame(dataset.load_frame(needed), query['types'], query['ranges'], query['sort'])[fields]
+        return
+    for chunk in dataset.iter_frames(needed):
+        yield query_frame(chunk, query['types'], query['ranges'])[fields]
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_export(request, pk):
+    """
+    Stream every row of a dataset without pagination, chunk by chunk.
+    Accepts the dataset_detail filters (fields, type, min_/max_<column>, sort);
+    output=ndjson (default, one row per line) or output=json ({..., "rows": [...]}).
+    """
+    try:
+        dataset = UploadedDataset.objects.defer('raw_data').get(pk=pk, user=request.user)
+    except UploadedDataset.DoesNotExist:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    output = request.query_params.get('output', 'ndjson')
+    if output not in ('ndjson', 'json'):
+        return Response({'error': "output must be 'ndjson' or 'json'"}, status=status.HTTP_400_BAD_REQUEST)
+    columns = dataset.column_names()
+    try:
+        query = _parse_dataset_query(request.query_params, columns)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    etag = cache.etag_for(dataset, 'export', cache.query_variant(request.query_params))
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    frames = _iter_query_frames(dataset, query, columns)
+    if output == 'json':
+        head = {'id': dataset.id, 'file_name': dataset.file_name, 'fields': query['fields'] or columns}
+        response = json_rows_response(frames, head, f'{dataset.file_name}.json')
+    else:
+        response = ndjson_response(frames, f'{dataset.file_name}.ndjson')
+    return cache.with_etag(response, etag)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_plot(request, pk):
+    """
+    Chart-ready aggregates of a dataset, sized by the request instead of the row count.
+    kind (comma separated, default both): histogram2d (x vs y counts on a bins x bins
+    grid) and series (columns in row order, LTTB-downsampled to at most `points`).
+    Query params: x, y (default Pressure, Temperature), bins, series (comma separated
+    columns, default all numeric ones the dataset has), points, type (comma separated).
+    """
+    try:
+        dataset = UploadedDataset.objects.select_related('summary').defer('raw_data').get(pk=pk, user=request.user)
+    except UploadedDataset.DoesNotExist:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        summary = dataset.summary
+    except DataSummary.DoesNotExist:
+        return Response({'error': 'Summary not found'}, status=status.HTTP_404_NOT_FOUND)
+    params = request.query_params
+    try:
+        kinds = _parse_list(params, 'kind', PLOT_KINDS, PLOT_KINDS)
+        x, y = params.get('x', 'Pressure'), params.get('y', 'Temperature')
+        for column in (x, y):
+            if column not in NUMERIC_COLUMNS:
+                raise ValueError(f"Unknown column: {column} (choose from {', '.join(NUMERIC_COLUMNS)})")
+        # Legacy raw_data datasets may lack columns: explicit requests for them are
+        # errors, default series just leave them out
+        columns = dataset.column_names()
+        present = [c for c in NUMERIC_COLUMNS if c in columns]
+        if 'histogram2d' in kinds:
+            for column in (x, y):
+                if column not in columns:
+                    raise ValueError(f"Dataset has no {column} column")
+        series = _parse_list(params, 'series', present, present)
+        types = [t.strip() for t in params.get('type', '').split(',') if t.strip()]
+        if types and 'Type' not in columns:
+            raise ValueError("Cannot filter by type: the dataset has no Type column")
+        bins = _parse_int(params, 'bins', settings.PLOT_BINS, minimum=1, maximum=settings.PLOT_MAX_BINS)
+        points = _parse_int(params, 'points', settings.PLOT_POINTS, minimum=3, maximum=settings.PLOT_MAX_POINTS)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    variant = cache.query_variant(params)
+    etag = cache.etag_for(dataset, 'plot', variant)
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    data = cache.get_or_compute(
+        cache.cache_key(dataset, 'plot', variant),
+        lambda: _plot_data(dataset, summary, kinds, x, y, bins, series, points, types),
+    )
+    return cache.with_etag(Response(data), etag)
+
+
+def _plot_data(dataset, summary, kinds, x, y, bins, series, points, types):
+    if 'histogram2d' in kinds and missing_summary_fields(summary):
+        with stage('backfill'):
+            backfill_summary(summary)
+    histogram = 'histogram2d' in kinds
+    builder = PlotBuilder(
+        x if histogram else None, y, bins,
+        column_bounds(summary.column_stats or {}, [x, y], types) if histogram else None,
+        series if 'series' in kinds else [], types,
+        total_rows=dataset.row_count if dataset.storage_path else len(dataset.raw_data or []),
+        points=points,
+    )
+    with stage('plot'):
+        data = build_plot(dataset.iter_frames(builder.columns), builder, kinds, points)
+    return {'id': dataset.id, 'file_name': dataset.file_name, **data}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_outliers(request, pk):
+    """
+    Rows whose Pressure or Temperature is an outlier for their equipment type
+    (|z| above the threshold or outside the IQR fences), with z-scores and the
+    rules that flagged them. Optional query params: column and type (comma
+    separated). Flagged rows are found on upload; only their storage chunks are
+    read here. Cached per dataset content and served with an ETag.
+    """
+    try:
+        dataset = UploadedDataset.objects.select_related('summary').defer('raw_data').get(pk=pk, user=request.user)
+    except UploadedDataset.DoesNotExist:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        summary = dataset.summary
+    except DataSummary.DoesNotExist:
+        return Response({'error': 'Summary not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        columns = _parse_list(request.query_params, 'column', OUTLIER_COLUMNS, OUTLIER_COLUMNS)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    types = [t.strip() for t in request.query_params.get('type', '').split(',') if t.strip()]
+
+    variant = cache.query_variant(request.query_params)
+    etag = cache.etag_for(dataset, 'outliers', variant)
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    data = cache.get_or_compute(cache.cache_key(dataset, 'outliers', variant),
+                                lambda: _outlier_data(dataset, summary, columns, types))
+    return cache.with_etag(Response(data), etag)
+
+
+def _outlier_data(dataset, summary, columns, types):
+    if missing_summary_fields(summary):
+        with stage('backfill'):
+            backfill_summary(summary)
+    outliers = summary.outliers or {}
+    result = {}
+    with stage('load'):
+        for col in columns:
+            entry = outliers.get('columns', {}).get(col, {})
+            rows = flagged_rows(dataset, outliers, col, types)
+            result[col] = {
+                'count': entry.get('count', 0),
+                'by_type': entry.get('by_type', {}),
+                'truncated': entry.get('count', 0) > len(entry.get('rows', [])),
+                'rows': rows,
+            }
+    return {'id': dataset.id, 'file_name': dataset.file_name, 'params': outliers.get('params', {}), 'columns': result}
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def summary_detail(request, pk):
-    """Return the DataSummary for a dataset. Fills type_stats from raw_data if missing."""
+    """
+    Return the DataSummary for a dataset. Fills and saves type_stats from stored rows if missing.
+    Cached per dataset content and served with an ETag (304 on If-None-Match).
+    """
     try:
-        dataset = UploadedDataset.objects.get(pk=pk, user=request.user)
+        dataset = UploadedDataset.objects.select_related('summary').defer('raw_data').get(pk=pk, user=request.user)
     except UploadedDataset.DoesNotExist:
         return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
     try:
         summary = dataset.summary
     except DataSummary.DoesNotExist:
         return Response({'error': 'Summary not found'}, status=status.HTTP_404_NOT_FOUND)
-    data = DataSummarySerializer(summary).data
-    # For older datasets without type_stats, compute from raw_data so charts show avg temp/pressure
-    if not data.get('type_stats') and dataset.raw_data:
-        data['type_stats'] = compute_type_stats_from_raw_data(dataset.raw_data)
+    etag = cache.etag_for(dataset, 'summary')
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    data = cache.get_or_compute(cache.cache_key(dataset, 'summary'), lambda: _summary_data(dataset, summary))
+    return cache.with_etag(Response(data), etag)
+
+
+def _summary_data(dataset, summary):
+    # Older datasets may lack type_stats: compute from stored rows once and save, so charts show avg temp/pressure
+    if missing_summary_fields(summary):
+        with stage('backfill'):
+            backfill_summary(summary)
+    return dict(DataSummarySerializer(summary).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def trends(request):
+    """
+    Series of one column's statistics across the user's datasets, oldest first,
+    overall and per equipment type. Query params: column (default Temperature),
+    stats (comma separated, default all), type (comma separated), limit (default
+    the user's retention limit). Read from materialized aggregates only.
+    """
+    params = request.query_params
+    max_datasets, _ = retention_limits(request.user)
+    try:
+        column = params.get('column', 'Temperature')
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Unknown column: {column} (choose from {', '.join(NUMERIC_COLUMNS)})")
+        stats = _parse_list(params, 'stats', AGGREGATE_STATS, AGGREGATE_STATS)
+        limit = _parse_int(params, 'limit', max_datasets, minimum=1,
+                           maximum=settings.RETENTION_MAX_DATASETS_LIMIT)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    types = [t.strip() for t in params.get('type', '').split(',') if t.strip()]
+    with stage('aggregates'):
+        data = trend_series(request.user, column, stats, types, limit)
+    return Response({'column': column, 'stats': stats, **data})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def compare(request):
+    """
+    Compare two of the user's datasets (query params a and b, dataset ids): each
+    side's statistics and b - a per column, overall and per equipment type.
+    Optional column (comma separated). Read from materialized aggregates only.
+    """
+    params = request.query_params
+    try:
+        a_id = _parse_int(params, 'a', None, minimum=1)
+        b_id = _parse_int(params, 'b', None, minimum=1)
+        if a_id is None or b_id is None:
+            raise ValueError("Query params 'a' and 'b' (dataset ids) are required")
+        columns = _parse_list(params, 'column', NUMERIC_COLUMNS, NUMERIC_COLUMNS)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    datasets = UploadedDataset.objects.filter(user=request.user, pk__in=[a_id, b_id])
+    found = {d.id: d for d in datasets.only('id', 'file_name', 'uploaded_at')}
+    if a_id not in found or b_id not in found:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    with stage('aggregates'):
+        data = compare_datasets(found[a_id], found[b_id], columns)
     return Response(data)
 
 
+def _chart_files(dataset, summary, kinds, fmt):
+    """Cached chart files of a dataset, rendering the missing ones together on the render pool."""
+    paths = {cache.report_file(dataset, f'chart_{kind}', f'.{fmt}'): kind for kind in kinds}
+
+    def build(targets):
+        if missing_summary_fields(summary):
+            with stage('backfill'):
+                backfill_summary(summary)
+        data = chart_data(summary)
+        with stage('charts'):
+            render_charts([(paths[path], data, fmt, str(tmp)) for path, tmp in targets.items()])
+
+    return cache.get_or_build_files(list(paths), build)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dataset_chart(request, pk, kind, fmt):
+    """
+    One of the standard per-type charts (count, share, temperature, pressure)
+    as a PNG or SVG image, e.g. /datasets/1/charts/count.svg. Rendered once per
+    dataset content and streamed from disk with an ETag.
+    """
+    if kind not in CHART_KINDS:
+        return Response({'error': f"Unknown chart: {kind} (choose from {', '.join(CHART_KINDS)})"},
+                        status=status.HTTP_404_NOT_FOUND)
+    if fmt not in CHART_FORMATS:
+        return Response({'error': f"Unknown format: {fmt} (choose from {', '.join(CHART_FORMATS)})"},
+                        status=status.HTTP_404_NOT_FOUND)
+    try:
+        dataset = UploadedDataset.objects.select_related('summary').defer('raw_data').get(pk=pk, user=request.user)
+    except UploadedDataset.DoesNotExist:
+        return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        summary = dataset.summary
+    except DataSummary.DoesNotExist:
+        return Response({'error': 'Summary not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    etag = cache.etag_for(dataset, f'chart_{kind}', fmt)
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    [path] = _chart_files(dataset, summary, [kind], fmt)
+    response = ranged_file_response(request, path, CHART_FORMATS[fmt], f'{kind}_{dataset.file_name}.{fmt}', etag,
+                                    attachment=False)
+    return cache.with_etag(response, etag)
+
+
+def _build_pdf(dataset, summary, output):
+    if missing_summary_fields(summary):
+        with stage('backfill'):
+            backfill_summary(summary)
+    charts = _chart_files(dataset, summary, CHART_KINDS, 'png')
+    generate_pdf(dataset, summary, output=output, charts=charts)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_pdf(request, pk):
-    """Return PDF as attachment."""
+    """
+    Return PDF as attachment. Reports are built once per dataset content into
+    settings.REPORT_FILE_DIR and streamed from disk with an ETag.
+    """
     try:
-        dataset = UploadedDataset.objects.get(pk=pk, user=request.user)
+        dataset = UploadedDataset.objects.select_related('summary').defer('raw_data').get(pk=pk, user=request.user)
     except UploadedDataset.DoesNotExist:
         return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
     try:
@@ -226,8 +708,11 @@ def download_pdf(request, pk):
     except DataSummary.DoesNotExist:
         return Response({'error': 'Summary not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    buffer = generate_pdf(dataset, summary)
-    from django.http import HttpResponse
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="report_{dataset.file_name}.pdf"'
-    return response
+    etag = cache.etag_for(dataset, 'pdf')
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+    with stage('pdf'):
+        path = cache.get_or_build_file(cache.report_file(dataset, 'pdf', '.pdf'),
+                                       lambda tmp: _build_pdf(dataset, summary, tmp))
+    response = ranged_file_response(request, path, 'application/pdf', f'report_{dataset.file_name}.pdf', etag)
+    return cache.with_etag(response, etag)
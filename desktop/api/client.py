@@ -9,6 +9,8 @@ import requests
 class APIClient:
     """Client for the REST API. Uses Token auth for desktop."""
     BASE_URL = 'http://127.0.0.1:8000/api'
+    # Rows requested per page; the server caps this at DATASET_MAX_PAGE_SIZE
+    PAGE_LIMIT = 5000
 
     def __init__(self):
         self.token = None
@@ -95,15 +97,29 @@ class APIClient:
         r.raise_for_status()
         return r.json()
 
-    def get_dataset(self, dataset_id: int) -> dict:
-        """GET /api/datasets/<id>/ with token. Returns dict."""
+    def get_dataset(self, dataset_id: int, **params) -> dict:
+        """
+        GET /api/datasets/<id>/ with token. Returns dict with one page of rows.
+        Optional params: offset, limit, fields, type, sort, min_/max_<column>.
+        """
         r = requests.get(
             f'{self.BASE_URL}/datasets/{dataset_id}/',
             headers=self._headers(),
+            params=params or None,
         )
         r.raise_for_status()
         return r.json()
 
+    def get_all_rows(self, dataset_id: int) -> list:
+        """All rows of a dataset, following next_offset across /api/datasets/<id>/ pages."""
+        rows = []
+        offset = 0
+        while offset is not None:
+            page = self.get_dataset(dataset_id, offset=offset, limit=self.PAGE_LIMIT)
+            rows.extend(page.get('raw_data', []))
+            offset = page.get('next_offset')
+        return rows
+
     def get_summary(self, dataset_id: int) -> dict:
         """GET /api/summary/<id>/ with token. Returns dict."""
         r = requests.get(
@@ -113,6 +129,16 @@ class APIClient:
         r.raise_for_status()
         return r.json()
 
+    def get_plot(self, dataset_id: int, **params) -> dict:
+        """GET /api/datasets/<id>/plot/ with token (kind, x, y, bins, series, points, type). Returns dict."""
+        r = requests.get(
+            f'{self.BASE_URL}/datasets/{dataset_id}/plot/',
+            headers=self._headers(),
+            params=params or None,
+        )
+        r.raise_for_status()
+        return r.json()
+
     def download_pdf(self, dataset_id: int, save_path: str) -> None:
         """GET /api/pdf/<id>/ with token, write content to save_path."""
         r = requests.get(
@@ -64,9 +64,8 @@ class HistoryTab(QWidget):
     def _load(self, dataset_id):
         """Load dataset and summary, notify main window."""
         try:
-            data_res = self.client.get_dataset(dataset_id)
+            raw_data = self.client.get_all_rows(dataset_id)
             summary_res = self.client.get_summary(dataset_id)
-            raw_data = data_res.get('raw_data', [])
             summary = summary_res
             self.on_load(dataset_id, summary, raw_data)
         except Exception as e:
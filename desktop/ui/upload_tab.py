@@ -88,9 +88,8 @@ class UploadTab(QWidget):
             dataset_id = result.get('dataset_id')
             summary = result.get('summary', {})
 
-            # Fetch full dataset
-            data_res = self.client.get_dataset(dataset_id)
-            raw_data = data_res.get('raw_data', [])
+            # Fetch every page of the dataset
+            raw_data = self.client.get_all_rows(dataset_id)
 
             self.current_dataset_id = dataset_id
             self.current_summary = summary
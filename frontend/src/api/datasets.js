@@ -0,0 +1,24 @@
+/**
+ * Dataset helpers on top of the shared axios instance.
+ */
+import api from './axios';
+
+// Rows requested per page; the server caps this at DATASET_MAX_PAGE_SIZE
+const PAGE_LIMIT = 5000;
+
+/**
+ * Fetch every row of a dataset by following next_offset across pages
+ * of /api/datasets/<id>/. Resolves to the concatenated raw_data array.
+ */
+export async function fetchAllRows(datasetId) {
+  const rows = [];
+  let offset = 0;
+  while (offset !== null && offset !== undefined) {
+    const res = await api.get(`/api/datasets/${datasetId}/`, {
+      params: { offset, limit: PAGE_LIMIT },
+    });
+    rows.push(...(res.data.raw_data || []));
+    offset = res.data.next_offset;
+  }
+  return rows;
+}
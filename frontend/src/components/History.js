@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import api from '../api/axios';
+import { fetchAllRows } from '../api/datasets';
 
 /**
  * History component: lists last 5 uploads with Load button.
@@ -30,11 +31,10 @@ function History({ onLoadDataset }) {
   const handleLoad = async (datasetId) => {
     setError('');
     try {
-      const [dataRes, summaryRes] = await Promise.all([
-        api.get(`/api/datasets/${datasetId}/`),
+      const [rawData, summaryRes] = await Promise.all([
+        fetchAllRows(datasetId),
         api.get(`/api/summary/${datasetId}/`),
       ]);
-      const rawData = dataRes.data.raw_data || [];
       const summaryData = summaryRes.data;
       onLoadDataset(rawData, summaryData, datasetId);
     } catch (err) {
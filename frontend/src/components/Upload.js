@@ -1,5 +1,6 @@
 import React, { useState, useRef } from 'react';
 import api from '../api/axios';
+import { fetchAllRows } from '../api/datasets';
 
 /**
  * Upload component: file input and upload button.
@@ -32,13 +33,12 @@ function Upload({ onDataLoaded }) {
 
       const { dataset_id, summary } = uploadRes.data;
 
-      // Fetch full dataset and summary
-      const [dataRes, summaryRes] = await Promise.all([
-        api.get(`/api/datasets/${dataset_id}/`),
+      // Fetch every page of the dataset, and the summary
+      const [rawData, summaryRes] = await Promise.all([
+        fetchAllRows(dataset_id),
         api.get(`/api/summary/${dataset_id}/`),
       ]);
 
-      const rawData = dataRes.data.raw_data || [];
       const summaryData = summaryRes.data;
 
       onDataLoaded(rawData, summaryData, dataset_id);